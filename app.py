@@ -1,6 +1,11 @@
 from __future__ import annotations
 
+import hashlib
+import os
 import sys
+import threading
+from collections import OrderedDict
+from dataclasses import replace
 from pathlib import Path
 
 # Uztikriname, kad "src" paketas butu randamas (svarbu Streamlit Cloud deploy'ui)
@@ -8,8 +13,136 @@ sys.path.insert(0, str(Path(__file__).resolve().parent / "src"))
 
 import streamlit as st
 
-from ai_agentas.pipeline import RunConfig, run_batch
-from ai_agentas.nodes.csl_formatter import SUPPORTED_STYLES
+from ai_agentas.pipeline import STARTED, BatchResult, RunConfig, iter_documents, merge_results, with_docx_update
+from ai_agentas.utils.doc_readers import InMemoryDocument
+from ai_agentas.nodes.csl_formatter import SUPPORTED_STYLES, format_bibliography
+from ai_agentas.nodes.duplicates import deduplicate
+from ai_agentas.nodes.parse_bibliography import LOW_CONFIDENCE
+
+
+class _StageCache:
+    """
+    Etapu rezultatai tarp perpaleidimu (ir sesiju): raktas - ikeltu failu
+    turinio SHA-256 ir tik tie nustatymai, nuo kuriu etapas priklauso.
+    Seniausi irasai ismetami.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+            return self._data.get(key)
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return value
+
+
+@st.cache_resource
+def _stage_cache() -> _StageCache:
+    return _StageCache()
+
+
+def _upload_key(uf) -> str:
+    """Turinio SHA-256 ir vardas (pagal pletini parenkamas skaitytuvas); skaiciuojama viena karta ikelimui."""
+    hashes = st.session_state.setdefault("upload_hashes", {})
+    file_id = getattr(uf, "file_id", None)
+    key = hashes.get(file_id) if file_id else None
+    if key is None:
+        key = f"{hashlib.sha256(uf.getvalue()).hexdigest()}:{uf.name}"
+        if file_id:
+            hashes[file_id] = key
+    return key
+
+
+def _refs_table(refs, key: str | None = None) -> None:
+    if not refs:
+        return
+    st.dataframe(
+        [
+            {
+                "#": i + 1,
+                "autorius": r.author or "--",
+                "metai": r.year or "--",
+                "pavadinimas": r.title or "--",
+                "pasitikejimas": f"{int(r.confidence * 100)}%",
+                "parseris": r.parser,
+            }
+            for i, r in enumerate(refs)
+        ],
+        use_container_width=True,
+        hide_index=True,
+        key=key,
+    )
+
+
+# Zemiau sio pasitikejimo (procentais) irasai zymimi perziurai
+_LOW_CONFIDENCE = round(LOW_CONFIDENCE * 100)
+# Kiek eiluciu eksportu / bibliografijos rodoma perziuroje
+_PREVIEW_LINES = 200
+
+
+def _head(text: str, max_lines: int) -> tuple[str, int]:
+    """Pirmos `max_lines` eilutes ir visu eiluciu skaicius (tas pats objektas, jei netrumpinta)."""
+    total = text.count("\n") + 1
+    if total <= max_lines:
+        return text, total
+    cut = -1
+    for _ in range(max_lines):
+        cut = text.index("\n", cut + 1)
+    return text[:cut], total
+
+
+def _preview(text: str, language: str | None = None) -> None:
+    shown, total = _head(text, _PREVIEW_LINES)
+    st.code(shown, language=language)
+    if shown is not text:
+        st.caption(f"Rodoma pirmu {_PREVIEW_LINES} eiluciu is {total}; pilnas failas - atsisiuntime.")
+
+
+def _page(total: int, key: str, sizes: tuple[int, ...] = (50, 100, 250, 500)) -> tuple[int, int]:
+    """Puslapio pasirinkimas (jei eiluciu daugiau nei maziausias puslapis); grazina [pradzia, pabaiga)."""
+    if total <= sizes[0]:
+        return 0, total
+    c1, c2, c3 = st.columns([1, 1, 3])
+    size = c1.selectbox("Puslapyje", sizes, key=f"{key}_size")
+    pages = (total + size - 1) // size
+    # raktas priklauso nuo puslapiu skaiciaus: pasikeitus filtrui grizta i pirma
+    page = c2.number_input("Puslapis", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page_{pages}")
+    start = (int(page) - 1) * size
+    end = min(start + size, total)
+    c3.caption(f"Rodoma {start + 1}-{end} is {total}")
+    return start, end
+
+
+def _refs_frame(batch: BatchResult):
+    """Visu saltiniu lentele (pandas) su paieskos stulpeliu; kuriama viena karta sujungimui."""
+    import pandas as pd
+
+    refs = batch.all_refs
+    frame = pd.DataFrame({
+        "#": range(1, len(refs) + 1),
+        "dokumentas": [Path(res.source_name).name for res in batch.results for _ in res.refs],
+        "autorius": [r.author or "--" for r in refs],
+        "metai": [r.year or "--" for r in refs],
+        "pavadinimas": [r.title or "--" for r in refs],
+        "zurnalas": [r.journal or "" for r in refs],
+        "DOI": [r.doi or "" for r in refs],
+        "pasitikejimas": [int(r.confidence * 100) for r in refs],
+        "parseris": [r.parser for r in refs],
+    })
+    frame["_paieska"] = (
+        frame["autorius"] + " " + frame["pavadinimas"] + " " + frame["zurnalas"] + " " + frame["DOI"]
+    ).str.lower()
+    return frame
 
 
 st.set_page_config(page_title="Citatos -> Zotero (offline)", layout="wide")
@@ -30,7 +163,11 @@ with st.sidebar:
     st.subheader("Nustatymai")
     csl_style = st.selectbox("Citavimo stilius", SUPPORTED_STYLES, index=0)
     update_docx = st.checkbox("Atnaujinti DOCX citatas (placeholderiai)", value=True)
+    dedupe_exports = st.checkbox("Eksportuoti be dublikatu (sujungti irasai)", value=False)
+    library_path = st.text_input("Bibliotekos indeksas (SQLite, nebutina)", value="")
     export_format = st.selectbox("Eksporto formatas", ["BibTeX (.bib)", "RIS (.ris)", "CSL-JSON (.json)", "Visi formatai"])
+    # Veikiantis `ai-agentas-service`: dokumentus apdoroja jo silta procesu pule
+    service_url = st.text_input("Servisas (URL, nebutina)", value=os.environ.get("AI_AGENTAS_SERVICE", ""))
     st.markdown("---")
     st.caption(
         "Sis agentas veikia **pilnai offline** -- be jokiu API ar interneto. "
@@ -41,7 +178,7 @@ with st.sidebar:
 # --- Upload ---
 uploaded_files = st.file_uploader(
     "Dokumentai",
-    type=["docx", "pdf", "txt"],
+    type=["docx", "pdf", "txt", "bib", "ris"],
     accept_multiple_files=True,
 )
 
@@ -49,23 +186,92 @@ if not uploaded_files:
     st.info("Ikelkite bent viena dokumenta.")
     st.stop()
 
-workdir = Path("_uploaded")
-workdir.mkdir(parents=True, exist_ok=True)
-input_paths: list[str] = []
+# Dokumentai apdorojami atmintyje - jokiu failu diske, todel skirtingu
+# vartotoju vienodu pavadinimu failai vienas kito neperraso.
+inputs = [InMemoryDocument(name=uf.name, data=uf.getvalue()) for uf in uploaded_files]
+
+cache = _stage_cache()
+keys = [_upload_key(uf) for uf in uploaded_files]
+library = library_path.strip() or None
+
+# 1) Skaitymas ir parsinimas - nuo nustatymu nepriklauso; apdorojami tik nauji failai
+parsed = [cache.get(("parse", key)) for key in keys]
+todo = [i for i, res in enumerate(parsed) if res is None]
+if todo:
+    progress_bar = st.progress(0.0, text="Apdorojama...")
+    # kiekvienas dokumentas parodomas vos apdorotas; pilni rezultatai - skirtukuose veliau
+    live = st.empty()
+    live_box = live.container()
+    todo_docs = [inputs[i] for i in todo]
+    parse_cfg = RunConfig(update_docx=False, keep_body_text=False)  # UI dokumento kuno nerodo
+    try:
+        if service_url.strip():
+            from ai_agentas.service import ServiceClient
 
-for uf in uploaded_files:
-    p = workdir / uf.name
-    p.write_bytes(uf.getvalue())
-    input_paths.append(str(p))
+            def on_service_progress(done: int, total: int, doc) -> None:
+                progress_bar.progress(done / total, text=f"Apdorota {done}/{total}: {Path(doc.source_name).name}")
 
-cfg = RunConfig(update_docx=update_docx, csl_style=csl_style)
+            fresh = ServiceClient(service_url.strip()).run_batch(todo_docs, parse_cfg, progress=on_service_progress).results
+        else:
+            fresh = [None] * len(todo)
+            for ev in iter_documents(todo_docs, parse_cfg, workers=None):
+                name = Path(ev.source_name).name
+                if ev.kind == STARTED:
+                    progress_bar.progress(
+                        ev.done / ev.total,
+                        text=f"Apdorojama: {name} ({ev.done}/{ev.total}, rasta saltiniu: {ev.refs_so_far})",
+                    )
+                    continue
+                fresh[ev.index] = ev.result
+                progress_bar.progress(
+                    ev.done / ev.total,
+                    text=f"Apdorota {ev.done}/{ev.total}: {name} (rasta saltiniu: {ev.refs_so_far})",
+                )
+                with live_box.expander(f"{name} -- {len(ev.result.refs)} saltiniu"):
+                    _refs_table(ev.result.refs)
+    except Exception as e:
+        st.error(f"Klaida: {e}")
+        st.stop()
+    for i, res in zip(todo, fresh):
+        parsed[i] = cache.put(("parse", keys[i]), res)
+    progress_bar.empty()
+    live.empty()
 
-with st.spinner("Apdorojama..."):
+# 2) Dublikatai ir biblioteka - priklauso tik nuo irasu. Biblioteka papildoma
+# tik pirma karta, todel perjungus nustatymus irasai nepazymimi "jau bibliotekoje".
+merge_key = ("merge", tuple(keys), library)
+batch = cache.get(merge_key)
+if batch is None:
     try:
-        batch = run_batch(input_paths, cfg)
+        batch = cache.put(merge_key, merge_results(parsed, RunConfig(library_path=library)))
     except Exception as e:
         st.error(f"Klaida: {e}")
         st.stop()
+if dedupe_exports:
+    # kitas BatchResult objektas - savi (tingus) eksportai is sujungtu irasu
+    batch = cache.get(("dedupe", merge_key)) or cache.put(
+        ("dedupe", merge_key),
+        replace(batch, export_refs=deduplicate(batch.all_refs, batch.clusters)),
+    )
+
+# 3) Pigus priklausomi etapai: DOCX citatos ir formatavimas pagal stiliu.
+# Eksportai (merged_bibtex...) skaiciuojami pirma karta juos rodant ir lieka BatchResult'e.
+doc_results = parsed
+if update_docx:
+    docx_cfg = RunConfig(update_docx=True)
+    doc_results = [
+        cache.get(("docx", key)) or cache.put(("docx", key), with_docx_update(res, doc, docx_cfg))
+        for key, res, doc in zip(keys, parsed, inputs)
+    ]
+format_key = ("format", merge_key, dedupe_exports, csl_style)
+merged_formatted = cache.get(format_key)
+if merged_formatted is None:
+    merged_formatted = cache.put(format_key, format_bibliography(batch.export_refs, csl_style))
+
+# Lenteles (viena karta sujungimui) - filtrai ir puslapiai dirba su jau paruostu frame
+refs_frame = cache.get(("frame", merge_key))
+if refs_frame is None:
+    refs_frame = cache.put(("frame", merge_key), _refs_frame(batch))
 
 # --- Tabs ---
 tab_overview, tab_export, tab_formatted, tab_duplicates, tab_details = st.tabs([
@@ -81,28 +287,29 @@ with tab_overview:
     col1, col2, col3, col4 = st.columns(4)
     col1.metric("Dokumentu", len(batch.results))
     col2.metric("Viso saltiniu", len(batch.all_refs))
-    col3.metric("Galimi dublikatai", len(batch.duplicates))
-    low_conf = sum(1 for r in batch.all_refs if r.confidence < 0.55)
+    col3.metric("Dublikatu grupes", len(batch.clusters))
+    low_conf = int((refs_frame["pasitikejimas"] < _LOW_CONFIDENCE).sum())
     col4.metric("Zemo pasitikejimo", low_conf)
 
     st.subheader("Visi rasti saltiniai")
-    if batch.all_refs:
+    if len(refs_frame):
+        f1, f2, f3 = st.columns([2, 2, 1])
+        query = f1.text_input("Paieska (autorius, pavadinimas, zurnalas, DOI)", key="ov_query")
+        docs = f2.multiselect("Dokumentai", sorted(refs_frame["dokumentas"].unique()), key="ov_docs")
+        low_only = f3.checkbox("Tik zemo pasitikejimo", key="ov_low")
+        view = refs_frame
+        if query.strip():
+            view = view[view["_paieska"].str.contains(query.strip().lower(), regex=False)]
+        if docs:
+            view = view[view["dokumentas"].isin(docs)]
+        if low_only:
+            view = view[view["pasitikejimas"] < _LOW_CONFIDENCE]
+        start, end = _page(len(view), "ov")
         st.dataframe(
-            [
-                {
-                    "#": i + 1,
-                    "autorius": r.author or "--",
-                    "metai": r.year or "--",
-                    "pavadinimas": r.title or "--",
-                    "zurnalas": r.journal or "",
-                    "DOI": r.doi or "",
-                    "pasitikejimas": f"{int(r.confidence * 100)}%",
-                    "parseris": r.parser,
-                }
-                for i, r in enumerate(batch.all_refs)
-            ],
+            view.iloc[start:end].drop(columns="_paieska"),
             use_container_width=True,
             hide_index=True,
+            column_config={"pasitikejimas": st.column_config.NumberColumn(format="%d%%")},
         )
         if low_conf:
             st.warning("Dalis irasu yra zemo pasitikejimo. Rekomenduojama juos perziureti ranka.")
@@ -117,12 +324,13 @@ with tab_export:
     show_ris = export_format in ("RIS (.ris)", "Visi formatai")
     show_csl = export_format in ("CSL-JSON (.json)", "Visi formatai")
 
+    # Perziuroje - tik pradzia; pilnas turinys tik atsisiuntime
     if show_bib:
         st.markdown("**BibTeX**")
-        st.code(batch.merged_bibtex, language="bibtex")
+        _preview(batch.merged_bibtex, language="bibtex")
         st.download_button(
             "Atsisiusti references.bib",
-            data=batch.merged_bibtex.encode("utf-8"),
+            data=batch.merged_bibtex,
             file_name="references.bib",
             mime="text/x-bibtex",
             key="dl_bib",
@@ -130,10 +338,10 @@ with tab_export:
 
     if show_ris:
         st.markdown("**RIS**")
-        st.code(batch.merged_ris)
+        _preview(batch.merged_ris)
         st.download_button(
             "Atsisiusti references.ris",
-            data=batch.merged_ris.encode("utf-8"),
+            data=batch.merged_ris,
             file_name="references.ris",
             mime="application/x-research-info-systems",
             key="dl_ris",
@@ -141,10 +349,10 @@ with tab_export:
 
     if show_csl:
         st.markdown("**CSL-JSON**")
-        st.code(batch.merged_csljson, language="json")
+        _preview(batch.merged_csljson, language="json")
         st.download_button(
             "Atsisiusti references.json",
-            data=batch.merged_csljson.encode("utf-8"),
+            data=batch.merged_csljson,
             file_name="references.json",
             mime="application/json",
             key="dl_csljson",
@@ -153,11 +361,14 @@ with tab_export:
 # ==================== Suformatuota bibliografija ====================
 with tab_formatted:
     st.subheader(f"Bibliografija ({csl_style} stilius)")
-    if batch.merged_formatted.strip():
-        st.markdown(batch.merged_formatted)
+    if merged_formatted.strip():
+        shown, total_lines = _head(merged_formatted, _PREVIEW_LINES)
+        st.markdown(shown)
+        if shown is not merged_formatted:
+            st.caption(f"Rodoma pirmu {_PREVIEW_LINES} eiluciu is {total_lines}; visa bibliografija - atsisiuntime.")
         st.download_button(
             "Atsisiusti bibliografija.txt",
-            data=batch.merged_formatted.encode("utf-8"),
+            data=merged_formatted,
             file_name=f"bibliografija_{csl_style.replace(' ', '_')}.txt",
             mime="text/plain",
             key="dl_formatted",
@@ -168,64 +379,76 @@ with tab_formatted:
 # ==================== Dublikatai ====================
 with tab_duplicates:
     st.subheader("Galimi dublikatai tarp visu dokumentu")
-    if batch.duplicates:
-        st.warning(f"Rasta **{len(batch.duplicates)}** galimu dublikatu.")
-        for d in batch.duplicates:
+    if batch.clusters:
+        st.warning(
+            f"Rasta **{len(batch.clusters)}** dublikatu grupiu "
+            f"({len(batch.duplicates)} poru)."
+        )
+        # didziausios grupes pirmos; isskleidziamos tik rodomo puslapio grupes
+        clusters = cache.get(("clusters", merge_key)) or cache.put(
+            ("clusters", merge_key), sorted(batch.clusters, key=lambda c: (-len(c.indices), -c.score)),
+        )
+        start, end = _page(len(clusters), "dup", sizes=(20, 50, 100))
+        for c in clusters[start:end]:
             with st.expander(
-                f"Panasumas {d.score:.0f}% -- {d.ref_a.title or '?'} <-> {d.ref_b.title or '?'}"
+                f"Panasumas {c.score:.0f}% -- {c.canonical.title or '?'} "
+                f"({len(c.indices)} irasai)"
             ):
-                c1, c2 = st.columns(2)
-                with c1:
-                    st.markdown(f"**Saltinis A** (#{d.index_a + 1})")
-                    st.text(d.ref_a.raw[:300])
-                with c2:
-                    st.markdown(f"**Saltinis B** (#{d.index_b + 1})")
-                    st.text(d.ref_b.raw[:300])
-                st.caption(f"Priezastis: {d.reason}")
+                st.markdown("**Sujungtas irasas**")
+                st.text(c.canonical.raw[:300])
+                st.markdown(
+                    "**Grupes nariai:** " + ", ".join(f"#{i + 1}" for i in c.indices)
+                )
+                st.caption(f"Priezastis: {c.reason}")
     else:
         st.success("Dublikatu nerasta!")
 
+    if batch.library_matches:
+        st.subheader("Jau yra bibliotekoje")
+        start, end = _page(len(batch.library_matches), "lib")
+        st.dataframe(
+            [
+                {
+                    "#": m.index + 1,
+                    "pavadinimas": m.ref.title or "--",
+                    "bibliotekos id": m.library_id,
+                    "saltinis": Path(m.source).name if m.source else "",
+                    "panasumas": f"{m.score:.0f}%",
+                    "priezastis": m.reason,
+                }
+                for m in batch.library_matches[start:end]
+            ],
+            use_container_width=True,
+            hide_index=True,
+        )
+
 # ==================== Dokumentu detales ====================
 with tab_details:
     st.subheader("Kiekvieno dokumento detales")
-    for res in batch.results:
+    start, end = _page(len(doc_results), "docs", sizes=(20, 50, 100))
+    for res in doc_results[start:end]:
         fname = Path(res.source_name).name
         with st.expander(f"{fname} -- {len(res.refs)} saltiniu"):
             if res.extracted_bibliography.strip():
+                shown, total_lines = _head(res.extracted_bibliography, _PREVIEW_LINES)
                 st.text_area(
-                    "Bibliografija (raw)",
-                    res.extracted_bibliography,
+                    "Bibliografija (raw)" if shown is res.extracted_bibliography
+                    else f"Bibliografija (raw, pirmos {_PREVIEW_LINES} eil. is {total_lines})",
+                    shown,
                     height=200,
                     key=f"bib_{fname}",
                 )
             else:
                 st.warning("Bibliografijos blokas nerastas.")
 
-            if res.refs:
-                st.dataframe(
-                    [
-                        {
-                            "#": i + 1,
-                            "autorius": r.author or "--",
-                            "metai": r.year or "--",
-                            "pavadinimas": r.title or "--",
-                            "pasitikejimas": f"{int(r.confidence * 100)}%",
-                            "parseris": r.parser,
-                        }
-                        for i, r in enumerate(res.refs)
-                    ],
-                    use_container_width=True,
-                    hide_index=True,
-                    key=f"df_{fname}",
-                )
+            _refs_table(res.refs, key=f"df_{fname}")
 
             if res.updated_docx:
-                out_path = Path(res.updated_docx.output_path)
                 st.success(f"Pakeistu citatu: **{res.updated_docx.replacements}**")
                 st.download_button(
                     f"Atsisiusti atnaujinta {fname}",
-                    data=out_path.read_bytes(),
-                    file_name=out_path.name,
+                    data=res.updated_docx.data,
+                    file_name=res.updated_docx.output_path,
                     mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
                     key=f"dl_docx_{fname}",
                 )
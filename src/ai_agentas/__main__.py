@@ -0,0 +1,7 @@
+"""`python -m ai_agentas ...` - tas pats kaip `ai-agentas` komanda."""
+
+import sys
+
+from ai_agentas.cli import main
+
+sys.exit(main())
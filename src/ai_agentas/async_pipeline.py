@@ -0,0 +1,217 @@
+"""Asinchroninis (asyncio) pipeline nuolatiniam dokumentu srautui."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable
+
+from ai_agentas.pipeline import (
+    BatchResult,
+    RunConfig,
+    RunResult,
+    enrich_stage,
+    export_stage,
+    library_stage,
+    merge_results,
+    parse_stage,
+    process_pool,
+    read_stage,
+    update_stage,
+)
+from ai_agentas.utils.doc_readers import DocumentSource, DocumentText, as_source, source_name
+from ai_agentas.utils.library_readers import LIBRARY_KIND, is_library
+from ai_agentas.utils.text_norm import BibliographySplit, TextLines
+from ai_agentas.utils.tracing import Tracer, make_tracer
+
+
+_DONE = object()
+
+
+@dataclass
+class _Job:
+    index: int
+    source: Any
+    doc: Any = None
+    split: Any = None
+    refs: Any = None
+    updated: Any = None
+    result: Any = None
+    tracer: Any = None
+
+
+def _traced(fn: Callable[..., Any], tracer: Tracer, *args: Any) -> tuple[Any, Tracer]:
+    """Vykdo etapa ir grazina tracer'i atgal - is proceso grizta kopija su naujais span'ais."""
+    return fn(*args, tracer=tracer), tracer
+
+
+class _Stage:
+    """Etapo darbuotojai: ima is `q_in`, vykdo `fn`, deda i `q_out` (riboto dydzio eile)."""
+
+    def __init__(self, fn: Callable[[_Job], Awaitable[None]], q_in: asyncio.Queue, q_out: asyncio.Queue, workers: int):
+        self.fn = fn
+        self.q_in = q_in
+        self.q_out = q_out
+        self.workers = workers
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self.q_in.get()
+            if job is _DONE:
+                # kitiems to paties etapo darbuotojams
+                await self.q_in.put(_DONE)
+                return
+            await self.fn(job)
+            await self.q_out.put(job)
+
+    async def run(self) -> None:
+        workers = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        try:
+            # pirma klaida nutraukia visa etapa, kitaip likusieji darbuotojai lauktu eileje amzinai
+            done, _ = await asyncio.wait(workers, return_when=asyncio.FIRST_EXCEPTION)
+            for t in done:
+                t.result()
+        finally:
+            for t in workers:
+                t.cancel()
+        await self.q_out.put(_DONE)
+
+
+async def _iterate(sources: AsyncIterable[DocumentSource] | Iterable[DocumentSource]) -> AsyncIterator[DocumentSource]:
+    if hasattr(sources, "__aiter__"):
+        async for src in sources:  # type: ignore[union-attr]
+            yield src
+    else:
+        for src in sources:  # type: ignore[union-attr]
+            yield src
+
+
+async def stream_pipeline(
+    sources: AsyncIterable[DocumentSource] | Iterable[DocumentSource],
+    config: RunConfig,
+    cpu_workers: int | None = None,
+    io_workers: int = 4,
+    queue_size: int = 8,
+) -> AsyncIterator[tuple[int, RunResult]]:
+    """
+    Apdoroja dokumentu srauta etapais, sujungtais ribotomis eilemis:
+
+    read (I/O gijos; PDF – procesai) -> split+parse (+ Crossref papildymas) (procesai)
+    -> DOCX atnaujinimas (I/O gijos) -> `config.outputs` eksportai (procesai).
+
+    Skirtingu dokumentu etapai vyksta vienu metu; kai eile pilna, ankstesnis
+    etapas laukia (backpressure), todel vienu metu atmintyje yra ribotas
+    dokumentu kiekis. Grazina (ivesties indeksas, RunResult) baigimo tvarka.
+    """
+    loop = asyncio.get_running_loop()
+    cpu_workers = cpu_workers or os.cpu_count() or 1
+    threads: Executor = ThreadPoolExecutor(max_workers=io_workers)
+    procs: Executor = process_pool(cpu_workers)
+
+    q_read: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    q_parse: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    q_update: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    q_export: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    q_out: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    async def read(job: _Job) -> None:
+        name = source_name(job.source)
+        if is_library(name):
+            # bibliotekos eksportas jau yra irasai: parsinimas praleidziamas
+            job.refs, job.tracer = await loop.run_in_executor(procs, _traced, library_stage, job.tracer, job.source)
+            job.doc = DocumentText(text="", source_path=name, kind=LIBRARY_KIND)
+            job.split = BibliographySplit(TextLines(""), body_end=0, bib_start=None, bib_end=0)
+            return
+        # python-docx dokumentas lieka sioje gijoje, kad atnaujinimui nereiketu skaityti is naujo;
+        # PDF istraukimas yra CPU darbas, todel eina i procesus
+        pool = procs if Path(name).suffix.lower() == ".pdf" else threads
+        job.doc, job.tracer = await loop.run_in_executor(pool, _traced, read_stage, job.tracer, job.source)
+
+    async def parse(job: _Job) -> None:
+        if job.doc.kind == LIBRARY_KIND:
+            return
+        (job.split, job.refs), job.tracer = await loop.run_in_executor(
+            procs, _traced, partial(parse_stage, labeler_model=config.labeler_model), job.tracer, job.doc.text
+        )
+        if config.crossref_dump:
+            job.refs, job.tracer = await loop.run_in_executor(
+                procs, _traced, enrich_stage, job.tracer, job.refs, config
+            )
+
+    async def update(job: _Job) -> None:
+        job.updated = await loop.run_in_executor(
+            threads, partial(update_stage, tracer=job.tracer), job.source, job.doc, job.refs, config
+        )
+
+    async def export(job: _Job) -> None:
+        result = RunResult(
+            source_name=job.doc.source_path,
+            extracted_body=job.split.body_text if config.keep_body_text else "",
+            extracted_bibliography=job.split.bibliography_text,
+            refs=job.refs,
+            updated_docx=job.updated,
+            csl_style=config.csl_style,
+            tracer=job.tracer,
+        )
+        # be is anksto norimu eksportu nera ko siusti i procesus
+        if config.outputs:
+            result = await loop.run_in_executor(procs, export_stage, result, config.outputs)
+        job.result = result
+
+    async def feed() -> None:
+        i = 0
+        async for src in _iterate(sources):
+            src = as_source(src)
+            await q_read.put(_Job(index=i, source=src, tracer=make_tracer(config.tracing, doc=source_name(src))))
+            i += 1
+        await q_read.put(_DONE)
+
+    tasks = [
+        asyncio.ensure_future(feed()),
+        asyncio.ensure_future(_Stage(read, q_read, q_parse, io_workers).run()),
+        asyncio.ensure_future(_Stage(parse, q_parse, q_update, cpu_workers).run()),
+        asyncio.ensure_future(_Stage(update, q_update, q_export, io_workers).run()),
+        asyncio.ensure_future(_Stage(export, q_export, q_out, cpu_workers).run()),
+    ]
+
+    try:
+        while True:
+            get = asyncio.ensure_future(q_out.get())
+            while not get.done():
+                # etapo klaida (pvz. sugadintas failas) nutraukia visa srauta
+                for t in tasks:
+                    if t.done() and not t.cancelled() and t.exception() is not None:
+                        get.cancel()
+                        raise t.exception()  # type: ignore[misc]
+                running = [t for t in tasks if not t.done()]
+                await asyncio.wait([get, *running], return_when=asyncio.FIRST_COMPLETED)
+            job = get.result()
+            if job is _DONE:
+                break
+            yield job.index, job.result
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        threads.shutdown(wait=False, cancel_futures=True)
+        procs.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_batch_async(
+    input_paths: AsyncIterable[DocumentSource] | Iterable[DocumentSource],
+    config: RunConfig,
+    cpu_workers: int | None = None,
+    io_workers: int = 4,
+    queue_size: int = 8,
+) -> BatchResult:
+    """Kaip `run_batch`, tik per `stream_pipeline`; rezultatai sujungiami ivesties tvarka."""
+    collected: dict[int, RunResult] = {}
+    async for i, res in stream_pipeline(
+        input_paths, config, cpu_workers=cpu_workers, io_workers=io_workers, queue_size=queue_size
+    ):
+        collected[i] = res
+    return merge_results([collected[i] for i in sorted(collected)], config)
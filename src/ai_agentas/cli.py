@@ -0,0 +1,389 @@
+"""Komandines eilutes sasaja: failu / katalogu apdorojimas be Streamlit."""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Sequence
+
+from ai_agentas.nodes.csl_formatter import SUPPORTED_STYLES
+from ai_agentas.nodes.parse_bibliography import LOW_CONFIDENCE
+from ai_agentas.pipeline import OUTPUTS, UPDATED_DOCX_SUFFIX, BatchResult, RunConfig, RunResult, run_batch
+
+if TYPE_CHECKING:
+    from ai_agentas.utils.tracing import StageTiming
+    from ai_agentas.watch import WatchEvent
+
+
+INPUT_SUFFIXES = (".docx", ".pdf", ".txt", ".bib", ".ris")
+
+# eksportas -> (failo vardas, RunResult atributas, BatchResult atributas)
+_EXPORT_FILES = {
+    "bibtex": ("references.bib", "bibtex", "merged_bibtex"),
+    "ris": ("references.ris", "ris", "merged_ris"),
+    "csljson": ("references.json", "csljson", "merged_csljson"),
+    "formatted": ("bibliografija.txt", "formatted_bibliography", "merged_formatted"),
+}
+
+
+def _is_input(path: Path) -> bool:
+    name = path.name
+    # Word'o laikinieji failai ir musu paciu atnaujinti DOCX neapdorojami
+    return (
+        path.suffix.lower() in INPUT_SUFFIXES
+        and not name.startswith("~$")
+        and not name.endswith(UPDATED_DOCX_SUFFIX)
+    )
+
+
+def collect_inputs(
+    paths: Sequence[str | Path],
+    recursive: bool = True,
+    exclude: str | Path | None = None,
+) -> list[tuple[Path, Path]]:
+    """
+    Ivesties failai is nurodytu failu ir katalogu: (failas, santykinis kelias
+    isvesties katalogui). Katalogai skaitomi rekursyviai, failai surusiuojami.
+    `exclude` - katalogas (pvz. isvesties), kurio failai is katalogu neimami:
+    ten irasyti .bib / .ris eksportai kitaip taptu ivestimi.
+    """
+    skip = Path(exclude).resolve() if exclude is not None else None
+
+    def wanted(f: Path) -> bool:
+        return f.is_file() and _is_input(f) and (skip is None or not f.resolve().is_relative_to(skip))
+
+    out: list[tuple[Path, Path]] = []
+    for raw in paths:
+        p = Path(raw)
+        if p.is_dir():
+            found = p.rglob("*") if recursive else p.glob("*")
+            out.extend((f, f.relative_to(p)) for f in sorted(found) if wanted(f))
+        elif p.is_file():
+            out.append((p, Path(p.name)))
+        else:
+            raise FileNotFoundError(f"nerastas failas ar katalogas: {p}")
+    return out
+
+
+def _document_dirs(rel_paths: list[Path]) -> list[Path]:
+    """Kiekvienam dokumentui unikalus pakatalogis (`a/b.docx` -> `a/b`; sutapus - `b-2`)."""
+    used: set[Path] = set()
+    out: list[Path] = []
+    for rel in rel_paths:
+        base = rel.with_suffix("")
+        d, n = base, 1
+        while d in used:
+            n += 1
+            d = base.with_name(f"{base.name}-{n}")
+        used.add(d)
+        out.append(d)
+    return out
+
+
+def _write(path: Path, text: str) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def _export_text(obj: RunResult | BatchResult, attr: str) -> str:
+    value = getattr(obj, attr)
+    return value.bibtex if attr == "bibtex" else value
+
+
+def write_outputs(
+    batch: BatchResult,
+    out_dir: Path,
+    formats: Sequence[str],
+    doc_dirs: list[Path] | None = None,
+) -> list[Path]:
+    """Iraso sujungtus eksportus i `out_dir`, o (jei `doc_dirs`) - ir kiekvieno dokumento."""
+    written = [
+        _write(out_dir / _EXPORT_FILES[fmt][0], _export_text(batch, _EXPORT_FILES[fmt][2]))
+        for fmt in formats
+    ]
+    if doc_dirs is not None:
+        for res, d in zip(batch.results, doc_dirs):
+            for fmt in formats:
+                filename, attr, _ = _EXPORT_FILES[fmt]
+                written.append(_write(out_dir / "documents" / d / filename, _export_text(res, attr)))
+    return written
+
+
+def _write_service_docx(batch: BatchResult, docx_outputs: list[str | None]) -> None:
+    """Servisas atnaujinta DOCX grazina turiniu - irasome ten, kur irasytu `run_batch`."""
+    for res, target in zip(batch.results, docx_outputs):
+        upd = res.updated_docx
+        if upd is not None and target is not None and upd.data is not None:
+            Path(target).write_bytes(upd.data)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="ai-agentas",
+        description="Bibliografijos istraukimas is DOCX/PDF/TXT ir eksportas i Zotero formatus (offline).",
+    )
+    parser.add_argument(
+        "paths", nargs="+",
+        help="failai arba katalogai (skaitomi rekursyviai); .bib / .ris - esama biblioteka dublikatams",
+    )
+    parser.add_argument("-o", "--output-dir", default="out", help="isvesties katalogas (numatytai: out)")
+    parser.add_argument(
+        "-f", "--formats", default="bibtex",
+        help=f"eksportai per kableli: {', '.join(OUTPUTS)} arba all (numatytai: bibtex)",
+    )
+    parser.add_argument("--style", default="APA 7", choices=SUPPORTED_STYLES, help="citavimo stilius")
+    parser.add_argument("--per-document", action="store_true", help="eksportus rasyti ir kiekvienam dokumentui")
+    parser.add_argument("--no-docx", action="store_true", help="neatnaujinti DOCX citatu")
+    parser.add_argument(
+        "--docx-writer", default=RunConfig.docx_writer, choices=("python-docx", "zip"),
+        help=f"DOCX rasymas; zip - perrasomas tik document.xml (numatytai: {RunConfig.docx_writer}, kaip UI)",
+    )
+    parser.add_argument("--dedupe", action="store_true", help="sujungtuose eksportuose sujungti dublikatus")
+    parser.add_argument("--dedup-method", default="index", choices=("index", "matrix"))
+    parser.add_argument("--library", help="SQLite bibliotekos indeksas dublikatams tarp paleidimu")
+    parser.add_argument(
+        "--crossref", metavar="JSONL",
+        help="vietine Crossref kopija (indeksas: ai-agentas-crossref-index) trukstamiems laukams papildyti",
+    )
+    parser.add_argument(
+        "--enrich-threshold", type=float, default=LOW_CONFIDENCE,
+        help=f"zemesnio pasitikejimo irasams pirmenybe Crossref reiksmems (numatytai: {LOW_CONFIDENCE})",
+    )
+    parser.add_argument(
+        "--labeler", metavar="NPZ",
+        help="lauku zymetojo modelis (ai-agentas-train-labeler) zemo pasitikejimo irasams",
+    )
+    parser.add_argument(
+        "--external-merge", action="store_true",
+        help="dideliems batch'ams: saltiniai kaupiami laikiname SQLite faile, sujungti eksportai rasomi srautu",
+    )
+    parser.add_argument("--tmp-dir", help="katalogas laikinam --external-merge failui (numatytai: sistemos)")
+    parser.add_argument("--cache", help="SQLite rezultatu talpykla: apdoroti tik naujus ar pakitusius failus")
+    parser.add_argument("--no-recursive", action="store_true", help="katalogu neskaityti rekursyviai")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="procesu skaicius (0 - visi branduoliai)")
+    parser.add_argument("--trace", metavar="PATH", help="irasyti Chrome trace JSON ir spausdinti etapu laikus")
+    parser.add_argument(
+        "--service", metavar="URL",
+        help="apdoroti veikianciame servise (ai-agentas-service), pvz. http://127.0.0.1:8765 arba unix:///kelias.sock",
+    )
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="stebeti katalogus: nauji / pakite failai pridedami prie out/library.bib (ir .ris) su biblioteka",
+    )
+    parser.add_argument("--interval", type=float, default=2.0, help="stebejimo apklausos intervalas sekundemis")
+    parser.add_argument("--settle", type=float, default=2.0, help="kiek sekundziu failas turi nesikeisti pries apdorojima")
+    parser.add_argument("-q", "--quiet", action="store_true", help="spausdinti tik klaidas")
+    return parser
+
+
+def _parse_formats(spec: str) -> tuple[str, ...]:
+    if spec.strip() == "all":
+        return OUTPUTS
+    formats = tuple(f.strip() for f in spec.split(",") if f.strip())
+    unknown = [f for f in formats if f not in OUTPUTS]
+    if unknown or not formats:
+        raise ValueError(f"Nezinomi eksportai: {', '.join(unknown) or spec} (galimi: {', '.join(OUTPUTS)}, all)")
+    return formats
+
+
+def _watch(args: argparse.Namespace, log: Callable[[str], None]) -> int:
+    from ai_agentas.watch import FolderWatcher
+
+    config = RunConfig(
+        update_docx=not args.no_docx,
+        csl_style=args.style,
+        dedup_method=args.dedup_method,
+        library_path=args.library,
+        docx_writer=args.docx_writer,
+        keep_body_text=False,
+        crossref_dump=args.crossref,
+        enrich_threshold=args.enrich_threshold,
+        labeler_model=args.labeler,
+    )
+    try:
+        watcher = FolderWatcher(
+            args.paths, args.output_dir, config,
+            formats=_parse_formats(args.formats),
+            settle=args.settle,
+            workers=args.workers or None,
+            recursive=not args.no_recursive,
+        )
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Klaida: {e}", file=sys.stderr)
+        return 2
+
+    def on_event(ev: WatchEvent) -> None:
+        for path, error in ev.failed:
+            print(f"Klaida: {path}: {error}", file=sys.stderr)
+        log(
+            f"Apdorota: {len(ev.processed)}, pasalinta: {len(ev.removed)}, saltiniu: {ev.refs}, "
+            f"nauju: {ev.new_refs}, bibliotekoje: {ev.library_size} ({ev.seconds:.1f} s)"
+        )
+
+    log(f"Stebima: {', '.join(map(str, args.paths))} -> {args.output_dir} (Ctrl+C - baigti)")
+    with watcher:
+        try:
+            watcher.run(interval=args.interval, on_event=on_event)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+def _log_timings(timings: list[StageTiming], log: Callable[[str], None]) -> None:
+    for t in timings:
+        size = "" if t.size is None else f"  dydis={t.size}"
+        log(f"  {t.name:<16} {t.count:>5}x  {t.total_ms:>10.1f} ms  (max {t.max_ms:.1f} ms){size}")
+
+
+def _run_external(
+    args: argparse.Namespace,
+    inputs: list[tuple[Path, Path]],
+    config: RunConfig,
+    formats: tuple[str, ...],
+    out_dir: Path,
+    doc_dirs: list[Path],
+    docx_outputs: list[str | None],
+    progress: Callable[[int, int, RunResult], None],
+    log: Callable[[str], None],
+) -> int:
+    """`--external-merge`: dokumentu rezultatai neatmintyje, sujungti eksportai rasomi srautu."""
+    from ai_agentas.external_merge import run_batch_external
+
+    def write_document(i: int, res: RunResult) -> None:
+        if args.per_document:
+            for fmt in formats:
+                filename, attr, _ = _EXPORT_FILES[fmt]
+                _write(out_dir / "documents" / doc_dirs[i] / filename, _export_text(res, attr))
+
+    started = time.perf_counter()
+    try:
+        batch = run_batch_external(
+            [str(path) for path, _ in inputs],
+            config,
+            workers=args.workers or None,
+            progress=progress,
+            docx_outputs=docx_outputs,
+            on_result=write_document,
+            tmp_dir=args.tmp_dir,
+        )
+        with batch:
+            written = batch.write_exports(out_dir, {fmt: _EXPORT_FILES[fmt][0] for fmt in formats})
+            if args.trace:
+                batch.write_trace(args.trace)
+                _log_timings(batch.timings, log)
+    except Exception as e:  # noqa: BLE001 - kaip `main`
+        print(f"Klaida: {e}", file=sys.stderr)
+        return 1
+
+    per_document = len(inputs) * len(formats) if args.per_document else 0
+    log(
+        f"Dokumentu: {batch.documents}, saltiniu: {batch.refs}, "
+        f"dublikatu grupiu: {batch.clusters}, atnaujinta DOCX: {batch.updated_docx}, "
+        f"failu: {len(written) + per_document + batch.updated_docx} -> {out_dir} "
+        f"({time.perf_counter() - started:.1f} s)"
+    )
+    return 0
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    def log(msg: str) -> None:
+        if not args.quiet:
+            print(msg, file=sys.stderr)
+
+    if args.watch:
+        return _watch(args, log)
+
+    try:
+        formats = _parse_formats(args.formats)
+        inputs = collect_inputs(args.paths, recursive=not args.no_recursive, exclude=args.output_dir)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Klaida: {e}", file=sys.stderr)
+        return 2
+    if not inputs:
+        print("Klaida: nerasta .docx / .pdf / .txt / .bib / .ris failu", file=sys.stderr)
+        return 2
+    if args.external_merge and args.service:
+        print("Klaida: --external-merge negalimas su --service", file=sys.stderr)
+        return 2
+
+    out_dir = Path(args.output_dir)
+    doc_dirs = _document_dirs([rel for _, rel in inputs])
+    update_docx = not args.no_docx
+    docx_outputs: list[str | None] = []
+    for (path, _), d in zip(inputs, doc_dirs):
+        if update_docx and path.suffix.lower() == ".docx":
+            target = out_dir / "documents" / d / (path.stem + UPDATED_DOCX_SUFFIX)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            docx_outputs.append(str(target))
+        else:
+            docx_outputs.append(None)
+
+    config = RunConfig(
+        update_docx=update_docx,
+        csl_style=args.style,
+        dedup_method=args.dedup_method,
+        dedupe_exports=args.dedupe,
+        library_path=args.library,
+        docx_writer=args.docx_writer,
+        # per-dokumento eksportai skaiciuojami darbiniuose procesuose
+        outputs=formats if args.per_document else (),
+        trace=bool(args.trace),
+        cache_path=args.cache,
+        keep_body_text=False,
+        crossref_dump=args.crossref,
+        enrich_threshold=args.enrich_threshold,
+        labeler_model=args.labeler,
+    )
+
+    def progress(done: int, total: int, res: RunResult) -> None:
+        log(f"[{done}/{total}] {res.source_name}: {len(res.refs)} saltiniu")
+
+    if args.external_merge:
+        return _run_external(args, inputs, config, formats, out_dir, doc_dirs, docx_outputs, progress, log)
+
+    started = time.perf_counter()
+    try:
+        if args.service:
+            from ai_agentas.service import DocumentStatus, ServiceClient
+
+            def service_progress(done: int, total: int, doc: DocumentStatus) -> None:
+                log(f"[{done}/{total}] {doc.source_name}: {doc.ref_count} saltiniu")
+
+            batch = ServiceClient(args.service).run_batch(
+                [str(path) for path, _ in inputs], config, progress=service_progress,
+            )
+            _write_service_docx(batch, docx_outputs)
+        else:
+            batch = run_batch(
+                [str(path) for path, _ in inputs],
+                config,
+                workers=args.workers or None,
+                progress=progress,
+                docx_outputs=docx_outputs,
+            )
+        written = write_outputs(batch, out_dir, formats, doc_dirs if args.per_document else None)
+    except Exception as e:  # noqa: BLE001 - cron/CI turi gauti aiskia klaida ir ne 0 koda
+        print(f"Klaida: {e}", file=sys.stderr)
+        return 1
+
+    if args.trace:
+        # po eksportu irasymo, kad trace apimtu ir sujungtus eksportus
+        batch.write_trace(args.trace)
+        _log_timings(batch.timings, log)
+
+    updated = sum(1 for r in batch.results if r.updated_docx)
+    log(
+        f"Dokumentu: {len(batch.results)}, saltiniu: {len(batch.all_refs)}, "
+        f"dublikatu grupiu: {len(batch.clusters)}, atnaujinta DOCX: {updated}, "
+        f"failu: {len(written) + updated} -> {out_dir} ({time.perf_counter() - started:.1f} s)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,492 @@
+"""
+Sujungimas labai dideliems batch'ams su ribota atmintimi.
+
+`run_batch` laiko atmintyje visus RunResult, `all_refs` ir sujungtus
+eksportus. Cia kiekvieno dokumento irasai is karto iskeliami i laikina
+SQLite faila, o dokumento rezultatas pamirstamas. Dublikatu paieska,
+grupavimas ir citekey skyrimas eina rusiuotais praejimais per faila, o
+sujungti eksportai rasomi srautu po `_CHUNK` irasu. Atmintyje lieka tik
+vienos pavadinimo gramos kandidatu grupe ir dublikatu grupiu indeksai.
+
+Rezultatas sutampa su `run_batch` + `write_outputs` ("index" dublikatu
+paieska; "matrix" reikalautu visu pavadinimu atmintyje).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import tempfile
+from itertools import groupby
+from pathlib import Path
+from typing import Callable, Iterator, TextIO
+
+from ai_agentas.nodes.csl_formatter import format_reference
+from ai_agentas.nodes.duplicates import (
+    _combine,
+    _normalize,
+    _signature,
+    _sorted_len,
+    _title_shingles,
+    merge_references,
+)
+from ai_agentas.nodes.export_bibtex import _to_bib_entry, citekey_base
+from ai_agentas.nodes.export_csljson import ref_to_csl
+from ai_agentas.nodes.export_ris import ref_to_ris
+from ai_agentas.nodes.library_index import LibraryIndex
+from ai_agentas.nodes.parse_bibliography import ParsedReference
+from ai_agentas.pipeline import FINISHED, OUTPUTS, ProgressCallback, RunConfig, RunResult, iter_documents
+from ai_agentas.utils.doc_readers import DocumentSource
+from ai_agentas.utils.tracing import Span, StageTiming, make_tracer, summarize, write_chrome_trace
+
+
+# irasu kiekis viename skaitymo / rasymo bloke
+_CHUNK = 1000
+_TITLE_THRESHOLD = 80.0  # `find_duplicates` numatytasis
+# irasu id: dokumento indeksas * _DOC_STRIDE + vieta dokumente, todel id tvarka
+# yra ivesties tvarka (kaip `all_refs`), nepriklausomai nuo baigimo tvarkos
+_DOC_STRIDE = 1 << 32
+
+_SCHEMA = """
+CREATE TABLE refs (
+    id INTEGER PRIMARY KEY,  -- tvarka kaip `BatchResult.all_refs` (`_DOC_STRIDE`)
+    source TEXT NOT NULL,
+    title TEXT NOT NULL,  -- normalizuoti lyginimo laukai
+    author TEXT NOT NULL,
+    year TEXT,
+    doi TEXT,
+    sig TEXT,  -- pavadinimo signatura (gramos per '|'; gramose yra tarpu)
+    data TEXT NOT NULL
+);
+CREATE TABLE tokens (token TEXT NOT NULL, ref_id INTEGER NOT NULL);
+CREATE TABLE df (token TEXT PRIMARY KEY, n INTEGER NOT NULL) WITHOUT ROWID;
+CREATE TABLE sig (token TEXT NOT NULL, ref_id INTEGER NOT NULL);
+CREATE TABLE pairs (a INTEGER NOT NULL, b INTEGER NOT NULL, score REAL NOT NULL, reason TEXT NOT NULL);
+CREATE TABLE members (ref_id INTEGER PRIMARY KEY, root INTEGER NOT NULL);
+CREATE TABLE clusters (root INTEGER PRIMARY KEY, score REAL NOT NULL, reason TEXT NOT NULL, data TEXT NOT NULL);
+CREATE TABLE known (ref_id INTEGER PRIMARY KEY);
+CREATE TABLE export (pos INTEGER PRIMARY KEY, citekey TEXT NOT NULL UNIQUE, data TEXT NOT NULL);
+"""
+
+# eksportas -> ExternalBatch metodas (failu vardai - `cli._EXPORT_FILES`)
+_WRITERS = {"bibtex": "write_bibtex", "ris": "write_ris", "csljson": "write_csljson", "formatted": "write_formatted"}
+
+
+def _to_json(ref: ParsedReference) -> str:
+    return json.dumps(ref.__dict__, ensure_ascii=False)
+
+
+def _from_json(data: str) -> ParsedReference:
+    return ParsedReference(**json.loads(data))
+
+
+class ExternalBatch:
+    """
+    Disku paremtas batch'o sujungimas: `add` kiekvienam dokumentui, tada
+    `merge` ir `write_*` / `write_exports`. Laikinas failas istrinamas `close`.
+    """
+
+    def __init__(self, config: RunConfig, tmp_dir: str | Path | None = None):
+        self.config = config
+        fd, self.path = tempfile.mkstemp(prefix="ai-agentas-merge-", suffix=".sqlite", dir=tmp_dir)
+        os.close(fd)
+        self._conn = sqlite3.connect(self.path)
+        # laikinas failas: zurnalas ir fsync nereikalingi; puslapiu talpykla ribota
+        self._conn.execute("PRAGMA journal_mode=OFF")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute("PRAGMA cache_size=-16384")
+        self._conn.executescript(_SCHEMA)
+        self.tracer = make_tracer(config.tracing)
+        self._doc_spans: list[Span] = []
+        self.documents = 0
+        self.updated_docx = 0
+        self.refs = 0
+        self.duplicates = 0
+        self.clusters = 0
+        self.library_matches = 0
+        self.export_refs = 0
+        self._merged = False
+
+    def close(self) -> None:
+        self._conn.close()
+        Path(self.path).unlink(missing_ok=True)
+
+    def __enter__(self) -> ExternalBatch:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def add(self, result: RunResult, index: int | None = None) -> None:
+        """
+        Iskelia dokumento irasus i faila; pats `result` toliau nebereikalingas.
+        `index` - dokumento vieta ivestyje (None - pridejimo tvarka); rezultatai
+        gali buti pridedami bet kuria tvarka, sujungimas eina `index` tvarka.
+        """
+        if self._merged:
+            raise RuntimeError("Sujungtas batch'as nebepildomas")
+        if index is None:
+            index = self.documents
+        rows = []
+        tokens = []
+        for k, ref in enumerate(result.refs):
+            ref_id = index * _DOC_STRIDE + k
+            title = _normalize(ref.title)
+            rows.append((
+                ref_id, result.source_name, title, _normalize(ref.author),
+                ref.year or None, _normalize(ref.doi) or None, _to_json(ref),
+            ))
+            if title:
+                tokens.extend((gram, ref_id) for gram in _title_shingles(title))
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO refs (id, source, title, author, year, doi, data) VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.executemany("INSERT INTO tokens (token, ref_id) VALUES (?, ?)", tokens)
+        self.documents += 1
+        self.refs += len(rows)
+        self.updated_docx += result.updated_docx is not None
+        if self.config.tracing:
+            self._doc_spans.extend(result.tracer.spans)
+
+    # --- sujungimas ---
+
+    def merge(self) -> None:
+        """Dublikatai, grupes, biblioteka ir eksporto eile su citekey (po viena karta)."""
+        if self._merged:
+            return
+        self._merged = True
+        with self.tracer.span("dedup", size=self.refs):
+            self._signatures()
+            self._doi_pairs()
+            self._title_pairs()
+        with self.tracer.span("cluster", size=self.duplicates):
+            self._cluster()
+        if self.config.library_path:
+            with self.tracer.span("library", size=self.refs), LibraryIndex(self.config.library_path) as library:
+                self._library(library)
+        with self.tracer.span("citekeys") as s:
+            self._export_order()
+            s.size = self.export_refs
+
+    def _signatures(self) -> None:
+        """
+        Kaip `duplicates._candidate_pairs`: `_signature` kiekvienam irasui is
+        jo gramu ir ju dazniu visame batch'e (po viena irasa is failo).
+        """
+        with self._conn:
+            self._conn.execute("INSERT INTO df (token, n) SELECT token, COUNT(*) FROM tokens GROUP BY token")
+        rows = self._conn.execute(
+            "SELECT t.ref_id, t.token, d.n FROM tokens t JOIN df d ON d.token = t.token ORDER BY t.ref_id"
+        )
+        sig_rows: list[tuple[str, int]] = []
+        ref_sigs: list[tuple[str, int]] = []
+        write = self._conn.cursor()
+        for ref_id, group in groupby(rows, key=lambda r: r[0]):
+            df = {gram: n for _, gram, n in group}
+            signature = _signature(set(df), df)
+            sig_rows.extend((gram, ref_id) for gram in signature)
+            ref_sigs.append(("|".join(signature), ref_id))
+            if len(ref_sigs) >= _CHUNK:
+                write.executemany("INSERT INTO sig (token, ref_id) VALUES (?, ?)", sig_rows)
+                write.executemany("UPDATE refs SET sig = ? WHERE id = ?", ref_sigs)
+                sig_rows.clear()
+                ref_sigs.clear()
+        with self._conn:
+            write.executemany("INSERT INTO sig (token, ref_id) VALUES (?, ?)", sig_rows)
+            write.executemany("UPDATE refs SET sig = ? WHERE id = ?", ref_sigs)
+            self._conn.execute("DROP TABLE tokens")
+
+    def _doi_pairs(self) -> None:
+        rows = self._conn.execute("SELECT doi, id FROM refs WHERE doi IS NOT NULL ORDER BY doi, id")
+        out: list[tuple[int, int, float, str]] = []
+        for _, group in groupby(rows, key=lambda r: r[0]):
+            ids = [r[1] for r in group]
+            for pos, i in enumerate(ids):
+                out.extend((i, j, 100.0, "DOI sutampa") for j in ids[pos + 1:])
+            if len(out) >= _CHUNK:
+                self._put_pairs(out)
+        self._put_pairs(out)
+
+    def _title_pairs(self) -> None:
+        """
+        Kandidatai - irasai su bendra signaturos grama, po vienos gramos grupe
+        (rusiuota pagal grama). Pora, turinti kelias bendras gramas, vertinama
+        tik pirmosios is ju grupeje, todel kiekviena pora lyginama viena karta.
+        """
+        from rapidfuzz import fuzz
+
+        rows = self._conn.execute(
+            "SELECT s.token, r.id, r.title, r.author, r.year, r.doi, r.sig "
+            "FROM sig s JOIN refs r ON r.id = s.ref_id ORDER BY s.token, s.ref_id"
+        )
+        threshold = _TITLE_THRESHOLD
+        out: list[tuple[int, int, float, str]] = []
+        for token, group in groupby(rows, key=lambda r: r[0]):
+            bucket: list[tuple[int, str, str, str | None, str | None, set[str], int]] = []
+            for _, j, tj, aj, yj, dj, sj in group:
+                sig_j = set(sj.split("|"))
+                lj = _sorted_len(tj)
+                for i, ti, ai, yi, di, sig_i, li in bucket:
+                    if 200.0 * min(li, lj) < threshold * (li + lj):
+                        continue
+                    if di and di == dj:
+                        continue  # jau DOI pora
+                    if min(sig_i & sig_j) != token:
+                        continue
+                    title_sim = fuzz.token_sort_ratio(ti, tj)
+                    if title_sim < threshold:
+                        continue
+                    author_sim = fuzz.token_sort_ratio(ai, aj) if ai and aj else 0.0
+                    same_year = bool(yi and yj and yi == yj)
+                    scored = _combine(yi, title_sim, author_sim, same_year)
+                    if scored is not None:
+                        out.append((i, j, scored[0], scored[1]))
+                bucket.append((j, tj, aj, yj, dj, sig_j, lj))
+            if len(out) >= _CHUNK:
+                self._put_pairs(out)
+        self._put_pairs(out)
+
+    def _put_pairs(self, out: list[tuple[int, int, float, str]]) -> None:
+        with self._conn:
+            self._conn.executemany("INSERT INTO pairs (a, b, score, reason) VALUES (?, ?, ?, ?)", out)
+        self.duplicates += len(out)
+        out.clear()
+
+    def _cluster(self) -> None:
+        """Kaip `cluster_duplicates`: union-find tik per dublikatu indeksus."""
+        parent: dict[int, int] = {}
+
+        def find(x: int) -> int:
+            root = x
+            while parent.get(root, root) != root:
+                root = parent[root]
+            while parent.get(x, x) != root:
+                parent[x], x = root, parent[x]
+            return root
+
+        for a, b in self._conn.execute("SELECT a, b FROM pairs"):
+            ra, rb = find(a), find(b)
+            if ra != rb:
+                parent[max(ra, rb)] = min(ra, rb)
+            parent.setdefault(a, a)
+            parent.setdefault(b, b)
+
+        best: dict[int, tuple[float, str]] = {}
+        for a, score, reason in self._conn.execute("SELECT a, score, reason FROM pairs ORDER BY score DESC, a, b"):
+            best.setdefault(find(a), (score, reason))
+
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO members (ref_id, root) VALUES (?, ?)", ((x, find(x)) for x in list(parent))
+            )
+            rows = self._conn.execute(
+                "SELECT m.root, r.data FROM members m JOIN refs r ON r.id = m.ref_id ORDER BY m.root, m.ref_id"
+            )
+            clusters = []
+            for root, group in groupby(rows, key=lambda r: r[0]):
+                canonical = merge_references([_from_json(data) for _, data in group])
+                clusters.append((root, *best[root], _to_json(canonical)))
+                self.clusters += 1
+                if len(clusters) >= _CHUNK:
+                    self._conn.executemany("INSERT INTO clusters (root, score, reason, data) VALUES (?, ?, ?, ?)", clusters)
+                    clusters.clear()
+            self._conn.executemany("INSERT INTO clusters (root, score, reason, data) VALUES (?, ?, ?, ?)", clusters)
+
+    def _iter_refs(self) -> Iterator[tuple[int, str, ParsedReference, int | None, str | None, bool]]:
+        """(id, saltinis, irasas, grupes saknis, grupes kanoninis irasas, ar bibliotekoje) id tvarka."""
+        rows = self._conn.execute(
+            "SELECT r.id, r.source, r.data, m.root, c.data, k.ref_id IS NOT NULL FROM refs r "
+            "LEFT JOIN members m ON m.ref_id = r.id LEFT JOIN clusters c ON c.root = r.id "
+            "LEFT JOIN known k ON k.ref_id = r.id ORDER BY r.id"
+        )
+        for ref_id, source, data, root, canonical, known in rows:
+            yield ref_id, source, _from_json(data), root, canonical, bool(known)
+
+    def _library(self, library: LibraryIndex) -> None:
+        """Kaip `find_library_duplicates` + `pipeline._add_new_to_library`, dviem praejimais."""
+        known = []
+        for ref_id, _, ref, _, _, _ in self._iter_refs():
+            if library.lookup(ref) is not None:
+                known.append((ref_id,))
+        with self._conn:
+            self._conn.executemany("INSERT INTO known (ref_id) VALUES (?)", known)
+        self.library_matches = len(known)
+
+        # grupes, kuriose bent vienas irasas jau bibliotekoje, nepridedamos
+        skip_roots = {
+            root for (root,) in self._conn.execute(
+                "SELECT DISTINCT m.root FROM members m JOIN known k ON k.ref_id = m.ref_id"
+            )
+        }
+        batch: list[ParsedReference] = []
+        batch_source: str | None = None
+        for ref_id, source, ref, root, canonical, known_ref in self._iter_refs():
+            if known_ref:
+                continue
+            if root is not None and (root in skip_roots or root != ref_id):
+                continue
+            if source != batch_source or len(batch) >= _CHUNK:
+                if batch:
+                    library.add(batch, source=batch_source)
+                batch, batch_source = [], source
+            batch.append(_from_json(canonical) if canonical else ref)
+        if batch:
+            library.add(batch, source=batch_source)
+
+    def _export_order(self) -> None:
+        """Eksporto irasai (`dedupe_exports` - be dublikatu) ir citekey, kaip `assign_citekeys`."""
+        dedupe = self.config.dedupe_exports
+        pending: dict[str, tuple[int, str, str]] = {}
+        pos = 0
+
+        def taken(ck: str) -> bool:
+            if ck in pending:
+                return True
+            return self._conn.execute("SELECT 1 FROM export WHERE citekey = ?", (ck,)).fetchone() is not None
+
+        def flush() -> None:
+            with self._conn:
+                self._conn.executemany("INSERT INTO export (pos, citekey, data) VALUES (?, ?, ?)", pending.values())
+            pending.clear()
+
+        for ref_id, _, ref, root, canonical, _ in self._iter_refs():
+            if dedupe and root is not None:
+                if root != ref_id:
+                    continue
+                ref = _from_json(canonical)
+            pos += 1
+            base = citekey_base(ref, pos)
+            ck = base
+            suffix = 0
+            while taken(ck):
+                suffix += 1
+                ck = f"{base}{suffix}"
+            pending[ck] = (pos, ck, _to_json(ref))
+            if len(pending) >= _CHUNK:
+                flush()
+        flush()
+        self.export_refs = pos
+
+    # --- eksportai srautu ---
+
+    def _rows(self, order: str) -> Iterator[list[tuple[int, str, ParsedReference]]]:
+        self.merge()
+        cur = self._conn.execute(f"SELECT pos, citekey, data FROM export ORDER BY {order}")
+        while rows := cur.fetchmany(_CHUNK):
+            yield [(pos, ck, _from_json(data)) for pos, ck, data in rows]
+
+    def write_bibtex(self, f: TextIO) -> None:
+        """Kaip `export_bibtex`: irasai rusiuoti pagal citekey (BibTexWriter numatytoji tvarka)."""
+        import bibtexparser
+        from bibtexparser.bibdatabase import BibDatabase
+        from bibtexparser.bwriter import BibTexWriter
+
+        writer = BibTexWriter()
+        writer.indent = "  "
+        first = True
+        with self.tracer.span("merge.bibtex", size=self.export_refs):
+            for rows in self._rows("citekey"):
+                db = BibDatabase()
+                db.entries = [_to_bib_entry(ref, fallback_index=pos, citekey=ck) for pos, ck, ref in rows]
+                if not first:
+                    f.write(writer.entry_separator)
+                f.write(bibtexparser.dumps(db, writer))
+                first = False
+
+    def write_ris(self, f: TextIO) -> None:
+        with self.tracer.span("merge.ris", size=self.export_refs):
+            first = True
+            for rows in self._rows("pos"):
+                for _, _, ref in rows:
+                    if not first:
+                        f.write("\n\n")
+                    f.write(ref_to_ris(ref))
+                    first = False
+            f.write("\n")
+
+    def write_csljson(self, f: TextIO) -> None:
+        """Tas pats tekstas kaip `json.dumps(items, indent=2)`, po viena elementa."""
+        with self.tracer.span("merge.csljson", size=self.export_refs):
+            if not self.export_refs:
+                f.write("[]")
+                return
+            f.write("[\n")
+            first = True
+            for rows in self._rows("pos"):
+                for pos, _, ref in rows:
+                    item = json.dumps(ref_to_csl(ref, pos), indent=2, ensure_ascii=False)
+                    if not first:
+                        f.write(",\n")
+                    f.write("  " + item.replace("\n", "\n  "))
+                    first = False
+            f.write("\n]")
+
+    def write_formatted(self, f: TextIO) -> None:
+        with self.tracer.span("merge.format", size=self.export_refs):
+            first = True
+            for rows in self._rows("pos"):
+                for pos, _, ref in rows:
+                    if not first:
+                        f.write("\n\n")
+                    f.write(format_reference(ref, self.config.csl_style, number=pos))
+                    first = False
+
+    def write_exports(self, out_dir: str | Path, outputs: dict[str, str]) -> list[Path]:
+        """Iraso eksportus (`OUTPUTS` pavadinimas -> failo vardas) i `out_dir`."""
+        written: list[Path] = []
+        for name, filename in outputs.items():
+            if name not in _WRITERS:
+                raise ValueError(f"Nezinomas eksportas: {name} (galimi: {', '.join(OUTPUTS)})")
+            path = Path(out_dir) / filename
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                getattr(self, _WRITERS[name])(f)
+            written.append(path)
+        return written
+
+    # --- sekimas ---
+
+    @property
+    def spans(self) -> list[Span]:
+        return [*self._doc_spans, *self.tracer.spans]
+
+    @property
+    def timings(self) -> list[StageTiming]:
+        return summarize(self.spans)
+
+    def write_trace(self, path: str) -> None:
+        write_chrome_trace(self.spans, path)
+
+
+def run_batch_external(
+    input_paths: list[DocumentSource],
+    config: RunConfig,
+    workers: int | None = 1,
+    progress: ProgressCallback | None = None,
+    docx_outputs: list[str | None] | None = None,
+    on_result: Callable[[int, RunResult], None] | None = None,
+    tmp_dir: str | Path | None = None,
+) -> ExternalBatch:
+    """
+    Kaip `run_batch`, bet dokumentu rezultatai iskeliami i laikina faila
+    (`tmp_dir`) ir sujungiami `ExternalBatch.merge`. `on_result(indeksas,
+    rezultatas)` - pvz. dokumento eksportams irasyti, kol rezultatas dar yra.
+    Grazintas batch'as uzdaromas kvieciancio (`with`).
+    """
+    batch = ExternalBatch(config, tmp_dir=tmp_dir)
+    try:
+        for ev in iter_documents(input_paths, config, workers=workers, docx_outputs=docx_outputs):
+            if ev.kind != FINISHED:
+                continue
+            batch.add(ev.result, ev.index)
+            if on_result is not None:
+                on_result(ev.index, ev.result)
+            if progress is not None:
+                progress(ev.done, ev.total, ev.result)
+        batch.merge()
+    except BaseException:
+        batch.close()
+        raise
+    return batch
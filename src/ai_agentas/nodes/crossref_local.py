@@ -0,0 +1,322 @@
+"""
+Metaduomenu papildymas is vietines Crossref kopijos (be tinklo).
+
+Kopija - JSONL failas, kurio kiekviena eilute yra Crossref `work` irasas
+(kaip API `message`: DOI, title, author, issued, container-title...).
+Vienkartinis `build_crossref_index` ja perskaito srautu ir salia iraso
+indeksa: DOI ir pavadinimo rakto 64 bitu maisos, surusiuotos, su eilutes
+poslinkiu kopijoje. Paieska - dvejetaine per `numpy.memmap`, irasas
+skaitomas is mmap'into failo, todel kopija i atminti nekraunama.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from array import array
+from dataclasses import replace
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterator, Sequence
+
+from ai_agentas.utils.citekeys import _slug
+
+from .duplicates import _normalize, score_references
+from .parse_bibliography import LOW_CONFIDENCE, ParsedReference, _confidence
+
+
+INDEX_SUFFIX = ".idx"
+
+_MAGIC = b"AICRIX01"
+# magic, DOI irasu, pavadinimu irasu, kopijos dydis baitais
+_HEADER = struct.Struct("<8sQQQ")
+# Laukai, kuriu truksta -> irasas tikrinamas kopijoje
+_WANTED = ("title", "year", "author", "journal", "doi")
+_FIELDS = ("title", "year", "author", "authors", "journal", "volume", "issue", "pages", "publisher", "doi", "url")
+
+
+def _key(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _doi_key(doi: str | None) -> int | None:
+    doi = _normalize(doi)
+    return _key(doi) if doi else None
+
+
+def _title_key(title: str | None) -> int | None:
+    """Pavadinimo raktas: be diakritiku, skyrybos ir didziuju raidziu (bent 3 zodziai)."""
+    words = [_slug(w) for w in (title or "").split()]
+    words = [w for w in words if w]
+    return _key(" ".join(words)) if len(words) >= 3 else None
+
+
+def default_index_path(dump_path: str | Path) -> Path:
+    return Path(str(dump_path) + INDEX_SUFFIX)
+
+
+def build_crossref_index(dump_path: str | Path, index_path: str | Path | None = None) -> tuple[int, int]:
+    """
+    Perskaito kopija viena karta (eilute po eilutes) ir iraso indeksa.
+    Atmintyje laikomi tik raktai ir poslinkiai (32 baitai irasui).
+    Grazina (DOI raktu, pavadinimo raktu) skaiciu.
+    """
+    import numpy as np
+
+    dump_path = Path(dump_path)
+    index_path = Path(index_path) if index_path else default_index_path(dump_path)
+    doi_keys, doi_offsets = array("Q"), array("Q")
+    title_keys, title_offsets = array("Q"), array("Q")
+    offset = 0
+    with open(dump_path, "rb") as f:
+        for line in f:
+            start = offset
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                continue
+            k = _doi_key(item.get("DOI"))
+            if k is not None:
+                doi_keys.append(k)
+                doi_offsets.append(start)
+            k = _title_key(_first(item.get("title")))
+            if k is not None:
+                title_keys.append(k)
+                title_offsets.append(start)
+
+    tmp = index_path.with_name(index_path.name + ".tmp")
+    with open(tmp, "wb") as out:
+        out.write(_HEADER.pack(_MAGIC, len(doi_keys), len(title_keys), offset))
+        for keys, offsets in ((doi_keys, doi_offsets), (title_keys, title_offsets)):
+            k = np.frombuffer(keys, dtype="<u8") if keys else np.empty(0, "<u8")
+            o = np.frombuffer(offsets, dtype="<u8") if offsets else np.empty(0, "<u8")
+            order = np.argsort(k, kind="stable")
+            out.write(k[order].tobytes())
+            out.write(o[order].tobytes())
+    os.replace(tmp, index_path)
+    return len(doi_keys), len(title_keys)
+
+
+def _first(value: Any) -> str | None:
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return str(value) if value else None
+
+
+def _crossref_authors(item: dict[str, Any]) -> list[str]:
+    out: list[str] = []
+    for a in item.get("author") or []:
+        family = (a.get("family") or "").strip()
+        given = (a.get("given") or "").strip()
+        if not family:
+            name = (a.get("name") or "").strip()
+            if name:
+                out.append(name)
+            continue
+        initials = " ".join(f"{p[0]}." for p in re.split(r"[\s\-]+", given) if p)
+        out.append(f"{family}, {initials}" if initials else family)
+    return out
+
+
+def _crossref_year(item: dict[str, Any]) -> str | None:
+    for field in ("issued", "published-print", "published-online", "created"):
+        parts = (item.get(field) or {}).get("date-parts") or []
+        if parts and parts[0] and parts[0][0]:
+            return str(parts[0][0])
+    return None
+
+
+def from_crossref(item: dict[str, Any]) -> ParsedReference:
+    """Crossref `work` -> ParsedReference (laukai kaip parserio)."""
+    authors = _crossref_authors(item)
+    if len(authors) > 1:
+        author = ", ".join(authors[:-1]) + ", & " + authors[-1]
+    else:
+        author = authors[0] if authors else None
+    ref = ParsedReference(
+        raw="",
+        title=_first(item.get("title")),
+        year=_crossref_year(item),
+        author=author,
+        authors=authors,
+        journal=_first(item.get("container-title")),
+        volume=item.get("volume") or None,
+        issue=item.get("issue") or None,
+        pages=item.get("page") or None,
+        publisher=item.get("publisher") or None,
+        doi=item.get("DOI") or None,
+        url=item.get("URL") or None,
+        parser="crossref",
+    )
+    return replace(ref, confidence=_confidence(ref))
+
+
+class CrossrefIndex:
+    """
+    Vietines Crossref kopijos paieska pagal indeksa (`build_crossref_index`).
+    Ir kopija, ir indeksas mmap'inami: atidarymas nekainuoja, o paieska -
+    dvejetaine paieska (O(log n)) ir kandidatu eiluciu nuskaitymas.
+    """
+
+    def __init__(self, dump_path: str | Path, index_path: str | Path | None = None):
+        import numpy as np
+
+        self.dump_path = str(dump_path)
+        self.index_path = str(index_path or default_index_path(dump_path))
+        with open(self.index_path, "rb") as f:
+            magic, n_doi, n_title, dump_size = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC:
+            raise ValueError(f"ne Crossref indeksas: {self.index_path}")
+        if os.path.getsize(self.dump_path) != dump_size:
+            raise ValueError(f"indeksas pasenes (kopija pasikeitusi): {self.index_path}")
+
+        self._uint64 = np.uint64
+        words = np.memmap(self.index_path, dtype="<u8", mode="r", offset=_HEADER.size)
+        self._doi = (words[:n_doi], words[n_doi:2 * n_doi])
+        pos = 2 * n_doi
+        self._title = (words[pos:pos + n_title], words[pos + n_title:pos + 2 * n_title])
+        self._file = open(self.dump_path, "rb")
+        self._dump = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if dump_size else b""
+
+    def close(self) -> None:
+        if isinstance(self._dump, mmap.mmap):
+            self._dump.close()
+        self._file.close()
+
+    def __enter__(self) -> CrossrefIndex:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._title[0])
+
+    def _records(self, table: tuple[Any, Any], key: int | None) -> Iterator[dict[str, Any]]:
+        if key is None:
+            return
+        keys, offsets = table
+        # np.uint64: Python int > 2**63 kitaip lyginamas kaip objektas (be dvejetaines paieskos)
+        lo = int(keys.searchsorted(self._uint64(key), side="left"))
+        hi = int(keys.searchsorted(self._uint64(key), side="right"))
+        for k in range(lo, hi):
+            start = int(offsets[k])
+            end = self._dump.find(b"\n", start)
+            yield json.loads(self._dump[start:end if end >= 0 else len(self._dump)])
+
+    def by_doi(self, doi: str | None) -> list[ParsedReference]:
+        want = _normalize(doi)
+        return [
+            from_crossref(item) for item in self._records(self._doi, _doi_key(doi))
+            if _normalize(item.get("DOI")) == want
+        ]
+
+    def by_title(self, title: str | None) -> list[ParsedReference]:
+        return [from_crossref(item) for item in self._records(self._title, _title_key(title))]
+
+    def match(self, ref: ParsedReference) -> tuple[ParsedReference, bool] | None:
+        """
+        Crossref irasas tam paciam darbui: (irasas, ar pagal DOI) arba None.
+        Pavadinimo kandidatai tikrinami `score_references` taisykle (autoriai, metai).
+        """
+        found = self.by_doi(ref.doi)
+        if found:
+            return found[0], True
+        best = None
+        for cand in self.by_title(ref.title):
+            scored = score_references(ref, cand, title_threshold=90.0)
+            if scored is not None and (best is None or scored[0] > best[1]):
+                best = (cand, scored[0])
+        return (best[0], False) if best is not None else None
+
+
+@lru_cache(maxsize=4)
+def _open_cached(dump_path: str, index_path: str, mtime_ns: int) -> CrossrefIndex:
+    return CrossrefIndex(dump_path, index_path)
+
+
+def open_crossref_index(dump_path: str | Path, index_path: str | Path | None = None) -> CrossrefIndex:
+    """
+    Procese bendras atidarytas indeksas (darbiniai procesai ir servisas jo
+    neatidaro kiekvienam dokumentui). Perstacius indeksa atidaromas naujas.
+    """
+    index_path = str(index_path or default_index_path(dump_path))
+    return _open_cached(str(dump_path), index_path, os.stat(index_path).st_mtime_ns)
+
+
+def needs_enrichment(ref: ParsedReference, threshold: float = LOW_CONFIDENCE) -> bool:
+    return ref.confidence < threshold or any(not getattr(ref, f) for f in _WANTED)
+
+
+def _merge(ref: ParsedReference, found: ParsedReference, prefer_found: bool) -> ParsedReference:
+    """
+    Truksta lauku papildymas; jei `prefer_found` (DOI sutapo arba parsinimas
+    nepatikimas), Crossref reiksmes pakeicia ir esamas. Pavadinimas imamas
+    visada: atitikmuo rastas pagal ji, o parserio iskarpa gali tureti skyrybos liekanu.
+    """
+    updates: dict[str, Any] = {}
+    for f in _FIELDS:
+        new = getattr(found, f)
+        if new and (prefer_found or f == "title" or not getattr(ref, f)):
+            updates[f] = new
+    if not updates:
+        return ref
+    merged = replace(ref, **updates, parser=f"{ref.parser}+crossref")
+    return replace(merged, confidence=_confidence(merged))
+
+
+def enrich_references(
+    refs: list[ParsedReference],
+    index: CrossrefIndex,
+    threshold: float = LOW_CONFIDENCE,
+) -> list[ParsedReference]:
+    """
+    Irasus su trukstamais laukais ar pasitikejimu < `threshold` papildo is
+    kopijos. Kiti irasai (ir nerasti) grazinami tie patys objektai.
+    """
+    out: list[ParsedReference] = []
+    for ref in refs:
+        hit = index.match(ref) if needs_enrichment(ref, threshold) else None
+        if hit is None:
+            out.append(ref)
+            continue
+        found, by_doi = hit
+        out.append(_merge(ref, found, prefer_found=by_doi or ref.confidence < threshold))
+    return out
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="ai-agentas-crossref-index",
+        description="Vietines Crossref JSONL kopijos indekso sukurimas (vienkartinis, srautu).",
+    )
+    parser.add_argument("dump", help="Crossref JSONL (vienas `work` irasas eiluteje, nesuspaustas)")
+    parser.add_argument("-o", "--output", help=f"indekso failas (numatytai: <dump>{INDEX_SUFFIX})")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        n_doi, n_title = build_crossref_index(args.dump, args.output)
+    except OSError as e:
+        print(f"Klaida: {e}", file=sys.stderr)
+        return 1
+    print(
+        f"DOI: {n_doi}, pavadinimu: {n_title} -> {args.output or default_index_path(args.dump)} "
+        f"({time.perf_counter() - started:.1f} s)",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,10 @@
 from __future__ import annotations
 
+import re
+from collections import defaultdict
 from dataclasses import dataclass
 
-from rapidfuzz import fuzz
-
-from .parse_bibliography import ParsedReference
+from .parse_bibliography import ParsedReference, _with_confidence
 
 
 @dataclass(frozen=True)
@@ -17,78 +17,459 @@ class DuplicatePair:
     reason: str
 
 
+@dataclass(frozen=True)
+class DuplicateCluster:
+    indices: tuple[int, ...]  # didejancia tvarka; pirmas = pirmas pasirodymas
+    canonical: ParsedReference
+    score: float  # stipriausios poros balas
+    reason: str
+
+
+# Pavadinimu blocking'as: simboliu n-gramos (shingles), ne sveiki zodziai,
+# todel raides klaida ar OCR pakeitimas sugadina tik kelias gramas.
+_SHINGLE = 4
+# Signatura: int(_PREFIX_SHARE * gramu skaicius) + _PREFIX_MIN reciausiu gramu
+_PREFIX_SHARE = 0.3
+_PREFIX_MIN = 4
+# Jei be dazniu zodziu lieka maziau raidziu, gramos imamos is visu zodziu
+_SHORT_CONTENT = 8
+_STOP_TOKENS = {
+    "the", "and", "for", "with", "from", "into", "of", "in", "on", "to",
+    "ir", "bei", "kaip", "apie", "del", "per",
+}
+_TOKEN_RE = re.compile(r"\w+")
+# Kandidatu poros, lyginamos vienu `cpdist` kvietimu
+_VERIFY_CHUNK = 100_000
+
+
 def _normalize(s: str | None) -> str:
     return (s or "").strip().lower()
 
 
-def _title_similarity(a: ParsedReference, b: ParsedReference) -> float:
-    ta = _normalize(a.title)
-    tb = _normalize(b.title)
-    if not ta or not tb:
-        return 0.0
-    return fuzz.token_sort_ratio(ta, tb)
+def _sorted_len(s: str) -> int:
+    """Ilgis eilutes, kuria token_sort_ratio lygina (zodziai sujungti tarpu)."""
+    words = s.split()
+    return sum(len(w) for w in words) + max(0, len(words) - 1)
+
+
+def _title_tokens(title: str) -> set[str]:
+    return {t for t in _TOKEN_RE.findall(title) if len(t) > 1}
+
+
+def _title_shingles(title: str) -> set[str]:
+    """
+    Pavadinimo zodziu n-gramos su tarpais galuose (" dat", "data", "ata ").
+
+    Dazni zodziai ("the", "ir") praleidziami; trumpiems pavadinimams, kuriu
+    prasmingi zodziai per trumpi, imami visi zodziai.
+    """
+    words = _TOKEN_RE.findall(title)
+    content = [w for w in words if len(w) > 1 and w not in _STOP_TOKENS]
+    if sum(len(w) for w in content) < _SHORT_CONTENT:
+        content = words
+    return {
+        f" {w} "[k:k + _SHINGLE]
+        for w in content
+        for k in range(max(1, len(w) + 3 - _SHINGLE))
+    }
+
+
+def _signature(grams: set[str], df: dict[str, int]) -> list[str]:
+    """
+    Reciausios pavadinimo gramos (pagal dazni, po to pagal grama), be
+    pasitaikanciu tik viename pavadinime. Ilgis proporcingas gramu skaiciui,
+    todel ilgam pavadinimui su keliomis klaidomis bendra grama dar lieka.
+    """
+    size = int(_PREFIX_SHARE * len(grams)) + _PREFIX_MIN
+    return sorted((g for g in grams if df[g] > 1), key=lambda g: (df[g], g))[:size]
+
+
+def _min_partner_len(length: int, title_threshold: float) -> float:
+    """Trumpiausias pavadinimas, su kuriuo token_sort_ratio dar gali pasiekti slenksti."""
+    return length * title_threshold / (200.0 - title_threshold)
+
+
+def _candidate_pairs(titles: list[str], title_threshold: float) -> set[tuple[int, int]]:
+    """
+    Kandidatu poros pagal pavadinimo n-gramu signatura.
+
+    Kiekvienas pavadinimas indeksuojamas pagal `_signature` (inverted index),
+    todel dazni zodziai ir gramos nesukuria kvadratinio kandidatu kiekio, o
+    klaidos viename zodyje poros nepameta. Pavadinimai einami ilgio tvarka,
+    tad kiekvieno indekso saraso ilgiai didejantys ir poros, kuriu ilgiu
+    santykis negali pasiekti `title_threshold` (token_sort_ratio <=
+    200 * min / (la + lb)), praleidziamos dvejetainiu paieska.
+    """
+    from bisect import bisect_left
+
+    gram_sets = [_title_shingles(t) if t else set() for t in titles]
+    lengths = [_sorted_len(t) for t in titles]
+
+    df: dict[str, int] = defaultdict(int)
+    for grams in gram_sets:
+        for g in grams:
+            df[g] += 1
+
+    posting_lens: dict[str, list[int]] = defaultdict(list)
+    posting_ids: dict[str, list[int]] = defaultdict(list)
+    pairs: set[tuple[int, int]] = set()
+    for j in sorted(range(len(titles)), key=lambda k: (lengths[k], k)):
+        if not gram_sets[j]:
+            continue
+        lj = lengths[j]
+        lo = _min_partner_len(lj, title_threshold)
+        for g in _signature(gram_sets[j], df):
+            lens, ids = posting_lens[g], posting_ids[g]
+            for i in ids[bisect_left(lens, lo):]:
+                pairs.add((i, j) if i < j else (j, i))
+            lens.append(lj)
+            ids.append(j)
+    return pairs
+
+
+def _combine(
+    year: str | None,
+    title_sim: float,
+    author_sim: float,
+    same_year: bool,
+) -> tuple[float, str] | None:
+    combined = title_sim * 0.6 + author_sim * 0.3 + (10.0 if same_year else 0.0)
+    if combined < 70.0:
+        return None
+    reasons = []
+    reasons.append(f"Pavadinimai panasus ({title_sim:.0f}%)")
+    if author_sim > 50:
+        reasons.append(f"autoriai panasus ({author_sim:.0f}%)")
+    if same_year:
+        reasons.append(f"tie patys metai ({year})")
+    return combined, "; ".join(reasons)
+
+
+def _make_pair(
+    i: int,
+    j: int,
+    a: ParsedReference,
+    b: ParsedReference,
+    title_sim: float,
+    author_sim: float,
+    same_year: bool,
+) -> DuplicatePair | None:
+    scored = _combine(a.year, title_sim, author_sim, same_year)
+    if scored is None:
+        return None
+    return DuplicatePair(
+        index_a=i, index_b=j, ref_a=a, ref_b=b,
+        score=scored[0], reason=scored[1],
+    )
+
+
+def score_references(
+    a: ParsedReference,
+    b: ParsedReference,
+    title_threshold: float = 80.0,
+) -> tuple[float, str] | None:
+    """Ta pati taisykle kaip `find_duplicates`, vienai porai: (balas, priezastis) arba None."""
+    from rapidfuzz import fuzz
+
+    da, db = _normalize(a.doi), _normalize(b.doi)
+    if da and da == db:
+        return 100.0, "DOI sutampa"
+    ta, tb = _normalize(a.title), _normalize(b.title)
+    title_sim = fuzz.token_sort_ratio(ta, tb) if ta and tb else 0.0
+    if title_sim < title_threshold:
+        return None
+    aa, ab = _normalize(a.author), _normalize(b.author)
+    author_sim = fuzz.token_sort_ratio(aa, ab) if aa and ab else 0.0
+    same_year = bool(a.year and b.year and a.year == b.year)
+    return _combine(a.year, title_sim, author_sim, same_year)
 
 
-def _author_similarity(a: ParsedReference, b: ParsedReference) -> float:
-    aa = _normalize(a.author)
-    ab = _normalize(b.author)
-    if not aa or not ab:
-        return 0.0
-    return fuzz.token_sort_ratio(aa, ab)
+def _doi_pairs(dois: list[str]) -> set[tuple[int, int]]:
+    by_doi: dict[str, list[int]] = defaultdict(list)
+    for i, doi in enumerate(dois):
+        if doi:
+            by_doi[doi].append(i)
 
+    pairs: set[tuple[int, int]] = set()
+    for idxs in by_doi.values():
+        for pos, i in enumerate(idxs):
+            for j in idxs[pos + 1:]:
+                pairs.add((i, j))
+    return pairs
 
-def _doi_match(a: ParsedReference, b: ParsedReference) -> bool:
-    da = _normalize(a.doi)
-    db = _normalize(b.doi)
-    return bool(da and db and da == db)
+
+def _title_pairs_index(
+    refs: list[ParsedReference],
+    titles: list[str],
+    authors: list[str],
+    title_threshold: float,
+    skip: set[tuple[int, int]],
+) -> list[DuplicatePair]:
+    """
+    Fuzzy lyginimas tik `_candidate_pairs` kandidatams. Pavadinimu panasumas
+    skaiciuojamas `rapidfuzz.process.cpdist` paketais po `_VERIFY_CHUNK` poru,
+    autoriu - tik poroms, kurios praejo pavadinimo slenksti.
+
+    token_sort_ratio = ratio tarp surikiuotu zodziu eiluciu, todel kiekvienas
+    pavadinimas surikiuojamas viena karta, o ne kiekvienai porai is naujo.
+    Poru tvarka nesvarbi: `find_duplicates` rezultata rikiuoja pati.
+    """
+    from rapidfuzz import fuzz, process
+
+    sorted_titles = [" ".join(sorted(t.split())) for t in titles]
+    candidates = list(_candidate_pairs(titles, title_threshold) - skip)
+    out: list[DuplicatePair] = []
+    for start in range(0, len(candidates), _VERIFY_CHUNK):
+        chunk = candidates[start:start + _VERIFY_CHUNK]
+        sims = process.cpdist(
+            [sorted_titles[i] for i, _ in chunk],
+            [sorted_titles[j] for _, j in chunk],
+            scorer=fuzz.ratio,
+            score_cutoff=title_threshold,
+            dtype="float64",
+            workers=-1,
+        )
+        for (i, j), title_sim in zip(chunk, sims.tolist()):
+            if title_sim < title_threshold:
+                continue
+            a, b = refs[i], refs[j]
+            aa, ab = authors[i], authors[j]
+            author_sim = fuzz.token_sort_ratio(aa, ab) if aa and ab else 0.0
+            same_year = bool(a.year and b.year and a.year == b.year)
+            pair = _make_pair(i, j, a, b, title_sim, author_sim, same_year)
+            if pair is not None:
+                out.append(pair)
+    return out
+
+
+def _title_pairs_matrix(
+    refs: list[ParsedReference],
+    titles: list[str],
+    authors: list[str],
+    title_threshold: float,
+    skip: set[tuple[int, int]],
+    block_cells: int,
+) -> list[DuplicatePair]:
+    """
+    Pavadinimu panasumo matrica blokais per `rapidfuzz.process.cdist`.
+
+    Eilutes skaiciuojamos po tiek, kad bloke butu ne daugiau `block_cells`
+    langeliu, todel atmintis priklauso nuo bloko dydzio, ne nuo n^2.
+    Autoriu panasumas ir metu sutapimas skaiciuojami NumPy tik porom,
+    kurios praejo pavadinimo slenksti.
+    """
+    import numpy as np
+    from rapidfuzz import fuzz, process
+
+    n = len(refs)
+    if n < 2:
+        return []
+
+    has_title = np.fromiter((bool(t) for t in titles), dtype=bool, count=n)
+    has_author = np.fromiter((bool(a) for a in authors), dtype=bool, count=n)
+    year_codes: dict[str, int] = {}
+    years = np.fromiter(
+        (year_codes.setdefault(r.year, len(year_codes)) if r.year else -1 for r in refs),
+        dtype=np.int64,
+        count=n,
+    )
+
+    rows_per_block = max(1, block_cells // n)
+    found_i: list[np.ndarray] = []
+    found_j: list[np.ndarray] = []
+    found_sim: list[np.ndarray] = []
+    for start in range(0, n - 1, rows_per_block):
+        stop = min(n - 1, start + rows_per_block)
+        block = process.cdist(
+            titles[start:stop],
+            titles[start:],
+            scorer=fuzz.token_sort_ratio,
+            score_cutoff=title_threshold,
+            dtype=np.float64,
+            workers=-1,
+        )
+        # tik virs istrizaines (j > i)
+        block = np.triu(block, k=1)
+        bi, bj = np.nonzero(block >= title_threshold)
+        if not len(bi):
+            continue
+        gi = bi + start
+        gj = bj + start
+        keep = has_title[gi] & has_title[gj]
+        found_i.append(gi[keep])
+        found_j.append(gj[keep])
+        found_sim.append(block[bi[keep], bj[keep]])
+
+    if not found_i:
+        return []
+    pi = np.concatenate(found_i)
+    pj = np.concatenate(found_j)
+    title_sim = np.concatenate(found_sim)
+
+    author_sim = np.asarray(
+        process.cpdist(
+            [authors[i] for i in pi],
+            [authors[j] for j in pj],
+            scorer=fuzz.token_sort_ratio,
+            dtype=np.float64,
+            workers=-1,
+        ),
+        dtype=np.float64,
+    )
+    author_sim[~(has_author[pi] & has_author[pj])] = 0.0
+    same_year = (years[pi] == years[pj]) & (years[pi] >= 0)
+    combined = title_sim * 0.6 + author_sim * 0.3 + np.where(same_year, 10.0, 0.0)
+
+    out: list[DuplicatePair] = []
+    for k in np.nonzero(combined >= 70.0)[0]:
+        i, j = int(pi[k]), int(pj[k])
+        if (i, j) in skip:
+            continue
+        pair = _make_pair(
+            i, j, refs[i], refs[j],
+            float(title_sim[k]), float(author_sim[k]), bool(same_year[k]),
+        )
+        if pair is not None:
+            out.append(pair)
+    return out
 
 
 def find_duplicates(
     refs: list[ParsedReference],
     title_threshold: float = 80.0,
     author_threshold: float = 70.0,
+    method: str = "index",
+    block_cells: int = 4_000_000,
 ) -> list[DuplicatePair]:
     """
     Suranda galimus dublikatus tarp saltintu saraso.
     Lygina: DOI (tikslus), pavadinima (fuzzy), autoriu + metus.
+
+    Poros nebelyginamos visos tarpusavyje: DOI sutapimai randami per hash
+    zemelapi, o pavadinimai lyginami pagal `method`:
+    - "index": fuzzy lyginimas tik kandidatams is pavadinimu n-gramu indekso
+    - "matrix": visa panasumo matrica blokais per `rapidfuzz.process.cdist`
+      (visi branduoliai, atmintis ribojama `block_cells`)
     """
-    duplicates: list[DuplicatePair] = []
-    n = len(refs)
+    if method not in ("index", "matrix"):
+        raise ValueError(f"Nezinomas dublikatu paieskos metodas: {method}")
 
-    for i in range(n):
-        for j in range(i + 1, n):
-            a, b = refs[i], refs[j]
+    titles = [_normalize(r.title) for r in refs]
+    authors = [_normalize(r.author) for r in refs]
+    dois = [_normalize(r.doi) for r in refs]
 
-            # 1) DOI sutapimas - tikslus dublikatas
-            if _doi_match(a, b):
-                duplicates.append(DuplicatePair(
-                    index_a=i, index_b=j, ref_a=a, ref_b=b,
-                    score=100.0, reason="DOI sutampa",
-                ))
-                continue
+    # 1) DOI sutapimas - tikslus dublikatas
+    doi_pairs = _doi_pairs(dois)
+    duplicates: list[DuplicatePair] = [
+        DuplicatePair(
+            index_a=i, index_b=j, ref_a=refs[i], ref_b=refs[j],
+            score=100.0, reason="DOI sutampa",
+        )
+        for i, j in doi_pairs
+    ]
 
-            # 2) Pavadinimo panasumas
-            title_sim = _title_similarity(a, b)
-            if title_sim < title_threshold:
-                continue
+    # 2) Pavadinimo panasumas + 3) papildomi signalai
+    if method == "matrix":
+        duplicates.extend(
+            _title_pairs_matrix(refs, titles, authors, title_threshold, doi_pairs, block_cells)
+        )
+    else:
+        duplicates.extend(_title_pairs_index(refs, titles, authors, title_threshold, doi_pairs))
 
-            # 3) Papildomi signalai
-            author_sim = _author_similarity(a, b)
-            same_year = (a.year and b.year and a.year == b.year)
-
-            combined = title_sim * 0.6 + author_sim * 0.3 + (10.0 if same_year else 0.0)
-
-            if combined >= 70.0:
-                reasons = []
-                reasons.append(f"Pavadinimai panasus ({title_sim:.0f}%)")
-                if author_sim > 50:
-                    reasons.append(f"autoriai panasus ({author_sim:.0f}%)")
-                if same_year:
-                    reasons.append(f"tie patys metai ({a.year})")
-                duplicates.append(DuplicatePair(
-                    index_a=i, index_b=j, ref_a=a, ref_b=b,
-                    score=combined, reason="; ".join(reasons),
-                ))
-
-    duplicates.sort(key=lambda d: d.score, reverse=True)
+    duplicates.sort(key=lambda d: (-d.score, d.index_a, d.index_b))
     return duplicates
+
+
+# Laukai, kuriuos sujungimas ima is patikimiausio iraso, kuris juos turi
+_MERGE_FIELDS = (
+    "title", "year", "journal", "volume", "issue",
+    "pages", "publisher", "doi", "url",
+)
+
+
+def merge_references(refs: list[ParsedReference]) -> ParsedReference:
+    """
+    Sujungia to paties saltinio irasus i viena kanonini irasa.
+    Kiekvienas laukas imamas is didziausio pasitikejimo iraso, kuriame jis yra.
+    """
+    ranked = sorted(refs, key=lambda r: r.confidence, reverse=True)
+    base = ranked[0]
+    merged = dict(base.__dict__)
+    for name in _MERGE_FIELDS:
+        merged[name] = next((getattr(r, name) for r in ranked if getattr(r, name)), None)
+    # autorius ir autoriu sarasas imami kartu, kad nesimaisytu skirtingi irasai
+    author_src = next((r for r in ranked if r.author or r.authors), base)
+    merged["author"] = author_src.author
+    merged["authors"] = author_src.authors
+    canonical = _with_confidence(ParsedReference(**merged))
+    if canonical.confidence < base.confidence:
+        return base
+    return ParsedReference(**{**canonical.__dict__, "parser": base.parser})
+
+
+def cluster_duplicates(
+    refs: list[ParsedReference],
+    pairs: list[DuplicatePair],
+) -> list[DuplicateCluster]:
+    """
+    Sujungia dublikatu poras i grupes (union-find) ir kiekvienai grupei
+    sukuria kanonini irasa. Grupes rikiuojamos pagal pirma pasirodyma.
+    """
+    parent: dict[int, int] = {}
+
+    def find(x: int) -> int:
+        root = x
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while parent.get(x, x) != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    for p in pairs:
+        ra, rb = find(p.index_a), find(p.index_b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+        parent.setdefault(p.index_a, p.index_a)
+        parent.setdefault(p.index_b, p.index_b)
+
+    best: dict[int, DuplicatePair] = {}
+    for p in pairs:
+        root = find(p.index_a)
+        if root not in best or p.score > best[root].score:
+            best[root] = p
+
+    members: dict[int, list[int]] = defaultdict(list)
+    for x in list(parent):
+        members[find(x)].append(x)
+
+    clusters: list[DuplicateCluster] = []
+    for root in sorted(members):
+        idxs = tuple(sorted(members[root]))
+        top = best[root]
+        clusters.append(DuplicateCluster(
+            indices=idxs,
+            canonical=merge_references([refs[i] for i in idxs]),
+            score=top.score,
+            reason=top.reason,
+        ))
+    return clusters
+
+
+def deduplicate(
+    refs: list[ParsedReference],
+    clusters: list[DuplicateCluster],
+) -> list[ParsedReference]:
+    """
+    Grazina saltinius be dublikatu: kiekviena grupe pakeiciama jos kanoniniu
+    irasu pirmo pasirodymo vietoje, likusieji grupes nariai praleidziami.
+    """
+    canonical_at: dict[int, ParsedReference] = {}
+    skip: set[int] = set()
+    for c in clusters:
+        canonical_at[c.indices[0]] = c.canonical
+        skip.update(c.indices[1:])
+    return [
+        canonical_at.get(i, r)
+        for i, r in enumerate(refs)
+        if i not in skip
+    ]
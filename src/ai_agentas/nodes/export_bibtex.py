@@ -3,10 +3,6 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Any
 
-import bibtexparser
-from bibtexparser.bwriter import BibTexWriter
-from bibtexparser.bibdatabase import BibDatabase
-
 from ai_agentas.utils.citekeys import make_citekey
 
 from .parse_bibliography import ParsedReference
@@ -32,14 +28,47 @@ def _guess_entry_type(ref: ParsedReference) -> str:
     return "misc"
 
 
-def _to_bib_entry(ref: ParsedReference, fallback_index: int) -> tuple[str, dict[str, Any]]:
-    entry_type = _guess_entry_type(ref)
-
+def _bib_author(ref: ParsedReference) -> str:
     author_list = ref.authors if ref.authors else ([ref.author] if ref.author else ["Anon"])
-    author = " and ".join(a for a in author_list if a)
+    return " and ".join(a for a in author_list if a)
+
+
+def _bib_title(ref: ParsedReference, fallback_index: int) -> str:
+    return ref.title or f"Untitled {fallback_index}"
+
+
+def citekey_base(ref: ParsedReference, fallback_index: int) -> str:
+    """Citekey be unikalumo priesagos (`fallback_index` - 1-based vieta eksporte)."""
     year = ref.year or "n.d."
-    title = ref.title or f"Untitled {fallback_index}"
-    citekey = make_citekey(author, year if year != "n.d." else None, title)
+    return make_citekey(_bib_author(ref), year if year != "n.d." else None, _bib_title(ref, fallback_index))
+
+
+def assign_citekeys(refs: list[ParsedReference], used: set[str] | None = None) -> dict[int, str]:
+    """
+    Unikalus citekey kiekvienam irasui (indeksas -> citekey), toks pat kaip
+    `export_bibtex`, bet be BibTeX generavimo (pvz. DOCX atnaujinimui).
+    `used` - jau uzimti citekey (papildomas naujais), kai irasai pridedami
+    prie esamo eksporto.
+    """
+    citekey_by_index: dict[int, str] = {}
+    if used is None:
+        used = set()
+    for i, ref in enumerate(refs):
+        base = citekey_base(ref, i + 1)
+        ck = base
+        suffix = 0
+        while ck in used:
+            suffix += 1
+            ck = f"{base}{suffix}"
+        used.add(ck)
+        citekey_by_index[i] = ck
+    return citekey_by_index
+
+
+def _to_bib_entry(ref: ParsedReference, fallback_index: int, citekey: str) -> dict[str, Any]:
+    entry_type = _guess_entry_type(ref)
+    author = _bib_author(ref)
+    title = _bib_title(ref, fallback_index)
 
     fields: dict[str, Any] = {
         "ENTRYTYPE": entry_type,
@@ -65,28 +94,22 @@ def _to_bib_entry(ref: ParsedReference, fallback_index: int) -> tuple[str, dict[
     if ref.publisher:
         fields["publisher"] = ref.publisher
 
-    return citekey, fields
+    return fields
 
 
-def export_bibtex(refs: list[ParsedReference]) -> BibtexExport:
-    db = BibDatabase()
-    citekey_by_index: dict[int, str] = {}
-    entries = []
-    used: set[str] = set()
+def export_bibtex(refs: list[ParsedReference], citekey_by_index: dict[int, str] | None = None) -> BibtexExport:
+    """`citekey_by_index` - is anksto priskirti citekey (numatytai `assign_citekeys`)."""
+    import bibtexparser
+    from bibtexparser.bwriter import BibTexWriter
+    from bibtexparser.bibdatabase import BibDatabase
 
-    for i, ref in enumerate(refs):
-        ck, ent = _to_bib_entry(ref, fallback_index=i + 1)
-        base = ck
-        suffix = 0
-        while ck in used:
-            suffix += 1
-            ck = f"{base}{suffix}"
-            ent["ID"] = ck
-        used.add(ck)
-        citekey_by_index[i] = ck
-        entries.append(ent)
-
-    db.entries = entries
+    db = BibDatabase()
+    if citekey_by_index is None:
+        citekey_by_index = assign_citekeys(refs)
+    db.entries = [
+        _to_bib_entry(ref, fallback_index=i + 1, citekey=citekey_by_index[i])
+        for i, ref in enumerate(refs)
+    ]
     writer = BibTexWriter()
     writer.indent = "  "
     bib = bibtexparser.dumps(db, writer)
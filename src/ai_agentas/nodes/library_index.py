@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from ai_agentas.utils.citekeys import surname_key
+
+from .duplicates import _min_partner_len, _normalize, _signature, _sorted_len, _title_shingles, score_references
+from .parse_bibliography import ParsedReference
+
+
+# Saugomos visos pavadinimo n-gramos (`_title_shingles`) ir ju daznis
+# bibliotekoje. Paieskoje naudojama `_candidate_pairs` signatura (reciausios
+# uzklausos gramos), bet irasas randamas, jei turi bent viena jos grama -
+# ne tik bendra signaturos grama, todel atgaminimas ne mazesnis nei batch'e,
+# o dazniams keiciantis pridetu irasu perindeksuoti nereikia.
+_SCHEMA_VERSION = 2  # 1 - 4 sveiki pavadinimo zodziai (crc32 tvarka)
+# SQLite uzklausos parametru riba senesnese versijose - 999
+_MAX_VARIABLES = 900
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS refs (
+    id INTEGER PRIMARY KEY,
+    doi TEXT,
+    author_year TEXT,
+    source TEXT,
+    title TEXT,  -- normalizuotas pavadinimas (tikrinamas pries iskleidziant `data`)
+    title_len INTEGER,  -- `_sorted_len(title)` (ilgio filtrui)
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS refs_doi ON refs(doi) WHERE doi IS NOT NULL;
+CREATE INDEX IF NOT EXISTS refs_author_year ON refs(author_year) WHERE author_year IS NOT NULL;
+CREATE INDEX IF NOT EXISTS refs_source ON refs(source);
+"""
+
+_TITLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS title_sig (
+    token TEXT NOT NULL,
+    title_len INTEGER NOT NULL,  -- kaip `refs.title_len`: ilgio filtras be JOIN
+    ref_id INTEGER NOT NULL REFERENCES refs(id),
+    PRIMARY KEY (token, title_len, ref_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS title_sig_ref ON title_sig(ref_id);
+CREATE TABLE IF NOT EXISTS gram_df (token TEXT PRIMARY KEY, n INTEGER NOT NULL) WITHOUT ROWID;
+"""
+
+
+@dataclass(frozen=True)
+class LibraryMatch:
+    index: int  # iraso indeksas tikrinamame sarase
+    ref: ParsedReference
+    library_id: int
+    library_ref: ParsedReference
+    source: str | None  # dokumentas, is kurio irasas pateko i biblioteka
+    score: float
+    reason: str
+
+
+def _title_grams(title: str | None) -> tuple[str, set[str]]:
+    """Normalizuotas pavadinimas ir jo n-gramos (kaip `_candidate_pairs`)."""
+    norm = _normalize(title)
+    return norm, _title_shingles(norm) if norm else set()
+
+
+def _chunks(items: list, size: int = _MAX_VARIABLES) -> Iterator[list]:
+    for at in range(0, len(items), size):
+        yield items[at:at + size]
+
+
+def _author_year(ref: ParsedReference) -> str | None:
+    surname = surname_key(ref.author)
+    if not surname or not ref.year:
+        return None
+    return f"{surname}:{ref.year}"
+
+
+def _to_json(ref: ParsedReference) -> str:
+    return json.dumps(ref.__dict__, ensure_ascii=False)
+
+
+def _from_json(data: str) -> ParsedReference:
+    return ParsedReference(**json.loads(data))
+
+
+class LibraryIndex:
+    """
+    Vietine (SQLite) sukauptu saltiniu biblioteka dublikatu paieskai.
+
+    Kiekvienam irasui saugomi normalizuotas DOI, pavardes+metu raktas ir
+    pavadinimo n-gramos, visi indeksuoti. Paieska eina tik per indeksus,
+    todel nauja irasa patikrinti kainuoja milisekundes ir 100k irasu
+    bibliotekoje, o nauji irasai pridedami be perskenavimo.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = str(path)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA + _TITLE_SCHEMA)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < _SCHEMA_VERSION:
+            self._reindex_titles()
+
+    def _reindex_titles(self) -> None:
+        """Senesnes versijos biblioteka: pavadinimu indeksas perskaiciuojamas is irasu."""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(refs)")}
+        with self._conn:
+            for column in ("title TEXT", "title_len INTEGER"):
+                if column.split()[0] not in columns:
+                    self._conn.execute(f"ALTER TABLE refs ADD COLUMN {column}")
+            self._conn.execute("DROP TABLE title_sig")
+            self._conn.execute("DROP TABLE gram_df")
+        self._conn.executescript(_TITLE_SCHEMA)
+        with self._conn:
+            rows = self._conn.execute("SELECT id, data FROM refs ORDER BY id").fetchall()
+            titles = [(ref_id, *_title_grams(_from_json(data).title)) for ref_id, data in rows]
+            self._conn.executemany(
+                "UPDATE refs SET title = ?, title_len = ? WHERE id = ?",
+                [(norm or None, _sorted_len(norm) if grams else None, ref_id) for ref_id, norm, grams in titles],
+            )
+            self._index_grams((ref_id, norm, grams) for ref_id, norm, grams in titles)
+            self._conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    def _index_grams(self, titles: Iterable[tuple[int, str, set[str]]]) -> None:
+        """Iraso (id, pavadinimas, n-gramos) i `title_sig` ir padidina `gram_df` (kvieciama transakcijoje)."""
+        df: Counter[str] = Counter()
+        rows: list[tuple[str, int, int]] = []
+        for ref_id, norm, grams in titles:
+            df.update(grams)
+            length = _sorted_len(norm)
+            rows.extend((g, length, ref_id) for g in grams)
+        self._conn.executemany("INSERT INTO title_sig (token, title_len, ref_id) VALUES (?, ?, ?)", rows)
+        self._conn.executemany(
+            "INSERT INTO gram_df (token, n) VALUES (?, ?) ON CONFLICT(token) DO UPDATE SET n = n + excluded.n",
+            df.items(),
+        )
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> LibraryIndex:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM refs").fetchone()[0]
+
+    def add(self, refs: list[ParsedReference], source: str | None = None) -> list[int]:
+        """Prideda irasus i biblioteka ir grazina ju id."""
+        ids: list[int] = []
+        titles: list[tuple[int, str, set[str]]] = []
+        with self._conn:
+            for ref in refs:
+                norm, grams = _title_grams(ref.title)
+                cur = self._conn.execute(
+                    "INSERT INTO refs (doi, author_year, source, data, title, title_len) VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        _normalize(ref.doi) or None, _author_year(ref), source, _to_json(ref),
+                        norm or None, _sorted_len(norm) if grams else None,
+                    ),
+                )
+                ids.append(cur.lastrowid)
+                titles.append((cur.lastrowid, norm, grams))
+            self._index_grams(titles)
+        return ids
+
+    def remove_source(self, source: str, keep: dict[int, str] | None = None) -> int:
+        """
+        Pasalina visus is `source` dokumento pridetus irasus (pvz. failas
+        pakeistas). `keep` - irasai (id -> naujas saltinis), kuriuos cituoja ir
+        kiti dokumentai: jie lieka bibliotekoje su nauju saltiniu.
+        Grazina pasalintu irasu skaiciu.
+        """
+        with self._conn:
+            if keep:
+                self._conn.executemany(
+                    "UPDATE refs SET source = ? WHERE id = ? AND source = ?",
+                    [(new_source, ref_id, source) for ref_id, new_source in keep.items()],
+                )
+            removed = self._conn.execute(
+                "SELECT s.token, COUNT(*) FROM title_sig s JOIN refs r ON r.id = s.ref_id "
+                "WHERE r.source = ? GROUP BY s.token",
+                (source,),
+            ).fetchall()
+            self._conn.executemany("UPDATE gram_df SET n = n - ? WHERE token = ?", [(n, g) for g, n in removed])
+            self._conn.execute("DELETE FROM gram_df WHERE n <= 0")
+            self._conn.execute(
+                "DELETE FROM title_sig WHERE ref_id IN (SELECT id FROM refs WHERE source = ?)", (source,)
+            )
+            return self._conn.execute("DELETE FROM refs WHERE source = ?", (source,)).rowcount
+
+    def refs(self, after_id: int = 0) -> Iterator[tuple[int, str | None, ParsedReference]]:
+        """Bibliotekos irasai (id, saltinis, irasas) id tvarka, tik su id > `after_id`."""
+        rows = self._conn.execute(
+            "SELECT id, source, data FROM refs WHERE id > ? ORDER BY id", (after_id,)
+        )
+        for ref_id, source, data in rows:
+            yield ref_id, source, _from_json(data)
+
+    def candidates(
+        self,
+        ref: ParsedReference,
+        title_threshold: float = 80.0,
+    ) -> list[tuple[int, str | None, ParsedReference]]:
+        """
+        Kandidatai is indeksu: tas pats DOI arba pavadinimas, turintis bent
+        viena uzklausos signaturos n-grama, tinkamo ilgio ir pasiekiantis
+        `title_threshold` (kaip `score_references`); be pavadinimo - tas pats
+        autorius+metai.
+        """
+        from rapidfuzz import fuzz
+
+        ids: set[int] = set()
+        doi = _normalize(ref.doi)
+        if doi:
+            ids.update(r for (r,) in self._conn.execute("SELECT id FROM refs WHERE doi = ?", (doi,)))
+        norm, grams = _title_grams(ref.title)
+        if grams:
+            # dazniai kaip `_candidate_pairs`, jei uzklausa butu bibliotekoje (+1):
+            # gramos, kuriu bibliotekoje nera, i signatura nepatenka
+            df: dict[str, int] = {}
+            for chunk in _chunks(sorted(grams)):
+                df.update(
+                    (g, n + 1) for g, n in self._conn.execute(
+                        f"SELECT token, n FROM gram_df WHERE token IN ({','.join('?' * len(chunk))})", chunk
+                    )
+                )
+            length = _sorted_len(norm)
+            lo = _min_partner_len(length, title_threshold)
+            hi = length * (200.0 - title_threshold) / max(title_threshold, 1.0)
+            near: set[int] = set()
+            for chunk in _chunks(_signature(set(df), df)):
+                near.update(r for (r,) in self._conn.execute(
+                    f"SELECT ref_id FROM title_sig WHERE token IN ({','.join('?' * len(chunk))}) "
+                    "AND title_len BETWEEN ? AND ?",
+                    (*chunk, lo, hi),
+                ))
+            near -= ids
+            for chunk in _chunks(sorted(near)):
+                ids.update(r for r, title in self._conn.execute(
+                    f"SELECT id, title FROM refs WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ) if fuzz.token_sort_ratio(norm, title) >= title_threshold)
+        else:
+            # be pavadinimo lieka tik pavardes+metu raktas
+            ay = _author_year(ref)
+            if ay:
+                ids.update(r for (r,) in self._conn.execute(
+                    "SELECT id FROM refs WHERE author_year = ?", (ay,)
+                ))
+        out: list[tuple[int, str | None, ParsedReference]] = []
+        for chunk in _chunks(sorted(ids)):
+            rows = self._conn.execute(
+                f"SELECT id, source, data FROM refs WHERE id IN ({','.join('?' * len(chunk))}) ORDER BY id",
+                chunk,
+            )
+            out.extend((ref_id, source, _from_json(data)) for ref_id, source, data in rows)
+        return out
+
+    def lookup(
+        self,
+        ref: ParsedReference,
+        title_threshold: float = 80.0,
+    ) -> tuple[int, str | None, ParsedReference, float, str] | None:
+        """Geriausias bibliotekos atitikmuo pagal `find_duplicates` taisykle arba None."""
+        best = None
+        for ref_id, source, lib_ref in self.candidates(ref, title_threshold):
+            scored = score_references(ref, lib_ref, title_threshold)
+            if scored is not None and (best is None or scored[0] > best[3]):
+                best = (ref_id, source, lib_ref, scored[0], scored[1])
+        return best
+
+
+def find_library_duplicates(
+    refs: list[ParsedReference],
+    library: LibraryIndex,
+    title_threshold: float = 80.0,
+) -> list[LibraryMatch]:
+    """Pazymi irasus, kurie jau yra sukauptoje bibliotekoje."""
+    matches: list[LibraryMatch] = []
+    for i, ref in enumerate(refs):
+        hit = library.lookup(ref, title_threshold)
+        if hit is None:
+            continue
+        ref_id, source, lib_ref, score, reason = hit
+        matches.append(LibraryMatch(
+            index=i, ref=ref, library_id=ref_id, library_ref=lib_ref,
+            source=source, score=score, reason=reason,
+        ))
+    return matches
@@ -355,6 +355,34 @@ def parse_reference(raw_entry: str) -> ParsedReference:
     return ParsedReference(**{**best.__dict__, "raw": raw_entry})
 
 
+# Zemesnio pasitikejimo riba: tokie irasai siunciami zymetojui (`parse_references`),
+# ju laukams pirmenybe teikiama Crossref reiksmems (`RunConfig.enrich_threshold`)
+# ir UI jie zymimi perziurai. Tas pats kaip `.env.example` LLM_FALLBACK_CONFIDENCE_THRESHOLD.
+LOW_CONFIDENCE = 0.55
+
+
+def parse_references(entries: list[str], labeler_model: str | None = None) -> list[ParsedReference]:
+    """
+    `parse_reference` kiekvienam irasui; jei nurodytas `labeler_model`,
+    irasai su pasitikejimu < `LOW_CONFIDENCE` dar karta isparsinami zymetoju
+    (visi kartu, viena partija) ir paimamas patikimesnis rezultatas.
+    """
+    refs = [parse_reference(e) for e in entries]
+    if not labeler_model:
+        return refs
+    low = [i for i, ref in enumerate(refs) if ref.confidence < LOW_CONFIDENCE]
+    if not low:
+        return refs
+    from .token_labeler import load_labeler
+
+    labeler = load_labeler(labeler_model)
+    labeled = labeler.parse([_normalize_ocr_noise(_strip_num_prefix(entries[i])) for i in low])
+    for i, ref in zip(low, labeled):
+        if ref.confidence > refs[i].confidence:
+            refs[i] = ParsedReference(**{**ref.__dict__, "raw": entries[i]})
+    return refs
+
+
 def parse_bibliography_text(bibliography_text: str) -> list[ParsedReference]:
     entries = bibliography_to_entries(bibliography_text)
     if not entries:
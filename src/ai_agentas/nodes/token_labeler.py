@@ -0,0 +1,414 @@
+"""
+Zodziu lygio lauku zymetojas (sequence labeling) nepatikimai isparsintiems irasams.
+
+Kiekvienas iraso zodis (token) gauna zyme: author, year, title, container,
+volume, issue, pages, doi arba other. Modelis - tiesinis (hash'uoti zodzio ir
+kaimynu pozymiai) su zymiu perejimu matrica, apmokomas offline vidurkintu
+strukturiniu perceptronu ir saugomas kaip `.npz`. Inferencija vektorizuota:
+visu partijos irasu zodziu balai skaiciuojami vienu NumPy indeksavimu, o
+Viterbi dekodavimas eina per visa partija is karto.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable, Sequence
+
+from ai_agentas.utils.text_norm import norm_ws
+
+from .parse_bibliography import ParsedReference, _DOI_CLEAN_RE, _split_authors, _YEAR_RE, _with_confidence
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+LABELS = ("other", "author", "year", "title", "container", "volume", "issue", "pages", "doi")
+# Mokymo duomenu laukai -> zyme (priskiriami siuo eiliskumu: ilgi laukai pirmi)
+_FIELD_LABELS = (
+    ("title", "title"), ("author", "author"), ("journal", "container"), ("doi", "doi"),
+    ("pages", "pages"), ("year", "year"), ("volume", "volume"), ("issue", "issue"),
+)
+_FEATURE_VERSION = 1
+_DIM_BITS = 16
+_DIM = 1 << _DIM_BITS  # hash'uotu pozymiu erdve
+_N_FEATURES = 12  # pozymiu kiekvienam zodziui (fiksuotas, kad balus butu galima surinkti vienu indeksavimu)
+
+_TOKEN_RE = re.compile(r"\w+(?:[-'.]\w+)*|[^\w\s]")
+_SHAPE_RE = (re.compile(r"[A-Z]"), re.compile(r"[a-z]"), re.compile(r"\d"))
+_STRIP = " .,;:()[]\"'“”«»„"
+# autoriu laukas: paskutinio inicialo taskas paliekamas ("Lee, B.")
+_AUTHOR_STRIP = _STRIP.replace(".", "")
+_QUOTES = "\"“”«»„"
+
+
+def _shape(tok: str) -> str:
+    s = _SHAPE_RE[2].sub("d", _SHAPE_RE[1].sub("x", _SHAPE_RE[0].sub("X", tok)))
+    return re.sub(r"(.)\1{2,}", r"\1\1", s)
+
+
+def _tokens(text: str) -> list[re.Match[str]]:
+    return list(_TOKEN_RE.finditer(text))
+
+
+def _crc(s: str) -> int:
+    return zlib.crc32(s.encode("utf-8"))
+
+
+@lru_cache(maxsize=1 << 16)
+def _token_codes(tok: str) -> tuple[int, int, int, int, bool, bool]:
+    """Zodzio savybiu kodai (zodis, forma, pradzia, pabaiga) ir ar tai metai / kabute."""
+    low = tok.lower()
+    return (
+        _crc(low), _crc(_shape(tok)), _crc(low[:3]), _crc(low[-3:]),
+        _YEAR_RE.fullmatch(tok) is not None, tok in _QUOTES,
+    )
+
+
+# zodzio pradzios / pabaigos kodai ("<s>", "</s>") kaimynu pozymiams
+_EDGE = (_crc("<s>"), _crc("</s>"))
+
+
+def _features(tokens: list[list[str]]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Visos partijos pozymiai vienu kartu: grazina ([zodziu, `_N_FEATURES`]
+    pozymiu indeksai is eiles, [irasu] ilgiai). Zodziu kodai imami is
+    talpyklos, o kaimynu, pozicijos ir kombinuoti pozymiai skaiciuojami NumPy.
+    """
+    import numpy as np
+
+    lengths = np.array([len(t) for t in tokens], dtype=np.int64)
+    total = int(lengths.sum())
+    if not total:
+        return np.zeros((0, _N_FEATURES), np.int64), lengths
+    codes = np.array([_token_codes(tok) for toks in tokens for tok in toks], dtype=np.int64)
+    w, shape, p3, s3 = (codes[:, k] for k in range(4))
+    is_year, is_quote = codes[:, 4].astype(bool), codes[:, 5]
+
+    starts = np.cumsum(lengths) - lengths
+    entry = np.repeat(np.arange(len(tokens)), lengths)
+    n = lengths[entry]
+    i = np.arange(total) - starts[entry]
+    first, last = i == 0, i == n - 1
+
+    def shift(x: np.ndarray, by: int, edge: int, at_edge: np.ndarray) -> np.ndarray:
+        return np.where(at_edge, edge, np.roll(x, by))
+
+    # pirmuju metu vieta irase: zodziai pries / po metu
+    nonempty = lengths > 0
+    first_year = np.full(len(tokens), -1, dtype=np.int64)
+    first_year[nonempty] = np.minimum.reduceat(np.where(is_year, i, n), starts[nonempty])
+    year_side = np.sign(i - first_year[entry])
+    # kabuciu lygis (0/1) - kabuciu skaicius iki sio zodzio imtinai
+    quotes = np.cumsum(is_quote)
+    quote_depth = (quotes - (quotes - is_quote)[starts][entry]) & 1
+
+    columns = (
+        w,
+        shape,
+        p3,
+        s3,
+        10 * i // n,
+        np.minimum(i, 6),
+        shift(w, 1, _EDGE[0], first),
+        shift(w, -1, _EDGE[1], last),
+        shift(shape, 1, _EDGE[0], first) * 31 + shape,
+        shape * 31 + shift(shape, -1, _EDGE[1], last),
+        year_side,
+        quote_depth * 31 + shape,
+    )
+    raw = np.stack(columns, axis=1).astype(np.uint64)
+    # pozymio numeris + reiksme -> indeksas (multiplikatyvus hash'as)
+    slot = np.arange(_N_FEATURES, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        mixed = (raw * np.uint64(0x9E3779B97F4A7C15) + slot * np.uint64(0xBF58476D1CE4E5B9)) * np.uint64(0x94D049BB133111EB)
+    return (mixed >> np.uint64(64 - _DIM_BITS)).astype(np.int64), lengths
+
+
+def _viterbi(emissions: np.ndarray, lengths: np.ndarray, trans: np.ndarray, start: np.ndarray) -> np.ndarray:
+    """
+    Geriausios zymiu sekos visai partijai: `emissions` [B, T, L] (uzpildyta
+    iki ilgiausio iraso), `lengths` [B]. Grazina [B, T] zymiu indeksus.
+    """
+    import numpy as np
+
+    b, t_max, n_labels = emissions.shape
+    score = start[None, :] + emissions[:, 0]
+    back = np.zeros((b, t_max, n_labels), dtype=np.int16)
+    identity = np.arange(n_labels, dtype=np.int16)
+    rows = np.arange(b)
+    for t in range(1, t_max):
+        cand = score[:, :, None] + trans[None, :, :]
+        best_prev = cand.argmax(axis=1).astype(np.int16)
+        new_score = cand.max(axis=1) + emissions[:, t]
+        active = (t < lengths)[:, None]
+        # uzsibaigusiems irasams balas nekinta, o grizimas eina "i save"
+        score = np.where(active, new_score, score)
+        back[:, t] = np.where(active, best_prev, identity[None, :])
+    path = np.zeros((b, t_max), dtype=np.int16)
+    best = score.argmax(axis=1).astype(np.int16)
+    for t in range(t_max - 1, -1, -1):
+        path[:, t] = best
+        if t:
+            best = back[rows, t, best]
+    return path
+
+
+@dataclass(frozen=True)
+class _Batch:
+    texts: list[str]
+    spans: list[list[tuple[int, int]]]  # zodziu (pradzia, pabaiga) tekste
+    features: np.ndarray  # [B, T, _N_FEATURES]
+    lengths: np.ndarray  # [B]
+
+
+def _batch(texts: Sequence[str]) -> _Batch:
+    import numpy as np
+
+    spans: list[list[tuple[int, int]]] = []
+    tokens: list[list[str]] = []
+    for text in texts:
+        matches = _tokens(text)
+        spans.append([m.span() for m in matches])
+        tokens.append([m.group() for m in matches])
+    flat, lengths = _features(tokens)
+    t_max = max(int(lengths.max()) if len(texts) else 0, 1)
+    # is eiles sudeti zodziai -> [B, T, K] (uzpildas - 0 pozymiai, Viterbi juos praleidzia)
+    features = np.zeros((len(texts), t_max, _N_FEATURES), dtype=np.int64)
+    mask = np.arange(t_max)[None, :] < lengths[:, None]
+    features[mask] = flat
+    return _Batch(list(texts), spans, features, lengths)
+
+
+class TokenLabeler:
+    """Apmokytas zymetojas: `weights` [_DIM, L], `trans` [L, L], `start` [L]."""
+
+    def __init__(self, weights: np.ndarray, trans: np.ndarray, start: np.ndarray):
+        self.weights = weights
+        self.trans = trans
+        self.start = start
+
+    @classmethod
+    def load(cls, path: str | Path) -> TokenLabeler:
+        import numpy as np
+
+        with np.load(path) as data:
+            if int(data["version"]) != _FEATURE_VERSION or tuple(data["labels"]) != LABELS:
+                raise ValueError(f"nesuderinamas zymetojo modelis: {path}")
+            return cls(
+                data["weights"].astype(np.float32),
+                data["trans"].astype(np.float32),
+                data["start"].astype(np.float32),
+            )
+
+    def save(self, path: str | Path) -> None:
+        import numpy as np
+
+        # float16 - tikslumo zymems parinkti pakanka. Svoriai [_DIM, L] uzima
+        # ~1.2 MB, bet dauguma nuliniai: suspaustas failas ~10-25 KB
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                version=np.array(_FEATURE_VERSION),
+                labels=np.array(LABELS),
+                weights=self.weights.astype(np.float16),
+                trans=self.trans.astype(np.float16),
+                start=self.start.astype(np.float16),
+            )
+
+    def _decode(self, batch: _Batch) -> np.ndarray:
+        # [B, T, K] pozymiu eilutes -> [B, T, L] balai vienu indeksavimu
+        emissions = self.weights[batch.features].sum(axis=2)
+        return _viterbi(emissions, batch.lengths, self.trans, self.start)
+
+    def label(self, texts: Sequence[str]) -> list[list[tuple[str, str]]]:
+        """Kiekvieno teksto (zodis, zyme) poros."""
+        batch = _batch(texts)
+        paths = self._decode(batch)
+        return [
+            [(text[s:e], LABELS[paths[i, k]]) for k, (s, e) in enumerate(spans)]
+            for i, (text, spans) in enumerate(zip(batch.texts, batch.spans))
+        ]
+
+    def parse(self, entries: Sequence[str], batch_size: int = 256) -> list[ParsedReference]:
+        """
+        Irasai -> ParsedReference (laukai - pirmos kiekvienos zymes atkarpos
+        tekstas). Dekoduojama partijomis po `batch_size` irasu.
+        """
+        out: list[ParsedReference] = []
+        for at in range(0, len(entries), batch_size):
+            batch = _batch(entries[at:at + batch_size])
+            paths = self._decode(batch)
+            out.extend(
+                _to_reference(text, spans, paths[i, :len(spans)])
+                for i, (text, spans) in enumerate(zip(batch.texts, batch.spans))
+            )
+        return out
+
+
+def _to_reference(text: str, spans: list[tuple[int, int]], path: Any) -> ParsedReference:
+    fields: dict[str, str] = {}
+    k = 0
+    while k < len(spans):
+        label = LABELS[path[k]]
+        j = k
+        while j + 1 < len(spans) and path[j + 1] == path[k]:
+            j += 1
+        if label != "other" and label not in fields:
+            value = norm_ws(text[spans[k][0]:spans[j][1]]).strip(_AUTHOR_STRIP if label == "author" else _STRIP)
+            if value:
+                fields[label] = value
+        k = j + 1
+
+    year = _YEAR_RE.search(fields.get("year", ""))
+    doi = fields.get("doi")
+    author = fields.get("author")
+    return _with_confidence(ParsedReference(
+        raw=text,
+        title=fields.get("title"),
+        year=year.group(1) if year else None,
+        author=author,
+        authors=_split_authors(author),
+        journal=fields.get("container"),
+        volume=fields.get("volume"),
+        issue=fields.get("issue"),
+        pages=fields.get("pages"),
+        doi=_DOI_CLEAN_RE.sub("", re.sub(r"^doi\s*:\s*", "", doi, flags=re.IGNORECASE)).lower() if doi else None,
+        parser="token-labeler",
+    ))
+
+
+# --- Mokymas (offline) ---
+
+
+def token_labels(text: str, fields: dict[str, Any]) -> list[str]:
+    """
+    Mokymo zymes is iraso ir jo lauku: kiekvieno lauko reiksme surandama
+    tekste (be didziuju raidziu) ir jos zodziai pazymimi; kiti - "other".
+    """
+    matches = _tokens(text)
+    labels = ["other"] * len(matches)
+    low = text.lower()
+    for field, label in _FIELD_LABELS:
+        value = fields.get(field)
+        if not value:
+            continue
+        value = norm_ws(str(value)).lower()
+        pos = low.find(value)
+        while pos >= 0:
+            end = pos + len(value)
+            inside = [k for k, m in enumerate(matches) if m.start() >= pos and m.end() <= end]
+            if inside and all(labels[k] == "other" for k in inside):
+                for k in inside:
+                    labels[k] = label
+                break
+            pos = low.find(value, pos + 1)
+    return labels
+
+
+def _update(model: TokenLabeler, feats: np.ndarray, gold: np.ndarray, pred: np.ndarray, scale: float) -> None:
+    """Perceptrono zingsnis: teisingos sekos pozymiai +, spejamos -."""
+    import numpy as np
+
+    for seq, sign in ((gold, scale), (pred, -scale)):
+        np.add.at(model.weights, (feats, seq[:, None]), sign)
+        np.add.at(model.trans, (seq[:-1], seq[1:]), sign)
+        model.start[seq[0]] += sign
+
+
+def train_labeler(
+    examples: Iterable[tuple[str, dict[str, Any]]],
+    epochs: int = 8,
+    batch_size: int = 64,
+    seed: int = 0,
+) -> TokenLabeler:
+    """
+    Vidurkintas strukturinis perceptronas: `examples` - (irasas, laukai), kur
+    laukai kaip ParsedReference (title, author, journal, year, volume, issue,
+    pages, doi). Atnaujinimai daromi po partijos, dekoduotos is karto.
+    """
+    import numpy as np
+
+    data = [(text, token_labels(text, fields)) for text, fields in examples]
+    data = [(text, labels) for text, labels in data if labels]
+    if not data:
+        raise ValueError("nera mokymo pavyzdziu")
+    index = {label: i for i, label in enumerate(LABELS)}
+    n_labels = len(LABELS)
+    model = TokenLabeler(
+        np.zeros((_DIM, n_labels), np.float32),
+        np.zeros((n_labels, n_labels), np.float32),
+        np.zeros(n_labels, np.float32),
+    )
+    # vidurkinimas: sum_t w_t = c * w - u, kur u kaupia c * atnaujinimas
+    acc = TokenLabeler(np.zeros_like(model.weights), np.zeros_like(model.trans), np.zeros_like(model.start))
+    rng = np.random.default_rng(seed)
+    c = 1
+    for _ in range(epochs):
+        order = rng.permutation(len(data))
+        for at in range(0, len(order), batch_size):
+            chunk = [data[i] for i in order[at:at + batch_size]]
+            batch = _batch([text for text, _ in chunk])
+            paths = model._decode(batch)
+            for b, (_, labels) in enumerate(chunk):
+                gold = np.array([index[label] for label in labels])
+                pred = paths[b, :len(gold)].astype(np.int64)
+                if np.array_equal(gold, pred):
+                    continue
+                feats = batch.features[b, :len(gold)]
+                _update(model, feats, gold, pred, 1.0)
+                _update(acc, feats, gold, pred, float(c))
+            c += 1
+    return TokenLabeler(
+        model.weights - acc.weights / c,
+        model.trans - acc.trans / c,
+        model.start - acc.start / c,
+    )
+
+
+@lru_cache(maxsize=2)
+def _load_cached(path: str, mtime_ns: int) -> TokenLabeler:
+    return TokenLabeler.load(path)
+
+
+def load_labeler(path: str | Path) -> TokenLabeler:
+    """Procese bendras modelis (darbiniai procesai jo nekrauna kiekvienam dokumentui)."""
+    return _load_cached(str(path), os.stat(path).st_mtime_ns)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="ai-agentas-train-labeler",
+        description="Lauku zymetojo mokymas is pazymetu irasu (JSONL: {\"raw\": ..., \"fields\": {...}}).",
+    )
+    parser.add_argument("data", help="JSONL: irasas `raw` ir jo laukai `fields` (title, author, journal, year...)")
+    parser.add_argument("-o", "--output", default="labeler.npz", help="modelio failas (numatytai: labeler.npz)")
+    parser.add_argument("--epochs", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        with open(args.data, encoding="utf-8") as f:
+            examples = [(d["raw"], d["fields"]) for d in map(json.loads, filter(str.strip, f))]
+        model = train_labeler(examples, epochs=args.epochs)
+        model.save(args.output)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Klaida: {e}", file=sys.stderr)
+        return 1
+    print(
+        f"Pavyzdziu: {len(examples)} -> {args.output} ({time.perf_counter() - started:.1f} s)",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,107 +1,293 @@
 from __future__ import annotations
 
+import io
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Any, Iterable
 
-from docx import Document
-
+from ai_agentas.utils.citekeys import surname_key
+from ai_agentas.utils.doc_readers import DocumentSource, InMemoryDocument, as_source
+from ai_agentas.utils.docx_zip import Zip64NotSupported, rewrite_zip_member
 from ai_agentas.utils.text_norm import norm_ws
 
+from .parse_bibliography import ParsedReference
+
+
+# atnaujinto DOCX vardo galune (`dokumentas.docx` -> `dokumentas.zotero-mvp.docx`)
+UPDATED_DOCX_SUFFIX = ".zotero-mvp.docx"
+
 
 @dataclass(frozen=True)
 class UpdateResult:
     output_path: str
     replacements: int
+    unmatched: int = 0  # citatos, kurių nepavyko susieti su bibliografija
+    # atnaujinto DOCX turinys, kai dokumentas apdorotas atmintyje (tada `output_path` – tik vardas)
+    data: bytes | None = field(default=None, repr=False)
 
 
-_AUTHOR_YEAR_PAREN_RE = re.compile(
-    r"\(([^()]{1,80}?),\s*((?:19|20)\d{2}|n\.d\.)\)"  # (Petrauskas, 2020)
+_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_W_T = f"{{{_W_NS}}}t"
+_W_P = f"{{{_W_NS}}}p"
+_W_BODY = f"{{{_W_NS}}}body"
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+_NUM_PREFIX_RE = re.compile(r"^\s*\[?(\d{1,4})[\]\.\)]")
+
+# Viena citata: (Petrauskas, 2020) / (Smith, 2019; Lee, 2020a, p. 5) arba [3] / [1-4] / [2, 5]
+_CITATION_RE = re.compile(
+    r"\((?P<paren>[^()]{1,300}?(?:19|20)\d{2}[a-z]?[^()]{0,40}|[^()]{1,80}?n\.d\.)\)"
+    r"|\[(?P<num>\d{1,3}(?:\s*[-–]\s*\d{1,3})?(?:\s*,\s*\d{1,3}(?:\s*[-–]\s*\d{1,3})?)*)\]"
 )
-_NUMERIC_BRACKET_RE = re.compile(r"\[(\d{1,3}(?:\s*[-–]\s*\d{1,3})?(?:\s*,\s*\d{1,3})*)\]")
+_AUTHOR_YEAR_ITEM_RE = re.compile(
+    r"^(?P<author>[^;]+?),?\s+(?P<year>(?:19|20)\d{2}(?P<suffix>[a-z])?|n\.d\.)"
+    r"(?:\s*,\s*(?P<loc>(?:p|pp|psl)\.?\s*[\d\s–-]+))?$"
+)
+# Apsauga nuo [1-999] tipo intervalų
+_MAX_RANGE = 50
 
 
-def _replace_in_text(text: str, citekey: str) -> tuple[str, int]:
+@dataclass(frozen=True)
+class CitationIndex:
+    """Citatų paieškos raktai -> citekey."""
+
+    by_author_year: dict[tuple[str, str], list[str]]
+    by_number: dict[int, str]
+
+    def author_year(self, author: str, year: str) -> str | None:
+        suffix = ""
+        if len(year) == 5 and year[-1].isalpha():
+            year, suffix = year[:4], year[-1]
+        keys = self.by_author_year.get((_surname(author), year))
+        if not keys:
+            return None
+        pos = ord(suffix) - ord("a") if suffix else 0
+        return keys[pos] if pos < len(keys) else None
+
+    def number(self, n: int) -> str | None:
+        return self.by_number.get(n)
+
+
+def _surname(name: str | None) -> str:
     """
-    Minimalus placeholder formatas: [@citekey]
-    (Pandoc/Quarto stiliaus; patogu vėliau konvertuoti)
+    Pavardės raktas iš „Petrauskas, J.“, „K. Lee“, „Smith et al.“ ar „Smith ir Jonaitis“:
+    iki kablelio – pavardė; kitaip pirmas ne inicialų žodis.
     """
-    if not text:
-        return text, 0
+    name = norm_ws(name or "")
+    if "," in name:
+        return surname_key(name.split(",")[0])
+    words = [w for w in name.split(" ") if w]
+    for w in words:
+        if len(w.rstrip(".")) > 1 and not w.endswith("."):
+            return surname_key(w)
+    return surname_key(words[0]) if words else ""
 
-    cnt = 0
 
-    def repl_author_year(m: re.Match) -> str:
-        nonlocal cnt
-        cnt += 1
-        return f"[@{citekey}]"
+def build_citation_index(refs: list[ParsedReference], citekeys: list[str]) -> CitationIndex:
+    """
+    Indeksas iš (pirmojo autoriaus pavardė, metai) ir bibliografijos numerio.
+    Numeris imamas iš įrašo pradžios („[3]“, „3.“), jei jo nėra – pagal eilę.
+    """
+    by_author_year: dict[tuple[str, str], list[str]] = {}
+    by_number: dict[int, str] = {}
+    for i, (ref, ck) in enumerate(zip(refs, citekeys)):
+        author = ref.authors[0] if ref.authors else ref.author
+        surname = _surname(author)
+        if surname:
+            by_author_year.setdefault((surname, ref.year or "n.d."), []).append(ck)
+        m = _NUM_PREFIX_RE.match(ref.raw)
+        number = int(m.group(1)) if m else i + 1
+        by_number.setdefault(number, ck)
+    return CitationIndex(by_author_year=by_author_year, by_number=by_number)
+
+
+def _numbers(spec: str) -> list[int] | None:
+    out: list[int] = []
+    for part in spec.split(","):
+        bounds = re.split(r"\s*[-–]\s*", part.strip())
+        lo, hi = int(bounds[0]), int(bounds[-1])
+        if hi < lo or hi - lo >= _MAX_RANGE:
+            return None
+        out.extend(range(lo, hi + 1))
+    return out
+
+
+def _resolve(m: re.Match, index: CitationIndex) -> str | None:
+    """Citatos pakaitas `[@a; @b]` arba None, jei bent vieno šaltinio nerasta."""
+    items: list[str] = []
+    if m.group("num") is not None:
+        nums = _numbers(m.group("num"))
+        if not nums:
+            return None
+        for n in nums:
+            ck = index.number(n)
+            if ck is None:
+                return None
+            items.append(f"@{ck}")
+    else:
+        for part in m.group("paren").split(";"):
+            im = _AUTHOR_YEAR_ITEM_RE.match(norm_ws(part))
+            if not im:
+                return None
+            ck = index.author_year(im.group("author"), im.group("year"))
+            if ck is None:
+                return None
+            loc = im.group("loc")
+            items.append(f"@{ck}, {norm_ws(loc)}" if loc else f"@{ck}")
+    return "[" + "; ".join(items) + "]"
 
-    # Pakeičiam tik pirmą match'ą vienam citekey kvietimui
-    new, n = _AUTHOR_YEAR_PAREN_RE.subn(repl_author_year, text, count=1)
-    if n:
-        return new, cnt
 
-    # Jei numerinis – irgi pakeičiam pirmą
-    def repl_num(m: re.Match) -> str:
-        nonlocal cnt
-        cnt += 1
-        return f"[@{citekey}]"
+def _text_nodes(p_elm: Any) -> list[Any]:
+    return list(p_elm.iter(_W_T))
 
-    new2, n2 = _NUMERIC_BRACKET_RE.subn(repl_num, text, count=1)
-    if n2:
-        return new2, cnt
-    return text, 0
+
+def _paragraph_text(nodes: list[Any]) -> str:
+    return "".join(t.text or "" for t in nodes)
+
+
+def _replace_span(nodes: list[Any], start: int, end: int, new: str) -> None:
+    """
+    Pakeičia [start, end) pastraipos tekste į `new`, liesdamas tik tuos
+    <w:t>, per kuriuos eina citata. Naujas tekstas įrašomas į pirmąjį iš jų,
+    todėl išlaiko to run'o formatavimą; kiti run'ai (bold/italic...) nekeičiami.
+    """
+    pos = 0
+    placed = False
+    for t in nodes:
+        s = t.text or ""
+        t_start, t_end = pos, pos + len(s)
+        pos = t_end
+        if t_start >= end:
+            break
+        if t_end <= start:
+            continue
+        head = s[: max(0, start - t_start)]
+        tail = s[max(0, end - t_start):] if end < t_end else ""
+        if not placed:
+            t.text = head + new + tail
+            placed = True
+        else:
+            t.text = head + tail
+        t.set(_XML_SPACE, "preserve")
+
+
+def _is_bibliography_paragraph(t: str) -> bool:
+    # jei pastraipa atrodo kaip bibliografija – neliečiam
+    return len(t) > 20 and (t.strip().startswith("[") or bool(re.match(r"^\s*\d+[\.\)]\s+", t)))
+
+
+def _update_paragraphs(paragraphs: Iterable[Any], index: CitationIndex) -> tuple[int, int]:
+    """
+    Pakeičia citatas pastraipų (<w:p>) elementuose vienu praėjimu per
+    pastraipą: kiekviena citata susiejama per `index`, ne pagal eilę.
+    Grąžina (pakeista, nesusieta).
+    """
+    total_repl = 0
+    unmatched = 0
+    for p_elm in paragraphs:
+        nodes = _text_nodes(p_elm)
+        t = _paragraph_text(nodes)
+        if not t:
+            continue
+        if _is_bibliography_paragraph(t):
+            continue
+
+        edits: list[tuple[int, int, str]] = []
+        for m in _CITATION_RE.finditer(t):
+            new = _resolve(m, index)
+            if new is None:
+                unmatched += 1
+            else:
+                edits.append((m.start(), m.end(), new))
+        # nuo galo, kad ankstesnių citatų pozicijos nepasislinktų
+        for start, end, new in reversed(edits):
+            _replace_span(nodes, start, end, new)
+        total_repl += len(edits)
+    return total_repl, unmatched
+
+
+def _update_document_xml(xml: bytes, index: CitationIndex) -> tuple[bytes, tuple[int, int]]:
+    from lxml import etree
+
+    root = etree.fromstring(xml, etree.XMLParser(huge_tree=True))
+    body = root.find(_W_BODY)
+    n = _update_paragraphs(body.iterchildren(_W_P) if body is not None else (), index)
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True), n
 
 
 def update_docx_placeholders(
-    input_docx_path: str,
+    input_docx_path: DocumentSource,
     citekeys_in_order: list[str],
+    refs: list[ParsedReference],
     output_docx_path: str | None = None,
+    document: Any = None,
+    writer: str = "python-docx",
 ) -> UpdateResult:
     """
-    MVP logika:
-    - eina per pastraipas iš viršaus į apačią
-    - kaskart radus citatos raštą (autorius–metai arba [1]) pakeičia į [@citekey]
-      pagal `citekeys_in_order` eilę
+    Pakeičia dokumento citatas į [@citekey] placeholderius.
+
+    - `citekeys_in_order[i]` yra `refs[i]` (bibliografijos eilės) citekey
+    - (Autorius, 2020) susiejama pagal (pirmojo autoriaus pavardė, metai),
+      [3] / [1-4] / [2, 5] – pagal bibliografijos numerį
+    - kelios citatos vienoje pastraipoje keičiamos vienu praėjimu;
+      nesusietos citatos paliekamos kaip yra
+
+    `document` – jau ikeltas python-docx dokumentas (pvz. iš `read_docx`);
+    tada failas iš disko neskaitomas antrą kartą. Keičiami tik citatos
+    run'ai, todėl pastraipos formatavimas išlieka.
+
+    `writer="zip"` – perrašomas tik `word/document.xml`, o kiti archyvo
+    nariai (paveikslėliai ir pan.) kopijuojami nesuspaudžiant iš naujo.
+    Zip64 archyvams grįžtama prie python-docx.
 
-    Tai nėra 100% teisingas citatų „matching“, bet praktiškai leidžia susieti
-    citatas su bibliografijos įrašais minimaliai be API.
+    Jei įvestis yra baitai / file-like / `InMemoryDocument` ir
+    `output_docx_path` nenurodytas, diskas neliečiamas: rezultatas
+    grąžinamas `UpdateResult.data`.
     """
-    p = Path(input_docx_path)
-    out = Path(output_docx_path) if output_docx_path else p.with_name(p.stem + ".zotero-mvp.docx")
+    if writer not in ("python-docx", "zip"):
+        raise ValueError(f"Nežinomas DOCX rašymo būdas: {writer}")
 
-    doc = Document(str(p))
-    idx = 0
-    total_repl = 0
+    src = as_source(input_docx_path, name="document.docx")
+    in_memory = isinstance(src, InMemoryDocument) and output_docx_path is None
+    p = Path(src.name if isinstance(src, InMemoryDocument) else src)
+    out = Path(output_docx_path) if output_docx_path else p.with_name(p.stem + UPDATED_DOCX_SUFFIX)
+    index = build_citation_index(refs, citekeys_in_order)
 
-    def next_ck() -> str | None:
-        nonlocal idx
-        if idx >= len(citekeys_in_order):
-            return None
-        ck = citekeys_in_order[idx]
-        idx += 1
-        return ck
+    def result(replacements: int, unmatched: int, buf: io.BytesIO | None) -> UpdateResult:
+        return UpdateResult(
+            output_path=out.name if in_memory else str(out),
+            replacements=replacements,
+            unmatched=unmatched,
+            data=buf.getvalue() if buf is not None else None,
+        )
 
-    # Pagrindinės pastraipos
-    for para in doc.paragraphs:
-        t = para.text or ""
-        if not t:
-            continue
-        # jei pastraipa atrodo kaip bibliografija – neliečiam
-        if len(t) > 20 and (t.strip().startswith("[") or re.match(r"^\s*\d+[\.\)]\s+", t)):
-            continue
+    if writer == "zip":
+        counts = (0, 0)
 
-        ck = next_ck()
-        if ck is None:
-            break
-        new, n = _replace_in_text(t, ck)
-        if n:
-            para.text = new
-            total_repl += n
-        else:
-            # jei nepavyko pakeisti – grąžinam ck atgal, kad nedingtų
-            idx -= 1
+        def transform(xml: bytes) -> bytes:
+            nonlocal counts
+            new_xml, counts = _update_document_xml(xml, index)
+            return new_xml
+
+        buf = io.BytesIO() if in_memory else None
+        source = io.BytesIO(src.data) if isinstance(src, InMemoryDocument) else src
+        try:
+            rewrite_zip_member(source, buf if buf is not None else out, "word/document.xml", transform)
+            return result(counts[0], counts[1], buf)
+        except Zip64NotSupported:
+            pass
 
-    doc.save(str(out))
-    return UpdateResult(output_path=str(out), replacements=total_repl)
+    from docx import Document  # python-docx
 
+    if document is not None:
+        doc = document
+    elif isinstance(src, InMemoryDocument):
+        doc = Document(io.BytesIO(src.data))
+    else:
+        doc = Document(str(p))
+    # Pagrindinės pastraipos
+    total_repl, unmatched = _update_paragraphs((para._p for para in doc.paragraphs), index)
+    buf = io.BytesIO() if in_memory else None
+    doc.save(buf if buf is not None else str(out))
+    return result(total_repl, unmatched, buf)
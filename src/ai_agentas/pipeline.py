@@ -1,23 +1,72 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+import os
+from dataclasses import dataclass, field, replace
+from functools import cached_property
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator
 
-from ai_agentas.utils.bibliography import split_bibliography
-from ai_agentas.utils.doc_readers import read_any
+from ai_agentas.utils.bibliography import split_bibliography, split_entries
+from ai_agentas.utils.doc_readers import (
+    DocumentSource,
+    DocumentText,
+    InMemoryDocument,
+    as_source,
+    read_any,
+    source_name,
+)
+from ai_agentas.utils.library_readers import is_library, iter_library
+from ai_agentas.utils.text_norm import BibliographySplit
+from ai_agentas.utils.tracing import NULL_TRACER, Span, StageTiming, Tracer, make_tracer, summarize, write_chrome_trace
 
-from ai_agentas.nodes.parse_bibliography import parse_bibliography_text, ParsedReference
-from ai_agentas.nodes.export_bibtex import export_bibtex, BibtexExport
+from ai_agentas.nodes.parse_bibliography import LOW_CONFIDENCE, parse_references, ParsedReference
+from ai_agentas.nodes.export_bibtex import assign_citekeys, export_bibtex, BibtexExport
 from ai_agentas.nodes.export_ris import export_ris
 from ai_agentas.nodes.export_csljson import export_csljson
-from ai_agentas.nodes.duplicates import find_duplicates, DuplicatePair
+from ai_agentas.nodes.duplicates import (
+    find_duplicates,
+    cluster_duplicates,
+    deduplicate,
+    DuplicatePair,
+    DuplicateCluster,
+)
+from ai_agentas.nodes.library_index import LibraryIndex, LibraryMatch, find_library_duplicates
 from ai_agentas.nodes.csl_formatter import format_bibliography
-from ai_agentas.nodes.update_docx import update_docx_placeholders, UpdateResult
+from ai_agentas.nodes.update_docx import UPDATED_DOCX_SUFFIX, update_docx_placeholders, UpdateResult
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+
+# Eksportai, kuriuos galima apskaiciuoti is anksto (`RunConfig.outputs`)
+OUTPUTS = ("bibtex", "ris", "csljson", "formatted")
 
 
 @dataclass(frozen=True)
 class RunConfig:
     update_docx: bool = True
     csl_style: str = "APA 7"
+    dedup_method: str = "index"  # "index" | "matrix"
+    dedupe_exports: bool = False  # sujungtuose eksportuose dublikatus keisti kanoniniu irasu
+    library_path: str | None = None  # SQLite biblioteka, su kuria tikrinami nauji saltiniai
+    docx_writer: str = "python-docx"  # "python-docx" | "zip" (perrasomas tik document.xml)
+    # eksportai (is OUTPUTS), skaiciuojami is karto (pvz. darbiniuose procesuose);
+    # kiti apskaiciuojami tik pirma karta juos paprasius
+    outputs: tuple[str, ...] = ()
+    trace: bool = False  # matuoti etapu trukmes (RunResult.timings / BatchResult.timings)
+    trace_path: str | None = None  # Chrome trace-event JSON (ijungia `trace`)
+    cache_path: str | None = None  # SQLite rezultatu talpykla: apdorojami tik nauji / pakite dokumentai
+    # ar RunResult.extracted_body saugoti viso dokumento teksta (dideliems batch'ams - False)
+    keep_body_text: bool = True
+    # vietine Crossref JSONL kopija (su `ai-agentas-crossref-index` indeksu) irasu papildymui
+    crossref_dump: str | None = None
+    enrich_threshold: float = LOW_CONFIDENCE  # zemesnio pasitikejimo irasams pirmenybe Crossref reiksmems
+    # lauku zymetojo modelis (`ai-agentas-train-labeler`) zemo pasitikejimo irasams
+    labeler_model: str | None = None
+
+    @property
+    def tracing(self) -> bool:
+        return self.trace or bool(self.trace_path)
 
 
 @dataclass(frozen=True)
@@ -26,77 +75,512 @@ class RunResult:
     extracted_body: str
     extracted_bibliography: str
     refs: list[ParsedReference]
-    bibtex: BibtexExport
-    ris: str
-    csljson: str
-    formatted_bibliography: str
     updated_docx: UpdateResult | None
+    csl_style: str = "APA 7"
+    tracer: Tracer = field(default=NULL_TRACER, repr=False, compare=False)
 
+    @cached_property
+    def bibtex(self) -> BibtexExport:
+        with self.tracer.span("export.bibtex") as s:
+            out = export_bibtex(self.refs)
+            s.size = len(out.bibtex)
+        return out
 
-def run_pipeline(input_path: str, config: RunConfig) -> RunResult:
-    """Apdoroja viena dokumenta."""
-    doc = read_any(input_path)
-    split = split_bibliography(doc.text)
+    @cached_property
+    def ris(self) -> str:
+        with self.tracer.span("export.ris") as s:
+            out = export_ris(self.refs)
+            s.size = len(out)
+        return out
 
-    refs = parse_bibliography_text(split.bibliography_text)
-    bib = export_bibtex(refs)
-    ris = export_ris(refs)
-    csljson = export_csljson(refs)
-    formatted = format_bibliography(refs, config.csl_style)
+    @cached_property
+    def csljson(self) -> str:
+        with self.tracer.span("export.csljson") as s:
+            out = export_csljson(self.refs)
+            s.size = len(out)
+        return out
 
-    updated = None
-    if config.update_docx and doc.kind == "docx" and refs:
-        citekeys_in_order = [bib.citekey_by_index[i] for i in range(len(refs))]
+    @cached_property
+    def formatted_bibliography(self) -> str:
+        with self.tracer.span("format") as s:
+            out = format_bibliography(self.refs, self.csl_style)
+            s.size = len(out)
+        return out
+
+    @property
+    def timings(self) -> list[StageTiming]:
+        """Dokumento etapu suvestine (tuscia, jei `RunConfig.trace` isjungtas)."""
+        return self.tracer.summary()
+
+
+# OUTPUTS pavadinimas -> RunResult / BatchResult atributas
+_RUN_ATTRS = {"bibtex": "bibtex", "ris": "ris", "csljson": "csljson", "formatted": "formatted_bibliography"}
+_BATCH_ATTRS = {
+    "bibtex": "merged_bibtex", "ris": "merged_ris", "csljson": "merged_csljson", "formatted": "merged_formatted",
+}
+
+
+def _warm(result: object, attrs: dict[str, str], outputs: Iterable[str]) -> None:
+    for name in outputs:
+        if name not in attrs:
+            raise ValueError(f"Nezinomas eksportas: {name} (galimi: {', '.join(OUTPUTS)})")
+        getattr(result, attrs[name])
+
+
+# --- Etapai (bendri sinchroniniam ir asinchroniniam pipeline) ---
+
+
+def read_stage(source: str | InMemoryDocument, tracer: Tracer = NULL_TRACER) -> DocumentText:
+    """Dokumento teksto istraukimas (I/O; PDF - CPU)."""
+    with tracer.span("read") as s:
+        doc = read_any(source)
+        s.size = len(doc.text)
+    return doc
+
+
+def library_stage(source: str | InMemoryDocument, tracer: Tracer = NULL_TRACER) -> list[ParsedReference]:
+    """Bibliotekos eksporto (.bib / .ris) irasai srautu - be atskyrimo ir parsinimo."""
+    with tracer.span("library_read") as s:
+        refs = list(iter_library(source))
+        s.size = len(refs)
+    return refs
+
+
+def parse_stage(
+    text: str,
+    tracer: Tracer = NULL_TRACER,
+    labeler_model: str | None = None,
+) -> tuple[BibliographySplit, list[ParsedReference]]:
+    """Bibliografijos atskyrimas ir saltiniu parsinimas (CPU); `labeler_model` - zr. `parse_references`."""
+    with tracer.span("split", size=len(text)):
+        split = split_bibliography(text)
+    with tracer.span("entries") as s:
+        entries = [span.text(split.lines) for span in split_entries(split)]
+        s.size = len(entries)
+    with tracer.span("parse", size=len(entries)):
+        refs = parse_references(entries, labeler_model)
+    return split, refs
+
+
+def enrich_stage(
+    refs: list[ParsedReference],
+    config: RunConfig,
+    tracer: Tracer = NULL_TRACER,
+) -> list[ParsedReference]:
+    """Irasu su trukstamais laukais papildymas is vietines Crossref kopijos (mmap; CPU)."""
+    if not (config.crossref_dump and refs):
+        return refs
+    from ai_agentas.nodes.crossref_local import enrich_references, open_crossref_index
+
+    with tracer.span("enrich") as s:
+        enriched = enrich_references(refs, open_crossref_index(config.crossref_dump), config.enrich_threshold)
+        s.size = sum(1 for a, b in zip(refs, enriched) if a is not b)
+    return enriched
+
+
+def export_stage(result: RunResult, outputs: Iterable[str]) -> RunResult:
+    """Is anksto apskaiciuoja `outputs` eksportus (CPU); kiti lieka tingus."""
+    _warm(result, _RUN_ATTRS, outputs)
+    return result
+
+
+def update_stage(
+    source: str | InMemoryDocument,
+    doc: DocumentText,
+    refs: list[ParsedReference],
+    config: RunConfig,
+    tracer: Tracer = NULL_TRACER,
+    output_docx_path: str | None = None,
+) -> UpdateResult | None:
+    """DOCX citatu atnaujinimas ir issaugojimas (I/O)."""
+    if not (config.update_docx and doc.kind == "docx" and refs):
+        return None
+    return _update_docx(source, refs, config, tracer, output_docx_path, document=doc.document)
+
+
+def _update_docx(
+    source: str | InMemoryDocument,
+    refs: list[ParsedReference],
+    config: RunConfig,
+    tracer: Tracer,
+    output_docx_path: str | None,
+    document: object = None,
+) -> UpdateResult:
+    with tracer.span("docx_update") as s:
+        citekeys = assign_citekeys(refs)
         updated = update_docx_placeholders(
-            input_docx_path=input_path, citekeys_in_order=citekeys_in_order
+            input_docx_path=source,
+            citekeys_in_order=[citekeys[i] for i in range(len(refs))],
+            refs=refs,
+            output_docx_path=output_docx_path,
+            document=document,
+            writer=config.docx_writer,
         )
+        s.size = updated.replacements
+    return updated
 
-    return RunResult(
+
+def with_docx_update(
+    result: RunResult,
+    source: DocumentSource,
+    config: RunConfig,
+    output_docx_path: str | None = None,
+) -> RunResult:
+    """
+    Jau apdoroto dokumento DOCX atnaujinimas pagal `config.update_docx` be
+    skaitymo ir parsinimo is naujo (pvz. UI, kai nustatymas pakeiciamas po
+    apdorojimo). Grazina nauja `RunResult`; eksportai skaiciuojami is naujo.
+    """
+    source = as_source(source)
+    updated = None
+    if config.update_docx and Path(source_name(source)).suffix.lower() == ".docx" and result.refs:
+        updated = _update_docx(source, result.refs, config, result.tracer, output_docx_path)
+    return replace(result, updated_docx=updated)
+
+
+def run_pipeline(
+    input_path: DocumentSource,
+    config: RunConfig,
+    name: str | None = None,
+    output_docx_path: str | None = None,
+) -> RunResult:
+    """
+    Apdoroja viena dokumenta.
+
+    `input_path` gali buti kelias arba turinys atmintyje (baitai, file-like,
+    `InMemoryDocument`; tipas pagal `name`). `.bib` / `.ris` bibliotekos
+    eksportai nuskaitomi tiesiai i irasus (`library_stage`). Atmintyje pateiktas DOCX
+    atnaujinamas be disko - rezultatas `updated_docx.data`. `output_docx_path`
+    - kur irasyti atnaujinta DOCX (numatytai salia ivesties failo).
+    """
+    source = as_source(input_path, name)
+    tracer = make_tracer(config.tracing, doc=source_name(source))
+    if is_library(source_name(source)):
+        # jau strukturuoti irasai (pvz. Zotero eksportas) dublikatu paieskai su naujais
+        result = RunResult(
+            source_name=source_name(source),
+            extracted_body="",
+            extracted_bibliography="",
+            refs=library_stage(source, tracer),
+            updated_docx=None,
+            csl_style=config.csl_style,
+            tracer=tracer,
+        )
+        return export_stage(result, config.outputs)
+    doc = read_stage(source, tracer)
+    split, refs = parse_stage(doc.text, tracer, labeler_model=config.labeler_model)
+    refs = enrich_stage(refs, config, tracer)
+    updated = update_stage(source, doc, refs, config, tracer, output_docx_path=output_docx_path)
+
+    result = RunResult(
         source_name=doc.source_path,
-        extracted_body=split.body_text,
+        extracted_body=split.body_text if config.keep_body_text else "",
         extracted_bibliography=split.bibliography_text,
         refs=refs,
-        bibtex=bib,
-        ris=ris,
-        csljson=csljson,
-        formatted_bibliography=formatted,
         updated_docx=updated,
+        csl_style=config.csl_style,
+        tracer=tracer,
     )
+    return export_stage(result, config.outputs)
 
 
 @dataclass(frozen=True)
 class BatchResult:
     results: list[RunResult]
     all_refs: list[ParsedReference]
-    merged_bibtex: str
-    merged_ris: str
-    merged_csljson: str
-    merged_formatted: str
     duplicates: list[DuplicatePair]
+    clusters: list[DuplicateCluster]
+    library_matches: list[LibraryMatch]
+    # irasai sujungtiems eksportams (be dublikatu, jei `dedupe_exports`)
+    export_refs: list[ParsedReference] = field(default_factory=list, repr=False)
+    csl_style: str = "APA 7"
+    tracer: Tracer = field(default=NULL_TRACER, repr=False, compare=False)  # partijos etapai
+    # `all_refs` indeksas -> naujai i biblioteka prideto iraso id (`_add_new_to_library`)
+    library_added: dict[int, int] = field(default_factory=dict, repr=False)
 
+    @cached_property
+    def merged_bibtex(self) -> str:
+        with self.tracer.span("merge.bibtex") as s:
+            out = export_bibtex(self.export_refs).bibtex
+            s.size = len(out)
+        return out
 
-def run_batch(input_paths: list[str], config: RunConfig) -> BatchResult:
-    """Apdoroja kelis dokumentus ir sujungia rezultatus."""
-    results: list[RunResult] = []
-    all_refs: list[ParsedReference] = []
+    @cached_property
+    def merged_ris(self) -> str:
+        with self.tracer.span("merge.ris") as s:
+            out = export_ris(self.export_refs)
+            s.size = len(out)
+        return out
+
+    @cached_property
+    def merged_csljson(self) -> str:
+        with self.tracer.span("merge.csljson") as s:
+            out = export_csljson(self.export_refs)
+            s.size = len(out)
+        return out
+
+    @cached_property
+    def merged_formatted(self) -> str:
+        with self.tracer.span("merge.format") as s:
+            out = format_bibliography(self.export_refs, self.csl_style)
+            s.size = len(out)
+        return out
 
-    for path in input_paths:
-        res = run_pipeline(path, config)
-        results.append(res)
+    @property
+    def spans(self) -> list[Span]:
+        """Visu dokumentu ir partijos etapu span'ai."""
+        out = [s for res in self.results for s in res.tracer.spans]
+        out.extend(self.tracer.spans)
+        return out
+
+    @property
+    def timings(self) -> list[StageTiming]:
+        """Etapu suvestine per visa partija (tuscia, jei sekimas isjungtas)."""
+        return summarize(self.spans)
+
+    def write_trace(self, path: str) -> None:
+        """Iraso Chrome trace-event JSON (atidaromas chrome://tracing ar Perfetto)."""
+        write_chrome_trace(self.spans, path)
+
+
+def _add_new_to_library(
+    library: LibraryIndex,
+    refs: list[ParsedReference],
+    sources: list[str],
+    clusters: list[DuplicateCluster],
+    matches: list[LibraryMatch],
+) -> dict[int, int]:
+    """
+    I biblioteka prideda tik naujus saltinius: po viena kanonini irasa grupei.
+    Grazina `refs` indeksas -> priskirtas bibliotekos id (visiems grupes nariams).
+    """
+    known = {m.index for m in matches}
+    first_of: dict[int, DuplicateCluster] = {}
+    skip: set[int] = set()
+    for c in clusters:
+        if known.intersection(c.indices):
+            skip.update(c.indices)
+        else:
+            first_of[c.indices[0]] = c
+            skip.update(c.indices[1:])
+
+    by_source: dict[str, list[tuple[int, ParsedReference]]] = {}
+    for i, ref in enumerate(refs):
+        if i in skip or i in known:
+            continue
+        ref = first_of[i].canonical if i in first_of else ref
+        by_source.setdefault(sources[i], []).append((i, ref))
+    added: dict[int, int] = {}
+    for source, new in by_source.items():
+        ids = library.add([ref for _, ref in new], source=source)
+        for (i, _), ref_id in zip(new, ids):
+            for member in first_of[i].indices if i in first_of else (i,):
+                added[member] = ref_id
+    return added
+
+
+# progress(baigta, is_viso, ka_tik_baigto_dokumento_rezultatas)
+ProgressCallback = Callable[[int, int, RunResult], None]
+
+
+def process_pool(max_workers: int, initializer: Callable[[], None] | None = None) -> ProcessPoolExecutor:
+    """
+    Procesu pule su "spawn" kontekstu: fork'as is proceso, kuriame jau veikia
+    gijos (Streamlit, asyncio executoriai), gali uzstrigti ant paveldetu lock'u.
+    `initializer` vykdomas kiekviename darbiniame procese jam startavus.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=initializer,
+    )
+
+
+# DocumentEvent.kind
+STARTED, FINISHED = "started", "finished"
+
+
+@dataclass(frozen=True)
+class DocumentEvent:
+    kind: str  # STARTED | FINISHED
+    index: int  # dokumento vieta `input_paths`
+    source_name: str
+    done: int  # kiek dokumentu jau baigta (su siuo)
+    total: int
+    refs_so_far: int  # saltiniu visuose baigtuose dokumentuose
+    result: RunResult | None = field(default=None, repr=False)  # tik FINISHED
+    cached: bool = False  # rezultatas is `config.cache_path` talpyklos
+
+
+def iter_documents(
+    input_paths: list[DocumentSource],
+    config: RunConfig,
+    workers: int | None = 1,
+    docx_outputs: list[str | None] | None = None,
+) -> Iterator[DocumentEvent]:
+    """
+    Kaip `run_documents`, tik rezultatai grazinami ivykiais, vos dokumentas
+    pradedamas ar baigiamas (baigimo tvarka), pvz. UI, kuris rodo kiekviena
+    dokumenta nelaukdamas viso batch'o.
+
+    Procesu pulei vienu metu pateikiama ne daugiau 2 x `workers` dokumentu,
+    todel STARTED reiskia, kad dokumentas apdorojamas arba yra kitas eileje,
+    o ne laukia viso batch'o gale.
+    """
+    sources = [as_source(src) for src in input_paths]
+    total = len(sources)
+    outs = docx_outputs if docx_outputs is not None else [None] * total
+    if workers is None:
+        workers = os.cpu_count() or 1
+    done = 0
+    refs_so_far = 0
+
+    def started(i: int) -> DocumentEvent:
+        return DocumentEvent(STARTED, i, source_name(sources[i]), done, total, refs_so_far)
+
+    def finished(i: int, res: RunResult, cached: bool = False) -> DocumentEvent:
+        nonlocal done, refs_so_far
+        done += 1
+        refs_so_far += len(res.refs)
+        return DocumentEvent(FINISHED, i, res.source_name, done, total, refs_so_far, result=res, cached=cached)
+
+    cache = None
+    keys: list = [None] * total
+    if config.cache_path:
+        from ai_agentas.result_cache import ResultCache
+
+        cache = ResultCache(config.cache_path)
+    try:
+        todo: list[int] = []
+        for i, src in enumerate(sources):
+            if cache is not None:
+                keys[i] = cache.key(src, config, outs[i])
+                hit = cache.get(keys[i], name=source_name(src))
+                if hit is not None:
+                    yield started(i)
+                    yield finished(i, export_stage(hit, config.outputs), cached=True)
+                    continue
+            todo.append(i)
+
+        def computed(i: int, res: RunResult) -> DocumentEvent:
+            if cache is not None:
+                cache.put(keys[i], res)
+            return finished(i, res)
+
+        if workers <= 1 or len(todo) < 2:
+            for i in todo:
+                yield started(i)
+                yield computed(i, run_pipeline(sources[i], config, output_docx_path=outs[i]))
+            return
+
+        from concurrent.futures import FIRST_COMPLETED, wait
+
+        with process_pool(min(workers, len(todo))) as pool:
+            queue = iter(todo)
+            running: dict = {}
+
+            def submit_next() -> DocumentEvent | None:
+                i = next(queue, None)
+                if i is None:
+                    return None
+                running[pool.submit(run_pipeline, sources[i], config, output_docx_path=outs[i])] = i
+                return started(i)
+
+            # po du dokumentus procesui: kol vienas grizta, kitas jau laukia procese
+            for _ in range(min(2 * workers, len(todo))):
+                yield submit_next()  # type: ignore[misc]
+            while running:
+                finished_futures, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in finished_futures:
+                    i = running.pop(fut)
+                    yield computed(i, fut.result())
+                    ev = submit_next()
+                    if ev is not None:
+                        yield ev
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def run_documents(
+    input_paths: list[DocumentSource],
+    config: RunConfig,
+    workers: int | None = 1,
+    progress: ProgressCallback | None = None,
+    docx_outputs: list[str | None] | None = None,
+) -> list[RunResult]:
+    """
+    Paleidzia `run_pipeline` kiekvienam dokumentui. Kai `workers` > 1
+    (None = visi branduoliai), dokumentai apdorojami procesu pule; rezultatai
+    grazinami ivesties tvarka, o `progress` kvieciamas baigus kiekviena.
+    `docx_outputs[i]` - atnaujinto `input_paths[i]` DOCX kelias (None - numatytas).
+
+    Jei nurodytas `config.cache_path`, nepakite dokumentai (tas pats turinys,
+    nustatymai ir kodo versija) imami is talpyklos ir neapdorojami is naujo.
+    Ivykiu srautas - `iter_documents`.
+    """
+    results: list[RunResult | None] = [None] * len(input_paths)
+    for ev in iter_documents(input_paths, config, workers=workers, docx_outputs=docx_outputs):
+        if ev.kind == FINISHED:
+            results[ev.index] = ev.result
+            if progress:
+                progress(ev.done, ev.total, ev.result)  # type: ignore[arg-type]
+    return results  # type: ignore[return-value]
+
+
+def merge_results(results: list[RunResult], config: RunConfig) -> BatchResult:
+    """
+    Sujungia dokumentu rezultatus: dublikatai, biblioteka, bendri eksportai.
+    Sujungti eksportai skaiciuojami is karto tik tie, kurie yra `config.outputs`.
+    Jei nurodytas `config.trace_path`, ten irasomas Chrome trace.
+    """
+    tracer = make_tracer(config.tracing)
+    all_refs: list[ParsedReference] = []
+    sources: list[str] = []
+    for res in results:
         all_refs.extend(res.refs)
+        sources.extend(res.source_name for _ in res.refs)
+
+    with tracer.span("dedup", size=len(all_refs)):
+        dupes = find_duplicates(all_refs, method=config.dedup_method)
+    with tracer.span("cluster", size=len(dupes)):
+        clusters = cluster_duplicates(all_refs, dupes)
+        export_refs = deduplicate(all_refs, clusters) if config.dedupe_exports else all_refs
 
-    merged_bib = export_bibtex(all_refs)
-    merged_ris = export_ris(all_refs)
-    merged_csljson = export_csljson(all_refs)
-    merged_formatted = format_bibliography(all_refs, config.csl_style)
-    dupes = find_duplicates(all_refs)
+    library_matches: list[LibraryMatch] = []
+    library_added: dict[int, int] = {}
+    if config.library_path:
+        with tracer.span("library", size=len(all_refs)), LibraryIndex(config.library_path) as library:
+            library_matches = find_library_duplicates(all_refs, library)
+            library_added = _add_new_to_library(library, all_refs, sources, clusters, library_matches)
 
-    return BatchResult(
+    batch = BatchResult(
         results=results,
         all_refs=all_refs,
-        merged_bibtex=merged_bib.bibtex,
-        merged_ris=merged_ris,
-        merged_csljson=merged_csljson,
-        merged_formatted=merged_formatted,
         duplicates=dupes,
+        clusters=clusters,
+        library_matches=library_matches,
+        library_added=library_added,
+        export_refs=export_refs,
+        csl_style=config.csl_style,
+        tracer=tracer,
     )
+    _warm(batch, _BATCH_ATTRS, config.outputs)
+    if config.trace_path:
+        batch.write_trace(config.trace_path)
+    return batch
+
+
+def run_batch(
+    input_paths: list[DocumentSource],
+    config: RunConfig,
+    workers: int | None = 1,
+    progress: ProgressCallback | None = None,
+    docx_outputs: list[str | None] | None = None,
+) -> BatchResult:
+    """Apdoroja kelis dokumentus (pasirinktinai lygiagreciai) ir sujungia rezultatus."""
+    results = run_documents(input_paths, config, workers=workers, progress=progress, docx_outputs=docx_outputs)
+    return merge_results(results, config)
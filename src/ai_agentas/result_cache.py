@@ -0,0 +1,174 @@
+"""Nuolatine (SQLite) dokumentu rezultatu talpykla pakartotiniams paleidimams."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+from functools import lru_cache
+from pathlib import Path
+
+from ai_agentas.pipeline import RunConfig, RunResult
+from ai_agentas.serialization import run_result_from_dict, run_result_to_dict
+from ai_agentas.utils.doc_readers import InMemoryDocument, source_name
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    content_hash TEXT NOT NULL,
+    config_key TEXT NOT NULL,
+    version TEXT NOT NULL,
+    target TEXT NOT NULL,
+    data BLOB NOT NULL,
+    docx BLOB,
+    created REAL NOT NULL,
+    PRIMARY KEY (content_hash, config_key, version, target)
+);
+"""
+
+_PACKAGE_DIR = Path(__file__).resolve().parent
+_CHUNK = 1 << 20
+
+
+@lru_cache(maxsize=1)
+def pipeline_version() -> str:
+    """
+    Paketo kodo santrauka: bet koks parserio, skaitytuvu ar eksportu
+    pakeitimas duoda nauja versija, todel senos talpyklos eilutes nebenaudojamos.
+    """
+    h = hashlib.sha256()
+    for path in sorted(_PACKAGE_DIR.rglob("*.py")):
+        h.update(path.relative_to(_PACKAGE_DIR).as_posix().encode("utf-8"))
+        h.update(path.read_bytes())
+    return h.hexdigest()[:16]
+
+
+def content_hash(source: str | InMemoryDocument) -> str:
+    h = hashlib.sha256()
+    if isinstance(source, InMemoryDocument):
+        h.update(source.data)
+    else:
+        with open(source, "rb") as f:
+            while chunk := f.read(_CHUNK):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def _file_identity(path: str | None) -> list | None:
+    if not path:
+        return None
+    st = Path(path).stat()
+    return [str(Path(path).resolve()), st.st_size, st.st_mtime_ns]
+
+
+def _crossref_identity(config: RunConfig) -> list | None:
+    """Papildymas priklauso nuo kopijos indekso: perstacius ji rezultatai skaiciuojami is naujo."""
+    if not config.crossref_dump:
+        return None
+    from ai_agentas.nodes.crossref_local import default_index_path
+
+    return [*_file_identity(str(default_index_path(config.crossref_dump))), config.enrich_threshold]
+
+
+def config_key(config: RunConfig) -> str:
+    """Tik nustatymai, nuo kuriu priklauso vieno dokumento rezultatas."""
+    return json.dumps(
+        {
+            "update_docx": config.update_docx,
+            "csl_style": config.csl_style,
+            "docx_writer": config.docx_writer,
+            "keep_body_text": config.keep_body_text,
+            "crossref": _crossref_identity(config),
+            "labeler": _file_identity(config.labeler_model),
+        },
+        sort_keys=True,
+    )
+
+
+def _target(source: str | InMemoryDocument, config: RunConfig, output_docx_path: str | None) -> str:
+    """
+    DOCX atnaujinimas priklauso ir nuo vietos: tas pats turinys kitu keliu
+    turi buti irasytas is naujo. Kitiems dokumentams vieta nesvarbi.
+    """
+    name = source_name(source)
+    if config.update_docx and Path(name).suffix.lower() == ".docx":
+        kind = "memory" if isinstance(source, InMemoryDocument) else "disk"
+        return f"{kind}:{name}:{output_docx_path or ''}"
+    return ""
+
+
+def _encode(result: RunResult) -> bytes:
+    # DOCX baitai saugomi atskirame stulpelyje
+    data = run_result_to_dict(result, docx_data=False, spans=False)
+    return zlib.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+
+def _decode(blob: bytes, docx: bytes | None, name: str | None = None) -> RunResult:
+    return run_result_from_dict(json.loads(zlib.decompress(blob)), docx=docx, name=name)
+
+
+class ResultCache:
+    """
+    Dokumentu `RunResult` talpykla: raktas - turinio SHA-256, rezultata
+    veikiantys `RunConfig` laukai ir `pipeline_version()`. Pakeitus koda,
+    senos versijos eilutes istrinamos atidarant talpykla.
+
+    Atnaujintas DOCX diske laikomas galiojanciu tik jei failas vis dar yra;
+    atmintyje apdoroto DOCX turinys saugomas kartu su rezultatu.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = str(path)
+        self.version = pipeline_version()
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        with self._conn:
+            self._conn.execute("DELETE FROM results WHERE version != ?", (self.version,))
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> ResultCache:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def key(
+        self,
+        source: str | InMemoryDocument,
+        config: RunConfig,
+        output_docx_path: str | None = None,
+    ) -> tuple[str, str, str, str]:
+        return content_hash(source), config_key(config), self.version, _target(source, config, output_docx_path)
+
+    def get(self, key: tuple[str, str, str, str], name: str | None = None) -> RunResult | None:
+        """Rezultatas arba None; `name` - dabartinis dokumento vardas (failas galejo buti pervadintas)."""
+        row = self._conn.execute(
+            "SELECT data, docx FROM results "
+            "WHERE content_hash = ? AND config_key = ? AND version = ? AND target = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            return None
+        result = _decode(row[0], row[1], name)
+        upd = result.updated_docx
+        if upd is not None and upd.data is None and not Path(upd.output_path).exists():
+            return None
+        return result
+
+    def put(self, key: tuple[str, str, str, str], result: RunResult) -> None:
+        docx = result.updated_docx.data if result.updated_docx is not None else None
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results "
+                "(content_hash, config_key, version, target, data, docx, created) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*key, _encode(result), docx, time.time()),
+            )
@@ -0,0 +1,181 @@
+"""RunResult / BatchResult <-> JSON suderinami dict'ai (talpyklai ir servisui)."""
+
+from __future__ import annotations
+
+import base64
+from typing import Any
+
+from ai_agentas.nodes.duplicates import DuplicateCluster, DuplicatePair
+from ai_agentas.nodes.export_bibtex import BibtexExport
+from ai_agentas.nodes.library_index import LibraryMatch
+from ai_agentas.nodes.parse_bibliography import ParsedReference
+from ai_agentas.nodes.update_docx import UpdateResult
+from ai_agentas.pipeline import RunConfig, RunResult, BatchResult
+from ai_agentas.utils.tracing import NULL_TRACER, Span, Tracer
+
+
+# Tingus laukai, kurie perduodami tik jei jau buvo apskaiciuoti
+_RUN_EXPORTS = ("ris", "csljson", "formatted_bibliography")
+_BATCH_EXPORTS = ("merged_bibtex", "merged_ris", "merged_csljson", "merged_formatted")
+
+
+def ref_to_dict(ref: ParsedReference) -> dict[str, Any]:
+    return dict(ref.__dict__)
+
+
+def ref_from_dict(data: dict[str, Any]) -> ParsedReference:
+    return ParsedReference(**data)
+
+
+def _spans_to_list(tracer: Tracer) -> list[dict[str, Any]]:
+    return [dict(s.__dict__) for s in tracer.spans]
+
+
+def _tracer_from_list(spans: list[dict[str, Any]] | None, doc: str | None = None) -> Tracer:
+    return Tracer(doc=doc, spans=[Span(**s) for s in spans]) if spans else NULL_TRACER
+
+
+def config_to_dict(config: RunConfig) -> dict[str, Any]:
+    return dict(config.__dict__)
+
+
+def config_from_dict(data: dict[str, Any]) -> RunConfig:
+    data = dict(data)
+    if "outputs" in data:
+        data["outputs"] = tuple(data["outputs"])
+    return RunConfig(**data)
+
+
+def run_result_to_dict(result: RunResult, docx_data: bool = True, spans: bool = True) -> dict[str, Any]:
+    """
+    `docx_data=False` - atnaujinto DOCX baitai neitraukiami (talpykla juos
+    saugo atskirai). Kitaip jie perduodami base64. `spans` - ar perduoti
+    etapu matavimus (talpyklai jie nereikalingi).
+    """
+    cached = vars(result)
+    data: dict[str, Any] = {
+        "source_name": result.source_name,
+        "extracted_body": result.extracted_body,
+        "extracted_bibliography": result.extracted_bibliography,
+        "refs": [ref_to_dict(ref) for ref in result.refs],
+        "csl_style": result.csl_style,
+        "exports": {attr: cached[attr] for attr in _RUN_EXPORTS if attr in cached},
+    }
+    if "bibtex" in cached:
+        bib: BibtexExport = cached["bibtex"]
+        data["bibtex"] = {"bibtex": bib.bibtex, "citekey_by_index": bib.citekey_by_index}
+    upd = result.updated_docx
+    if upd is not None:
+        data["updated_docx"] = {
+            "output_path": upd.output_path,
+            "replacements": upd.replacements,
+            "unmatched": upd.unmatched,
+        }
+        if docx_data and upd.data is not None:
+            data["updated_docx"]["data"] = base64.b64encode(upd.data).decode("ascii")
+    if spans and result.tracer.spans:
+        data["spans"] = _spans_to_list(result.tracer)
+    return data
+
+
+def run_result_from_dict(
+    data: dict[str, Any],
+    docx: bytes | None = None,
+    name: str | None = None,
+) -> RunResult:
+    upd = dict(data["updated_docx"]) if data.get("updated_docx") else None
+    if upd is not None:
+        encoded = upd.pop("data", None)
+        upd["data"] = base64.b64decode(encoded) if encoded is not None else docx
+    result = RunResult(
+        source_name=name or data["source_name"],
+        extracted_body=data["extracted_body"],
+        extracted_bibliography=data["extracted_bibliography"],
+        refs=[ref_from_dict(r) for r in data["refs"]],
+        updated_docx=UpdateResult(**upd) if upd is not None else None,
+        csl_style=data["csl_style"],
+        tracer=_tracer_from_list(data.get("spans"), doc=data["source_name"]),
+    )
+    # jau apskaiciuoti eksportai grazinami i cached_property vietas
+    cached = vars(result)
+    cached.update(data["exports"])
+    if "bibtex" in data:
+        bib = data["bibtex"]
+        cached["bibtex"] = BibtexExport(
+            bibtex=bib["bibtex"],
+            citekey_by_index={int(k): v for k, v in bib["citekey_by_index"].items()},
+        )
+    return result
+
+
+def batch_to_dict(batch: BatchResult) -> dict[str, Any]:
+    """Irasai (`all_refs`) nekartojami: poros ir bibliotekos atitikmenys nurodo indeksus."""
+    cached = vars(batch)
+    data: dict[str, Any] = {
+        "results": [run_result_to_dict(r) for r in batch.results],
+        "duplicates": [
+            {"index_a": d.index_a, "index_b": d.index_b, "score": d.score, "reason": d.reason}
+            for d in batch.duplicates
+        ],
+        "clusters": [
+            {"indices": list(c.indices), "canonical": ref_to_dict(c.canonical), "score": c.score, "reason": c.reason}
+            for c in batch.clusters
+        ],
+        "library_matches": [
+            {
+                "index": m.index,
+                "library_id": m.library_id,
+                "library_ref": ref_to_dict(m.library_ref),
+                "source": m.source,
+                "score": m.score,
+                "reason": m.reason,
+            }
+            for m in batch.library_matches
+        ],
+        "library_added": [[i, ref_id] for i, ref_id in batch.library_added.items()],
+        "csl_style": batch.csl_style,
+        "exports": {attr: cached[attr] for attr in _BATCH_EXPORTS if attr in cached},
+    }
+    if batch.export_refs is not batch.all_refs:
+        data["export_refs"] = [ref_to_dict(r) for r in batch.export_refs]
+    if batch.tracer.spans:
+        data["spans"] = _spans_to_list(batch.tracer)
+    return data
+
+
+def batch_from_dict(data: dict[str, Any]) -> BatchResult:
+    results = [run_result_from_dict(r) for r in data["results"]]
+    all_refs = [ref for res in results for ref in res.refs]
+    batch = BatchResult(
+        results=results,
+        all_refs=all_refs,
+        duplicates=[
+            DuplicatePair(
+                index_a=d["index_a"], index_b=d["index_b"],
+                ref_a=all_refs[d["index_a"]], ref_b=all_refs[d["index_b"]],
+                score=d["score"], reason=d["reason"],
+            )
+            for d in data["duplicates"]
+        ],
+        clusters=[
+            DuplicateCluster(
+                indices=tuple(c["indices"]), canonical=ref_from_dict(c["canonical"]),
+                score=c["score"], reason=c["reason"],
+            )
+            for c in data["clusters"]
+        ],
+        library_matches=[
+            LibraryMatch(
+                index=m["index"], ref=all_refs[m["index"]], library_id=m["library_id"],
+                library_ref=ref_from_dict(m["library_ref"]), source=m["source"],
+                score=m["score"], reason=m["reason"],
+            )
+            for m in data["library_matches"]
+        ],
+        library_added={i: ref_id for i, ref_id in data.get("library_added", [])},
+        export_refs=[ref_from_dict(r) for r in data["export_refs"]] if "export_refs" in data else all_refs,
+        csl_style=data["csl_style"],
+        tracer=_tracer_from_list(data.get("spans")),
+    )
+    vars(batch).update(data["exports"])
+    return batch
@@ -0,0 +1,657 @@
+"""
+Vietinis darbinis servisas: silta procesu pule, darbu eile ir metrikos.
+
+Servisas paleidziamas viena karta (`ai-agentas-service`), darbiniai procesai
+startuoja is anksto ir importuoja sunkias bibliotekas, todel Streamlit ar CLI
+(plonieji klientai, `ServiceClient`) nebemoka uz procesu ir importu paleidima
+kiekvienai uzklausai.
+
+HTTP API (JSON, tik localhost arba Unix socket):
+
+    POST /jobs                    {"config": {...}, "documents": [{"name", "data" (base64)}]} -> {"job_id"}
+    GET  /jobs/<id>               darbo busena (`Job.to_dict`)
+    GET  /jobs/<id>/result?wait=S BatchResult (`serialization.batch_to_dict`); 202 - dar nebaigta
+    GET  /metrics                 eiles gylis, darbu skaiciai, etapu trukmes
+    GET  /health
+
+Failus serviso diske (biblioteka, Crossref kopija, zymetojo modelis) darbai
+gali naudoti tik tuos, kurie nurodyti paleidziant (`--library`, `--crossref`,
+`--labeler`); kitokius kelius nurodancios uzklausos atmetamos.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import http.client
+import ipaddress
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field, replace
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from socketserver import ThreadingMixIn, UnixStreamServer
+from typing import TYPE_CHECKING, Any, Callable, Sequence
+from urllib.parse import parse_qs, urlsplit
+
+from ai_agentas.pipeline import BatchResult, RunConfig, RunResult, merge_results, process_pool, run_pipeline
+from ai_agentas.serialization import batch_from_dict, batch_to_dict, config_from_dict, config_to_dict
+from ai_agentas.utils.doc_readers import DocumentSource, InMemoryDocument, as_source, source_name
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+
+DEFAULT_PORT = 8765
+_MAX_WAIT = 30.0  # ilgiausias vieno /result uzklausos laukimas (s)
+# RunConfig laukai - failai serviso diske. HTTP uzklausa gali naudoti tik tuos,
+# kurie nurodyti paleidziant servisa (`make_server(paths=...)`).
+_PATH_FIELDS = ("library_path", "crossref_dump", "labeler_model")
+
+QUEUED, RUNNING, DONE, ERROR = "queued", "running", "done", "error"
+
+
+def _preload() -> None:
+    """Darbinio proceso initializer'is: sunkios bibliotekos importuojamos is karto."""
+    import bibtexparser  # noqa: F401
+    import docx  # noqa: F401
+    import fitz  # noqa: F401
+    import rapidfuzz  # noqa: F401
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+@dataclass(frozen=True)
+class DocumentStatus:
+    index: int  # dokumento vieta darbe
+    source_name: str
+    ref_count: int
+
+
+@dataclass(eq=False)
+class Job:
+    id: str
+    config: RunConfig
+    total: int
+    status: str = QUEUED
+    documents: list[DocumentStatus] = field(default_factory=list)  # baigti, baigimo tvarka
+    error: str | None = None
+    submitted: float = field(default_factory=time.time)
+    finished: float | None = None
+    result: BatchResult | None = field(default=None, repr=False)
+    submitted_ns: int = field(default_factory=time.perf_counter_ns, repr=False)
+    results: list[RunResult | None] = field(default_factory=list, repr=False)
+    futures: list[Future] = field(default_factory=list, repr=False)
+    finished_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def to_dict(self) -> dict[str, Any]:
+        status = self.status
+        if status == QUEUED and (self.documents or any(f.running() for f in self.futures)):
+            status = RUNNING
+        return {
+            "job_id": self.id,
+            "status": status,
+            "total": self.total,
+            "done": len(self.documents),
+            "documents": [d.__dict__ for d in self.documents],
+            "error": self.error,
+            "submitted": self.submitted,
+            "finished": self.finished,
+        }
+
+
+class WorkerService:
+    """
+    Darbu eile virs siltos procesu pules. Kiekvienas darbo dokumentas
+    apdorojamas atskirai (`run_pipeline`), o visiems baigus rezultatai
+    sujungiami (`merge_results`) atskiroje gijoje.
+
+    Darbams visada ijungiamas sekimas - is span'u skaiciuojamos etapu metrikos.
+    `cache_path` ir `trace_path` servise ignoruojami. Saugoma paskutiniu
+    `keep_jobs` baigtu darbu rezultatai.
+    """
+
+    def __init__(self, workers: int | None = None, keep_jobs: int = 100):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.workers = workers or os.cpu_count() or 1
+        self.keep_jobs = keep_jobs
+        self.started = time.time()
+        self._pool = process_pool(self.workers, initializer=_preload)
+        self._merger = ThreadPoolExecutor(max_workers=1, thread_name_prefix="merge")
+        self._lock = threading.Lock()
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._pending = 0  # pateikti, bet dar nebaigti dokumentai
+        self._counts = {"jobs": 0, DONE: 0, ERROR: 0, "documents": 0}
+        self._stages: dict[str, list] = {}  # etapas -> [kiekis, suma ns, max ns]
+        self._latency: deque[float] = deque(maxlen=1000)  # paskutiniu darbu trukmes (s)
+
+    def warm(self) -> None:
+        """Paleidzia visus darbinius procesus (ir ju importus) dar pries pirma darba."""
+        futures = [self._pool.submit(_ping) for _ in range(self.workers)]
+        for fut in futures:
+            fut.result()
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._merger.shutdown(wait=False)
+
+    def __enter__(self) -> WorkerService:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def submit(self, documents: Sequence[InMemoryDocument], config: RunConfig) -> str:
+        config = replace(config, trace=True, trace_path=None, cache_path=None)
+        job = Job(id=uuid.uuid4().hex, config=config, total=len(documents))
+        job.results = [None] * job.total
+        with self._lock:
+            self._jobs[job.id] = job
+            self._pending += job.total
+            self._counts["jobs"] += 1
+            self._evict()
+        if not documents:
+            self._merger.submit(self._merge, job)
+            return job.id
+        job.futures = [self._pool.submit(run_pipeline, doc, config) for doc in documents]
+        # callback'ai registruojami tik sukaupus visus future'us (atsaukimui klaidos atveju)
+        for i, fut in enumerate(job.futures):
+            fut.add_done_callback(partial(self._document_done, job, i))
+        return job.id
+
+    def _evict(self) -> None:
+        finished = [j.id for j in self._jobs.values() if j.status in (DONE, ERROR)]
+        for job_id in finished[: max(0, len(finished) - self.keep_jobs)]:
+            del self._jobs[job_id]
+
+    def _fail(self, job: Job, error: str) -> None:
+        job.status = ERROR
+        job.error = error
+        job.finished = time.time()
+        self._counts[ERROR] += 1
+        job.finished_event.set()
+
+    def _document_done(self, job: Job, i: int, fut: Future) -> None:
+        exc = None if fut.cancelled() else fut.exception()
+        cancel: list[Future] = []
+        complete = False
+        with self._lock:
+            self._pending -= 1
+            if job.status == ERROR or fut.cancelled():
+                return
+            if exc is not None:
+                self._fail(job, f"{type(exc).__name__}: {exc}")
+                cancel, job.futures, job.results = job.futures, [], []
+            else:
+                res = fut.result()
+                job.results[i] = res
+                job.documents.append(DocumentStatus(index=i, source_name=res.source_name, ref_count=len(res.refs)))
+                self._counts["documents"] += 1
+                complete = len(job.documents) == job.total
+        # uz lock'o ribu: atsaukto future'o callback'as kvieciamas is karto
+        for other in cancel:
+            other.cancel()
+        if complete:
+            self._merger.submit(self._merge, job)
+
+    def _merge(self, job: Job) -> None:
+        try:
+            batch = merge_results(job.results, job.config)  # type: ignore[arg-type]
+        except Exception as e:  # noqa: BLE001 - klaida grazinama klientui per darbo busena
+            with self._lock:
+                self._fail(job, f"{type(e).__name__}: {e}")
+            return
+        with self._lock:
+            self._record(job, batch)
+            job.result = batch
+            job.results = []
+            job.futures = []
+            job.status = DONE
+            job.finished = time.time()
+            self._counts[DONE] += 1
+            self._latency.append(job.finished - job.submitted)
+            job.finished_event.set()
+
+    def _record(self, job: Job, batch: BatchResult) -> None:
+        spans = batch.spans
+        # laukimas eileje: nuo pateikimo iki pirmo dokumento etapo pradzios
+        first: dict[str | None, int] = {}
+        for s in spans:
+            if s.doc is not None:
+                first[s.doc] = min(first.get(s.doc, s.start_ns), s.start_ns)
+        samples = [(s.name, s.duration_ns) for s in spans]
+        samples.extend(("queue", max(0, start - job.submitted_ns)) for start in first.values())
+        for name, dur in samples:
+            a = self._stages.setdefault(name, [0, 0, 0])
+            a[0] += 1
+            a[1] += dur
+            a[2] = max(a[2], dur)
+
+    def job(self, job_id: str) -> Job:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        return job
+
+    def status(self, job_id: str) -> dict[str, Any]:
+        job = self.job(job_id)
+        with self._lock:
+            return job.to_dict()
+
+    def result(self, job_id: str, timeout: float | None = None) -> BatchResult | None:
+        """Sujungtas rezultatas (None - nebaigta per `timeout`); nepavykus - RuntimeError."""
+        job = self.job(job_id)
+        if not job.finished_event.wait(timeout):
+            return None
+        if job.status == ERROR:
+            raise RuntimeError(job.error)
+        return job.result
+
+    def metrics(self) -> dict[str, Any]:
+        with self._lock:
+            by_status = {QUEUED: 0, RUNNING: 0, DONE: 0, ERROR: 0}
+            for job in self._jobs.values():
+                by_status[job.to_dict()["status"]] += 1
+            latency = sorted(self._latency)
+            stages = {
+                name: {"count": c, "total_ms": total / 1e6, "mean_ms": total / c / 1e6, "max_ms": mx / 1e6}
+                for name, (c, total, mx) in sorted(self._stages.items(), key=lambda kv: -kv[1][1])
+            }
+            return {
+                "workers": self.workers,
+                "uptime_s": time.time() - self.started,
+                "queue_depth": self._pending,
+                "jobs": by_status,
+                "jobs_submitted": self._counts["jobs"],
+                "jobs_done": self._counts[DONE],
+                "jobs_failed": self._counts[ERROR],
+                "documents_done": self._counts["documents"],
+                "job_latency_ms": {
+                    "p50": _percentile(latency, 0.5) * 1000,
+                    "p95": _percentile(latency, 0.95) * 1000,
+                    "max": (latency[-1] if latency else 0.0) * 1000,
+                },
+                "stages": stages,
+            }
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+# --- HTTP ---
+
+
+def _document_from_json(item: dict[str, Any]) -> InMemoryDocument:
+    return InMemoryDocument(name=item["name"], data=base64.b64decode(item["data"]))
+
+
+def _as_document(src: DocumentSource) -> InMemoryDocument:
+    """Dokumentas siunciamas servisui turiniu: servisas kliento failu nemato."""
+    source = as_source(src)
+    if isinstance(source, InMemoryDocument):
+        return source
+    return InMemoryDocument(name=source_name(source), data=Path(source).read_bytes())
+
+
+def _document_to_json(src: DocumentSource) -> dict[str, str]:
+    doc = _as_document(src)
+    return {"name": doc.name, "data": base64.b64encode(doc.data).decode("ascii")}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "ai-agentas"
+
+    @property
+    def service(self) -> WorkerService:
+        return self.server.service  # type: ignore[attr-defined]
+
+    def address_string(self) -> str:
+        # Unix socket'o client_address yra tuscias
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format: str, *args) -> None:
+        if getattr(self.server, "verbose", False):
+            super().log_message(format, *args)
+
+    def _send(self, code: int, payload: dict[str, Any]) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job_path(self, path: str) -> tuple[str, str]:
+        parts = path.strip("/").split("/")
+        if len(parts) == 2:
+            return parts[1], ""
+        if len(parts) == 3:
+            return parts[1], parts[2]
+        return "", ""
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.path == "/health":
+            return self._send(200, {"status": "ok"})
+        if url.path == "/metrics":
+            return self._send(200, self.service.metrics())
+        if not url.path.startswith("/jobs/"):
+            return self._send(404, {"error": f"nezinomas kelias: {url.path}"})
+        job_id, action = self._job_path(url.path)
+        try:
+            if action == "":
+                return self._send(200, self.service.status(job_id))
+            if action != "result":
+                return self._send(404, {"error": f"nezinomas kelias: {url.path}"})
+            wait = float(parse_qs(url.query).get("wait", ["0"])[0])
+            batch = self.service.result(job_id, timeout=min(max(wait, 0.0), _MAX_WAIT))
+        except KeyError:
+            return self._send(404, {"error": f"nezinomas darbas: {job_id}"})
+        except ValueError as e:
+            return self._send(400, {"error": str(e)})
+        except RuntimeError as e:
+            return self._send(500, {"error": str(e)})
+        if batch is None:
+            return self._send(202, self.service.status(job_id))
+        return self._send(200, batch_to_dict(batch))
+
+    def do_POST(self) -> None:
+        if urlsplit(self.path).path != "/jobs":
+            return self._send(404, {"error": f"nezinomas kelias: {self.path}"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length))
+            config = config_from_dict(payload.get("config", {}))
+            documents = [_document_from_json(d) for d in payload["documents"]]
+        except (ValueError, KeyError, TypeError) as e:
+            return self._send(400, {"error": f"bloga uzklausa: {e}"})
+        paths: dict[str, str] = self.server.paths  # type: ignore[attr-defined]
+        denied = [
+            name for name in _PATH_FIELDS
+            if getattr(config, name) and os.path.realpath(getattr(config, name)) != paths.get(name)
+        ]
+        if denied:
+            return self._send(403, {"error": f"servisas nepaleistas su siais failais: {', '.join(denied)}"})
+        # naudojami serviso keliai, ne kliento eilutes
+        config = replace(config, **{name: paths[name] for name in _PATH_FIELDS if getattr(config, name)})
+        job_id = self.service.submit(documents, config)
+        self._send(202, {"job_id": job_id})
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(
+    service: WorkerService,
+    host: str = "127.0.0.1",
+    port: int = DEFAULT_PORT,
+    unix_socket: str | None = None,
+    verbose: bool = False,
+    paths: dict[str, str | None] | None = None,
+) -> _HTTPServer | _UnixHTTPServer:
+    """
+    HTTP serveris servisui (`serve_forever()` paleidzia ji). `paths` -
+    `_PATH_FIELDS` failai, kuriuos darbai gali naudoti; kitus kelius
+    nurodancios uzklausos atmetamos (403).
+    """
+    if unix_socket:
+        Path(unix_socket).unlink(missing_ok=True)
+        server: Any = _UnixHTTPServer(unix_socket, _Handler)
+    else:
+        server = _HTTPServer((host, port), _Handler)
+    server.service = service
+    server.verbose = verbose
+    server.paths = {name: os.path.realpath(path) for name, path in (paths or {}).items() if path}
+    return server
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+# --- Klientai ---
+
+
+ServiceProgress = Callable[[int, int, DocumentStatus], None]
+
+
+class ServiceError(RuntimeError):
+    pass
+
+
+class _Client(ABC):
+    """Bendra klientu logika: `run_batch` per `submit` / `status` / `result`."""
+
+    poll_interval = 0.2
+
+    @abstractmethod
+    def submit(self, documents: Sequence[DocumentSource], config: RunConfig) -> str: ...
+
+    @abstractmethod
+    def status(self, job_id: str) -> dict[str, Any]: ...
+
+    @abstractmethod
+    def result(self, job_id: str, wait: float = 0.0) -> BatchResult | None: ...
+
+    @abstractmethod
+    def metrics(self) -> dict[str, Any]: ...
+
+    def run_batch(
+        self,
+        inputs: Sequence[DocumentSource],
+        config: RunConfig,
+        progress: ServiceProgress | None = None,
+    ) -> BatchResult:
+        """
+        Kaip `pipeline.run_batch`, tik dokumentus apdoroja servisas. Atnaujinti
+        DOCX grazinami `updated_docx.data` (servisas i kliento diska neraso).
+        """
+        job_id = self.submit(inputs, config)
+        reported = 0
+        while True:
+            st = self.status(job_id)
+            docs = st["documents"]
+            if progress:
+                for i, d in enumerate(docs[reported:], start=reported + 1):
+                    progress(i, st["total"], DocumentStatus(**d))
+            reported = len(docs)
+            if st["status"] in (DONE, ERROR):
+                break
+            time.sleep(self.poll_interval)
+        if st["status"] == ERROR:
+            raise ServiceError(st["error"])
+        batch = self.result(job_id, wait=_MAX_WAIT)
+        if batch is None:
+            raise ServiceError(f"darbas {job_id} negrazino rezultato")
+        return batch
+
+
+class LocalService(_Client):
+    """Klientas be HTTP: tas pats `WorkerService` tame paciame procese (testams, vienam vartotojui)."""
+
+    def __init__(self, service: WorkerService | None = None):
+        self.service = service or WorkerService()
+
+    def submit(self, documents: Sequence[DocumentSource], config: RunConfig) -> str:
+        return self.service.submit([_as_document(d) for d in documents], config)
+
+    def status(self, job_id: str) -> dict[str, Any]:
+        return self.service.status(job_id)
+
+    def result(self, job_id: str, wait: float = 0.0) -> BatchResult | None:
+        try:
+            return self.service.result(job_id, timeout=wait)
+        except RuntimeError as e:
+            raise ServiceError(str(e)) from e
+
+    def metrics(self) -> dict[str, Any]:
+        return self.service.metrics()
+
+    def close(self) -> None:
+        self.service.close()
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self._socket_path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._socket_path)
+
+
+class ServiceClient(_Client):
+    """
+    HTTP klientas. `url` - `http://127.0.0.1:8765` arba `unix:///kelias/iki.sock`.
+    """
+
+    def __init__(self, url: str, timeout: float = 120.0):
+        self.url = url
+        self.timeout = timeout
+        parsed = urlsplit(url)
+        self._unix = parsed.path if parsed.scheme == "unix" else None
+        self._host = parsed.hostname or "127.0.0.1"
+        self._port = parsed.port or DEFAULT_PORT
+
+    def _request(self, method: str, path: str, payload: dict[str, Any] | None = None) -> tuple[int, dict[str, Any]]:
+        if self._unix:
+            conn: http.client.HTTPConnection = _UnixHTTPConnection(self._unix, self.timeout)
+        else:
+            conn = http.client.HTTPConnection(self._host, self._port, timeout=self.timeout)
+        try:
+            body = json.dumps(payload).encode("utf-8") if payload is not None else None
+            headers = {"Content-Type": "application/json"} if body is not None else {}
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            data = json.loads(resp.read() or b"{}")
+        except OSError as e:
+            raise ServiceError(f"servisas nepasiekiamas ({self.url}): {e}") from e
+        finally:
+            conn.close()
+        if resp.status >= 400:
+            raise ServiceError(data.get("error", f"HTTP {resp.status}"))
+        return resp.status, data
+
+    def health(self) -> bool:
+        try:
+            return self._request("GET", "/health")[1].get("status") == "ok"
+        except ServiceError:
+            return False
+
+    def submit(self, documents: Sequence[DocumentSource], config: RunConfig) -> str:
+        # keliai - kliento kataloge; servisas juos lygina su savo (`make_server(paths=...)`)
+        config = replace(config, **{n: os.path.abspath(getattr(config, n)) for n in _PATH_FIELDS if getattr(config, n)})
+        payload = {"config": config_to_dict(config), "documents": [_document_to_json(d) for d in documents]}
+        return self._request("POST", "/jobs", payload)[1]["job_id"]
+
+    def status(self, job_id: str) -> dict[str, Any]:
+        return self._request("GET", f"/jobs/{job_id}")[1]
+
+    def result(self, job_id: str, wait: float = 0.0) -> BatchResult | None:
+        code, data = self._request("GET", f"/jobs/{job_id}/result?wait={wait}")
+        return batch_from_dict(data) if code == 200 else None
+
+    def metrics(self) -> dict[str, Any]:
+        return self._request("GET", "/metrics")[1]
+
+
+# --- Paleidimas ---
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="ai-agentas-service",
+        description="Vietinis servisas su silta procesu pule (klientai: app.py, ai-agentas --service).",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="adresas (numatytai: tik localhost)")
+    parser.add_argument(
+        "--allow-remote", action="store_true",
+        help="leisti ne-localhost --host (API neturi autentifikacijos!)",
+    )
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--socket", help="klausytis Unix socket'e vietoj TCP")
+    parser.add_argument("-j", "--workers", type=int, default=0, help="procesu skaicius (0 - visi branduoliai)")
+    parser.add_argument("--keep-jobs", type=int, default=100, help="kiek baigtu darbu rezultatu laikyti")
+    parser.add_argument("-v", "--verbose", action="store_true", help="spausdinti kiekviena uzklausa")
+    # failai serviso diske, kuriuos darbai gali naudoti (kitus uzklausu kelius servisas atmeta)
+    parser.add_argument("--library", help="SQLite bibliotekos indeksas (RunConfig.library_path)")
+    parser.add_argument("--crossref", help="vietine Crossref kopija (RunConfig.crossref_dump)")
+    parser.add_argument("--labeler", help="zymetojo modelis (RunConfig.labeler_model)")
+    return parser
+
+
+def _raise_interrupt(signum, frame) -> None:
+    raise KeyboardInterrupt
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    if not args.socket and not _is_loopback(args.host):
+        if not args.allow_remote:
+            print(
+                f"Klaida: --host {args.host} nera localhost; API neturi autentifikacijos "
+                "(jei tikrai reikia - --allow-remote)",
+                file=sys.stderr,
+            )
+            return 2
+        print(
+            f"DEMESIO: servisas pasiekiamas is tinklo ({args.host}) be autentifikacijos - "
+            "bet kas gali pateikti darbus",
+            file=sys.stderr,
+        )
+    paths = {"library_path": args.library, "crossref_dump": args.crossref, "labeler_model": args.labeler}
+    with WorkerService(workers=args.workers or None, keep_jobs=args.keep_jobs) as service:
+        started = time.perf_counter()
+        service.warm()
+        server = make_server(
+            service, args.host, args.port, unix_socket=args.socket, verbose=args.verbose, paths=paths,
+        )
+        where = f"unix://{args.socket}" if args.socket else f"http://{args.host}:{server.server_address[1]}"
+        print(
+            f"Servisas: {where} ({service.workers} proc., paruosta per {time.perf_counter() - started:.1f} s)",
+            file=sys.stderr,
+        )
+        # SIGTERM (systemd, docker stop) - kaip Ctrl+C: darbiniai procesai sustabdomi
+        signal.signal(signal.SIGTERM, _raise_interrupt)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if args.socket:
+                Path(args.socket).unlink(missing_ok=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,16 @@
 from __future__ import annotations
 
 import re
+from collections.abc import Sequence
 
 from .text_norm import (
     BibliographySplit,
+    LineSpan,
+    TextLines,
     looks_like_heading,
     looks_like_stop_heading,
     norm_ws,
     split_lines,
-    join_lines,
 )
 
 
@@ -42,7 +44,8 @@ def _is_clearly_not_reference(entry: str) -> bool:
     l = norm_ws(entry).lower()
     if not l:
         return True
-    # PDF paraščių/headerių triukšmas (pvz. "20royalsocietypublishing.org/... R. Soc. Open Sci. ...")
+    # PDF paraščių/headerių triukšmas (pvz. "20royalsocietypublishing.org/... R. Soc. Open Sci. ...");
+    # `read_pdf` juos pasalina pagal padeti, cia lieka tekstui is kitur (pvz. .txt is PDF)
     if _PDF_MARGIN_NOISE_RE.match(l):
         return True
     # Per trumpas
@@ -67,6 +70,41 @@ def _is_clearly_not_reference(entry: str) -> bool:
     return False
 
 
+_YEAR_RE = re.compile(r"\b(19|20)\d{2}\b")
+
+
+class _LineFlags:
+    """Eiluciu pozymiai (netuscia / bib-like / stop-antraste), skaiciuojami po viena karta."""
+
+    def __init__(self, lines: TextLines):
+        self.lines = lines
+        n = len(lines)
+        self._non_empty: list[bool | None] = [None] * n
+        self._bib_like: list[bool | None] = [None] * n
+        self._stop: list[bool | None] = [None] * n
+
+    def non_empty(self, i: int) -> bool:
+        v = self._non_empty[i]
+        if v is None:
+            v = self._non_empty[i] = bool(norm_ws(self.lines[i]))
+        return v
+
+    def bib_like(self, i: int) -> bool:
+        v = self._bib_like[i]
+        if v is None:
+            v = self._bib_like[i] = _is_bib_item_like(self.lines[i])
+        return v
+
+    def stop(self, i: int) -> bool:
+        v = self._stop[i]
+        if v is None:
+            v = self._stop[i] = looks_like_stop_heading(self.lines[i])
+        return v
+
+    def year_like(self, i: int) -> bool:
+        return bool(_YEAR_RE.search(self.lines[i]))
+
+
 def split_bibliography(text: str) -> BibliographySplit:
     """
     Atskiria dokumento pagrindini teksta nuo literaturos saraso.
@@ -75,28 +113,31 @@ def split_bibliography(text: str) -> BibliographySplit:
     1. Ieskome antrascuu (References/Literatura/...) nuo galo
     2. Po rastos antrastes imame eilutes IKI kitos stop-antrastes (Priedai, Santrauka...)
     3. Jei antrastes nera — heuristinis "bib-like" tankio paieska
+
+    Rezultatas - eiluciu intervalai originaliame tekste (zr. `BibliographySplit`).
     """
-    lines = split_lines(text)
-    if not lines:
-        return BibliographySplit(body_text="", bibliography_text="", bibliography_start_line=None)
+    lines = TextLines(text)
+    n = len(lines)
+    if not n:
+        return BibliographySplit(lines=lines, body_end=0, bib_start=None, bib_end=0)
+    flags = _LineFlags(lines)
 
     # 1) Ieskome visu bibliografijos antrasciu ir renkam geriausia kandidata
-    heading_candidates = [i for i, ln in enumerate(lines) if looks_like_heading(ln)]
+    heading_candidates = [i for i in range(n) if looks_like_heading(lines[i])]
     best_heading = None  # (score, heading_idx, bib_start, bib_end)
     for h_idx in heading_candidates:
         bib_start = h_idx + 1
-        bib_end = len(lines)
-        for j in range(bib_start, len(lines)):
-            if looks_like_stop_heading(lines[j]):
+        bib_end = n
+        for j in range(bib_start, n):
+            if flags.stop(j):
                 bib_end = j
                 break
 
-        seg = lines[bib_start:bib_end]
-        non_empty = [ln for ln in seg if norm_ws(ln)]
+        non_empty = [j for j in range(bib_start, bib_end) if flags.non_empty(j)]
         if len(non_empty) < 3:
             continue
-        bib_like = sum(1 for ln in non_empty if _is_bib_item_like(ln))
-        year_like = sum(1 for ln in non_empty if re.search(r"\b(19|20)\d{2}\b", ln))
+        bib_like = sum(1 for j in non_empty if flags.bib_like(j))
+        year_like = sum(1 for j in non_empty if flags.year_like(j))
         density = bib_like / max(1, len(non_empty))
         year_density = year_like / max(1, len(non_empty))
         score = density * 0.75 + year_density * 0.25
@@ -114,34 +155,26 @@ def split_bibliography(text: str) -> BibliographySplit:
 
     if best_heading is not None:
         _, h_idx, bib_start, bib_end = best_heading
-        bib = join_lines(lines[bib_start:bib_end]).strip()
-        body = join_lines(lines[:h_idx]).rstrip()
-        return BibliographySplit(body_text=body, bibliography_text=bib, bibliography_start_line=bib_start)
-
-    # 2) Heuristika: surandame nuo galo ilgesni segmenta su bib-item eiluciu dauguma
-    min_tail = min(80, len(lines))
-    tail_start = len(lines) - min_tail
-
-    best = None  # (score, start_idx_in_doc)
-    for start in range(tail_start, len(lines)):
-        seg = lines[start:]
-        non_empty = [ln for ln in seg if norm_ws(ln)]
-        if len(non_empty) < 5:
-            continue
-        bib_like = sum(1 for ln in non_empty if _is_bib_item_like(ln))
-        score = bib_like / max(1, len(non_empty))
-        if score >= 0.55:
-            cand = (score, start)
-            if best is None or cand[1] < best[1] or (cand[1] == best[1] and cand[0] > best[0]):
-                best = cand
+        return BibliographySplit(lines=lines, body_end=h_idx, bib_start=bib_start, bib_end=bib_end)
 
-    if best is None:
-        return BibliographySplit(body_text=text.rstrip(), bibliography_text="", bibliography_start_line=None)
+    # 2) Heuristika: surandame nuo galo ilgesni segmenta su bib-item eiluciu dauguma.
+    # Skaiciuojam nuo galo sukauptas sumas - kiekviena eilute tikrinama viena karta.
+    tail_start = n - min(80, n)
+    best_start = None
+    non_empty_count = 0
+    bib_like_count = 0
+    for start in range(n - 1, tail_start - 1, -1):
+        if flags.non_empty(start):
+            non_empty_count += 1
+            bib_like_count += flags.bib_like(start)
+        if non_empty_count < 5:
+            continue
+        if bib_like_count / non_empty_count >= 0.55:
+            best_start = start  # imame ankstyviausia tinkama pradzia
 
-    _, start = best
-    body = join_lines(lines[:start]).rstrip()
-    bib = join_lines(lines[start:]).strip()
-    return BibliographySplit(body_text=body, bibliography_text=bib, bibliography_start_line=start)
+    if best_start is None:
+        return BibliographySplit(lines=lines, body_end=n, bib_start=None, bib_end=n)
+    return BibliographySplit(lines=lines, body_end=best_start, bib_start=best_start, bib_end=n)
 
 
 def bibliography_to_entries(bibliography_text: str) -> list[str]:
@@ -151,46 +184,77 @@ def bibliography_to_entries(bibliography_text: str) -> list[str]:
     Isfiltruoja aiksiai ne-saltininius irasus.
     """
     lines = split_lines(bibliography_text)
-    entries: list[str] = []
-    buf: list[str] = []
+    return [span.text(lines) for span in entry_spans(lines)]
+
 
-    # PDF numeruotu sarasu rezimas: jei daug eiluciu prasideda "1." / "2)" / "[3]"
-    numbered_lines = sum(1 for ln in lines if _NUMBERED_ITEM_RE.match(ln))
-    numbered_mode = numbered_lines >= 4
+def split_entries(split: BibliographySplit) -> list[LineSpan]:
+    """
+    Kaip `bibliography_to_entries(split.bibliography_text)`, tik irasai -
+    `split.lines` eiluciu intervalai; tekstas: `span.text(split.lines)`.
+    """
+    if split.bib_start is None:
+        return []
+    return entry_spans(split.lines, split.bib_start, split.bib_end)
+
+
+def entry_spans(lines: Sequence[str], start: int = 0, end: int | None = None) -> list[LineSpan]:
+    """
+    Bibliografijos eilutes `lines[start:end]` -> irasu eiluciu intervalai
+    (zr. `bibliography_to_entries`). Iraso tekstas sukuriamas filtravimui ir
+    pamirstamas; eilutes i sarasa nekopijuojamos.
+    """
+    end = len(lines) if end is None else end
+    spans: list[LineSpan] = []
+    entries: list[str] = []  # `spans` tekstai filtravimui
+    buf: list[str] = []  # jau normalizuotos eilutes
+    buf_start = start
 
-    def flush():
+    def flush(k: int):
         nonlocal buf
-        e = " ".join(norm_ws(x) for x in buf if norm_ws(x)).strip()
+        e = " ".join(buf)
         if e:
+            spans.append(LineSpan(buf_start, k))
             entries.append(e)
         buf = []
 
-    processed_lines: list[str] = []
-    for ln in lines:
+    # PDF numeruotu sarasu rezimas: eilutes, prasidedancios "1." / "2)" / "[3]"
+    numbered_at: list[int] = []
+    last = start  # po paskutines apdorotos eilutes
+    for k in range(start, end):
+        ln = lines[k]
         stripped = norm_ws(ln)
         if not stripped:
-            flush()
+            flush(k)
             continue
         # Jei sutinkame stop-antraste — stabdom viska
         if looks_like_stop_heading(ln):
-            flush()
+            flush(k)
             break
-        processed_lines.append(ln)
+        if _NUMBERED_ITEM_RE.match(ln):
+            numbered_at.append(k)
         if buf and _BIB_ITEM_BULLET_RE.match(ln):
-            flush()
-        buf.append(ln)
+            flush(k)
+        if not buf:
+            buf_start = k
+        buf.append(stripped)
+        last = k + 1
 
-    flush()
+    flush(last)
 
     # Jei numeruotu eiluciu buvo daug, bet del PDF lauzymo dalis irasu susiliejo,
-    # atliekame papildoma skaidyma pagal numerinius markerius.
+    # atliekame papildoma skaidyma pagal numerinius markerius: irasas - nuo
+    # markerio eilutes iki kito markerio (tuscios eilutes tarp ju nieko neprideda).
+    numbered_mode = sum(1 for k in range(start, end) if _NUMBERED_ITEM_RE.match(lines[k])) >= 4
     if numbered_mode:
-        joined = "\n".join(processed_lines)
-        parts = re.split(r"(?m)^\s*(?=(?:\[\d{1,4}\]|\d{1,4}[\.\)]))", joined)
-        forced_entries = [norm_ws(p) for p in parts if norm_ws(p)]
-        forced_entries = [e for e in forced_entries if len(e) >= 15 and not _is_clearly_not_reference(e)]
-        if len(forced_entries) > len(entries):
-            entries = forced_entries
+        bounds = [start, *(k for k in numbered_at if k > start), last]
+        forced = [LineSpan(a, b) for a, b in zip(bounds, bounds[1:])]
+        forced_entries = [(span, span.text(lines)) for span in forced]
+        forced_entries = [
+            (span, e) for span, e in forced_entries
+            if e and len(e) >= 15 and not _is_clearly_not_reference(e)
+        ]
+        if len(forced_entries) > len(spans):
+            return [span for span, _ in forced_entries]
 
     # Filtruojame: ismetame per trumpus ir aiksiai ne-saltininius
-    return [e for e in entries if len(e) >= 15 and not _is_clearly_not_reference(e)]
+    return [span for span, e in zip(spans, entries) if len(e) >= 15 and not _is_clearly_not_reference(e)]
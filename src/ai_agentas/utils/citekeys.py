@@ -12,8 +12,13 @@ def _slug(s: str) -> str:
     return s
 
 
+def surname_key(author: str | None) -> str:
+    """Pirmojo autoriaus pavardes raktas (tas pats, kaip citekey pradzioje)."""
+    return _slug((author or "").split(",")[0].split(" ")[0])
+
+
 def make_citekey(author: str | None, year: str | None, title: str | None) -> str:
-    a = _slug((author or "").split(",")[0].split(" ")[0]) or "anon"
+    a = surname_key(author) or "anon"
     y = _slug(year or "")[:4] or "nd"
     t = _slug(title or "")[:12] or "work"
     return f"{a}{y}{t}"
@@ -1,7 +1,22 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import io
+import re
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Any, BinaryIO, Union
+
+
+@dataclass(frozen=True)
+class InMemoryDocument:
+    """Dokumentas be failo diske (pvz. Streamlit upload): pavadinimas + turinys."""
+
+    name: str
+    data: bytes = field(repr=False)
+
+
+# Kelias diske arba dokumento turinys atmintyje
+DocumentSource = Union[str, Path, InMemoryDocument, bytes, BinaryIO]
 
 
 @dataclass(frozen=True)
@@ -9,13 +24,37 @@ class DocumentText:
     text: str
     source_path: str
     kind: str  # "docx" | "pdf" | "txt"
+    # jau ikeltas python-docx dokumentas (tik DOCX), kad atnaujinimui nereiketu skaityti is naujo
+    document: Any = field(default=None, repr=False, compare=False)
 
 
-def read_docx(path: str) -> DocumentText:
+def as_source(source: DocumentSource, name: str | None = None) -> str | InMemoryDocument:
+    """
+    Suvienodina ivesti: kelias lieka keliu (str), baitai ir file-like
+    objektai tampa `InMemoryDocument`. Tipas nustatomas pagal `name` pletini.
+    """
+    if isinstance(source, InMemoryDocument):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return InMemoryDocument(name=name or "document.txt", data=bytes(source))
+    if hasattr(source, "read"):
+        data = source.read()
+        return InMemoryDocument(name=name or Path(getattr(source, "name", "document.txt")).name, data=data)
+    return str(source)
+
+
+def source_name(source: str | InMemoryDocument) -> str:
+    """Dokumento pavadinimas: kelias arba `InMemoryDocument.name`."""
+    return source.name if isinstance(source, InMemoryDocument) else str(Path(source))
+
+
+def read_docx(source: str | InMemoryDocument) -> DocumentText:
     from docx import Document  # python-docx
 
-    p = Path(path)
-    doc = Document(str(p))
+    if isinstance(source, InMemoryDocument):
+        doc = Document(io.BytesIO(source.data))
+    else:
+        doc = Document(str(Path(source)))
     parts: list[str] = []
     for para in doc.paragraphs:
         parts.append(para.text or "")
@@ -26,31 +65,123 @@ def read_docx(path: str) -> DocumentText:
                 t = (cell.text or "").strip()
                 if t:
                     parts.append(t)
-    return DocumentText(text="\n".join(parts).strip(), source_path=str(p), kind="docx")
+    return DocumentText(text="\n".join(parts).strip(), source_path=source_name(source), kind="docx", document=doc)
+
+
+# PDF puslapio krastas (dalis plocio / aukscio), kuriame ieskoma antrasciu, poraisciu ir numeriu
+_PDF_MARGIN = 0.07
+# padeties tolerancija taskais (bloko koordinates kvantuojamos tokiu zingsniu)
+_PDF_BAND = 6.0
+# kiek puslapiu turi pasikartoti blokas (jei PDF trumpesnis - visuose puslapiuose)
+_PDF_MIN_REPEATS = 3
+# skaiciai maskuojami tik tokio ilgio (zodziais) blokuose: numeriai, antrastes, poraistes
+_PDF_MASK_TOKENS = 6
+_DIGITS_RE = re.compile(r"\d+")
 
+# (x0, y0, x1, y1, tekstas)
+_Block = tuple[float, float, float, float, str]
 
-def read_pdf(path: str) -> DocumentText:
+
+def _margin_key(block: _Block, width: float, height: float) -> tuple | None:
+    """
+    Krasto bloko raktas: kuris krastas, kvantuota bloko padetis (atstumai
+    nuo to krasto ir postumis isilgai jo) ir tekstas. Trumpuose blokuose
+    skaiciai pakeiciami `#` (puslapio numeriai, "2020, 13: 45" poraistese);
+    ilgesni tekstai lyginami tiksliai, kad vienodos formos teksto eilutes
+    (pvz. bibliografijos irasai puslapio virsuje) nebutu laikomos antraste.
+    Bloku ne krasto zonoje raktas - None.
+    """
+    x0, y0, x1, y1, text = block
+    words = text.lower().split()
+    if not words:
+        return None
+    joined = " ".join(words)
+    masked = _DIGITS_RE.sub("#", joined) if len(words) <= _PDF_MASK_TOKENS else joined
+
+    def q(v: float) -> int:
+        return round(v / _PDF_BAND)
+
+    if y1 <= height * _PDF_MARGIN:
+        return "top", q(y0), q(y1), q(x0), masked
+    if y0 >= height * (1 - _PDF_MARGIN):
+        return "bottom", q(height - y1), q(height - y0), q(x0), masked
+    if x1 <= width * _PDF_MARGIN:
+        return "left", q(x0), q(x1), q(y0), masked
+    if x0 >= width * (1 - _PDF_MARGIN):
+        return "right", q(width - x1), q(width - x0), q(y0), masked
+    return None
+
+
+def _strip_repeated_margins(pages: list[tuple[float, float, list[_Block]]]) -> list[str]:
+    """
+    Puslapiu tekstai be pasikartojanciu antrasciu, poraisciu ir puslapiu
+    numeriu: krasto blokas pasalinamas, jei tas pats raktas (`_margin_key`)
+    yra bent `_PDF_MIN_REPEATS` puslapiuose - visame PDF arba tarp tos pacios
+    lyginumo puslapiu (skirtingos antrastes kairiajame ir desiniajame puslapyje).
+    Raktai suskaiciuojami vienu praejimu per blokus, antru - blokai atrenkami.
+    """
+    keys = [[_margin_key(b, width, height) for b in blocks] for width, height, blocks in pages]
+    # raktas -> [paskutinis puslapis, puslapiu, lyginiu puslapiu, nelyginiu puslapiu]
+    seen: dict[tuple, list[int]] = {}
+    for page_no, page_keys in enumerate(keys):
+        for key in page_keys:
+            if key is None:
+                continue
+            counts = seen.setdefault(key, [-1, 0, 0, 0])
+            if counts[0] != page_no:
+                counts[0] = page_no
+                counts[1] += 1
+                counts[2 + page_no % 2] += 1
+
+    def need(n_pages: int) -> int:
+        return max(2, min(_PDF_MIN_REPEATS, n_pages))
+
+    n = len(pages)
+    need_all, need_even, need_odd = need(n), need((n + 1) // 2), need(n // 2)
+    repeated = {
+        key for key, (_, total, even, odd) in seen.items()
+        if total >= need_all or even >= need_even or odd >= need_odd
+    }
+    return [
+        "".join(b[4] for b, key in zip(blocks, page_keys) if key not in repeated)
+        for (_, _, blocks), page_keys in zip(pages, keys)
+    ]
+
+
+def read_pdf(source: str | InMemoryDocument) -> DocumentText:
+    """
+    PDF tekstas is PyMuPDF teksto bloku (ta pati tvarka kaip `get_text("text")`)
+    be pasikartojanciu krastu: antrastes, poraistes ir puslapiu numeriai
+    kitaip iterpiami i bibliografijos irasus.
+    """
     import fitz  # pymupdf
 
-    p = Path(path)
-    doc = fitz.open(str(p))
-    parts: list[str] = []
+    if isinstance(source, InMemoryDocument):
+        doc = fitz.open(stream=source.data, filetype="pdf")
+    else:
+        doc = fitz.open(str(Path(source)))
+    pages: list[tuple[float, float, list[_Block]]] = []
     for page in doc:
-        parts.append(page.get_text("text"))
-    return DocumentText(text="\n".join(parts).strip(), source_path=str(p), kind="pdf")
+        # (x0, y0, x1, y1, tekstas, bloko nr., tipas); tipas 1 - paveikslelis
+        blocks = [b[:5] for b in page.get_text("blocks") if b[6] == 0]
+        pages.append((page.rect.width, page.rect.height, blocks))
+    parts = _strip_repeated_margins(pages)
+    return DocumentText(text="\n".join(parts).strip(), source_path=source_name(source), kind="pdf")
 
 
-def read_text(path: str) -> DocumentText:
-    p = Path(path)
-    return DocumentText(text=p.read_text(encoding="utf-8", errors="ignore"), source_path=str(p), kind="txt")
+def read_text(source: str | InMemoryDocument) -> DocumentText:
+    if isinstance(source, InMemoryDocument):
+        text = source.data.decode("utf-8", errors="ignore")
+    else:
+        text = Path(source).read_text(encoding="utf-8", errors="ignore")
+    return DocumentText(text=text, source_path=source_name(source), kind="txt")
 
 
-def read_any(path: str) -> DocumentText:
-    p = Path(path)
-    suf = p.suffix.lower()
+def read_any(source: DocumentSource, name: str | None = None) -> DocumentText:
+    src = as_source(source, name)
+    suf = Path(source_name(src)).suffix.lower()
     if suf == ".docx":
-        return read_docx(str(p))
+        return read_docx(src)
     if suf == ".pdf":
-        return read_pdf(str(p))
-    return read_text(str(p))
-
+        return read_pdf(src)
+    return read_text(src)
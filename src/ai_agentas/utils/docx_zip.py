@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import struct
+import zipfile
+import zlib
+from contextlib import nullcontext
+from pathlib import Path
+from typing import BinaryIO, Callable, ContextManager
+
+
+# Tie patys formatai kaip zipfile modulyje (structFileHeader, structCentralDir, structEndArchive)
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_CENTRAL_DIR = struct.Struct("<4s4B4HL2L5H2L")
+_END_ARCHIVE = struct.Struct("<4s4H2LH")
+_DATA_DESCRIPTOR_SIG = b"PK\x07\x08"
+_ZIP32_LIMIT = 0xFFFFFFFF
+
+
+class Zip64NotSupported(ValueError):
+    """Archyvas per didelis paprastam (ne zip64) perrasymui."""
+
+
+def _dos_datetime(date_time: tuple[int, ...]) -> tuple[int, int]:
+    y, mo, d, h, mi, s = date_time
+    dosdate = (max(y, 1980) - 1980) << 9 | mo << 5 | d
+    dostime = h << 11 | mi << 5 | (s // 2)
+    return dostime, dosdate
+
+
+def _encoded_name(info: zipfile.ZipInfo) -> bytes:
+    return info.orig_filename.encode("utf-8" if info.flag_bits & 0x800 else "cp437")
+
+
+def _copy_raw_member(src: BinaryIO, info: zipfile.ZipInfo, dst: BinaryIO) -> None:
+    """Kopijuoja local header + suspausta turini (+ data descriptor) baitas i baita."""
+    src.seek(info.header_offset)
+    header = src.read(_LOCAL_HEADER.size)
+    fields = _LOCAL_HEADER.unpack(header)
+    name_len, extra_len = fields[10], fields[11]
+    length = name_len + extra_len + info.compress_size
+    dst.write(header)
+    remaining = length
+    while remaining:
+        chunk = src.read(min(remaining, 1 << 20))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Netiketa pabaiga: {info.filename}")
+        dst.write(chunk)
+        remaining -= len(chunk)
+    if info.flag_bits & 0x08:
+        head = src.read(4)
+        dst.write(head)
+        dst.write(src.read(12 if head == _DATA_DESCRIPTOR_SIG else 8))
+
+
+def _write_deflated(info: zipfile.ZipInfo, data: bytes, dst: BinaryIO) -> zipfile.ZipInfo:
+    comp = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    payload = comp.compress(data) + comp.flush()
+    new = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    new.compress_type = zipfile.ZIP_DEFLATED
+    new.flag_bits = info.flag_bits & 0x800
+    new.create_system = info.create_system
+    new.create_version = info.create_version
+    new.extract_version = max(info.extract_version, 20)
+    new.external_attr = info.external_attr
+    new.internal_attr = info.internal_attr
+    new.CRC = zlib.crc32(data)
+    new.compress_size = len(payload)
+    new.file_size = len(data)
+    new.extra = b""
+    new.comment = info.comment
+
+    name = _encoded_name(new)
+    dostime, dosdate = _dos_datetime(new.date_time)
+    dst.write(_LOCAL_HEADER.pack(
+        b"PK\x03\x04", new.extract_version, 0, new.flag_bits, new.compress_type,
+        dostime, dosdate, new.CRC, new.compress_size, new.file_size, len(name), 0,
+    ))
+    dst.write(name)
+    dst.write(payload)
+    return new
+
+
+def _central_entry(info: zipfile.ZipInfo, offset: int) -> bytes:
+    name = _encoded_name(info)
+    dostime, dosdate = _dos_datetime(info.date_time)
+    return _CENTRAL_DIR.pack(
+        b"PK\x01\x02", info.create_version, info.create_system, info.extract_version,
+        info.reserved, info.flag_bits, info.compress_type, dostime, dosdate,
+        info.CRC, info.compress_size, info.file_size, len(name), len(info.extra),
+        len(info.comment), 0, info.internal_attr, info.external_attr, offset,
+    ) + name + info.extra + info.comment
+
+
+def _open(target: str | Path | BinaryIO, mode: str) -> ContextManager[BinaryIO]:
+    if hasattr(target, "read") or hasattr(target, "write"):
+        return nullcontext(target)
+    return open(target, mode)
+
+
+def rewrite_zip_member(
+    src_path: str | Path | BinaryIO,
+    dst_path: str | Path | BinaryIO,
+    member: str,
+    transform: Callable[[bytes], bytes],
+) -> None:
+    """
+    Perraso viena archyvo nari (pvz. `word/document.xml`) per `transform`,
+    o visus kitus narius (paveikslelius, stilius...) kopijuoja suspaustus,
+    baitas i baita, be isskleidimo ir pakartotinio suspaudimo.
+
+    `src_path` / `dst_path` gali buti keliai arba file-like objektai (BytesIO).
+    Zip64 archyvai nepalaikomi - metama `Zip64NotSupported`.
+    """
+    with _open(src_path, "rb") as src, zipfile.ZipFile(src) as zin:
+        infos = zin.infolist()
+        if len(infos) >= 0xFFFF or any(
+            i.header_offset >= _ZIP32_LIMIT or i.compress_size >= _ZIP32_LIMIT
+            or i.file_size >= _ZIP32_LIMIT
+            for i in infos
+        ):
+            raise Zip64NotSupported(str(src_path))
+        new_data = transform(zin.read(member))
+
+        central: list[bytes] = []
+        with _open(dst_path, "wb") as dst:
+            for info in infos:
+                offset = dst.tell()
+                if info.filename == member:
+                    written = _write_deflated(info, new_data, dst)
+                    central.append(_central_entry(written, offset))
+                else:
+                    _copy_raw_member(src, info, dst)
+                    central.append(_central_entry(info, offset))
+
+            cd_offset = dst.tell()
+            for entry in central:
+                dst.write(entry)
+            cd_size = dst.tell() - cd_offset
+            if cd_offset >= _ZIP32_LIMIT:
+                raise Zip64NotSupported("isvesties archyvas per didelis")
+            comment = zin.comment
+            dst.write(_END_ARCHIVE.pack(
+                b"PK\x05\x06", 0, 0, len(central), len(central), cd_size, cd_offset, len(comment),
+            ))
+            dst.write(comment)
@@ -0,0 +1,305 @@
+"""
+Esamu bibliotekos eksportu (.bib, .ris) skaitymas srautu tiesiai i ParsedReference.
+
+Failas skaitomas eilutemis ir atmintyje laikomas tik dabartinis irasas,
+todel ir 100k irasu eksportas skaitomas pastovia atmintimi. Irasai jau
+strukturuoti: bibliografijos atskyrimas ir parsinimas praleidziami, o
+pasitikejimas - 1.0.
+"""
+
+from __future__ import annotations
+
+import io
+import re
+import unicodedata
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from ai_agentas.nodes.parse_bibliography import ParsedReference
+from ai_agentas.utils.doc_readers import InMemoryDocument, source_name
+from ai_agentas.utils.text_norm import norm_ws
+
+
+LIBRARY_SUFFIXES = (".bib", ".ris")
+# DocumentText.kind bibliotekos failams
+LIBRARY_KIND = "library"
+
+_ENTRY_START_RE = re.compile(r"@\s*(\w+)\s*([{(])")
+_FIELD_NAME_RE = re.compile(r"\s*([\w\-:.]+)\s*=\s*")
+_LATEX_ACCENTS = {
+    "'": "\u0301", "`": "\u0300", "^": "\u0302", '"': "\u0308", "~": "\u0303",
+    "=": "\u0304", ".": "\u0307", "u": "\u0306", "v": "\u030c", "c": "\u0327", "k": "\u0328",
+}
+_LATEX_ACCENT_RE = re.compile(r"\\([" + re.escape("'`^\"~=.") + r"]|[uvck](?=[{\s]))\s*\{?([A-Za-z])\}?")
+_LATEX_CMD_RE = re.compile(r"\\(?:textit|textbf|emph|textsc|mathrm|url)\s*")
+_LATEX_ESCAPE_RE = re.compile(r"\\([&%$#_{}])")
+# skliaustai ir kabutes (pabegti simboliai, pvz. \{, praleidziami)
+_BRACE_RE = re.compile(r'\\.|[{}"]')
+_PAREN_RE = re.compile(r"\\.|[()]")
+_LATEX_CHARS_RE = re.compile(r"[\\{}~]|--")
+# paprasta reiksme be ideto skliaustu ir makrosu - daznas atvejis, be `_bib_value`
+_SIMPLE_FIELD_RE = re.compile(r'\s*([\w\-:.]+)\s*=\s*(?:\{([^{}\\]*)\}|"([^"{}\\]*)"|(\d+))\s*(?:,|$)')
+_BARE_RE = re.compile(r"[^\s,#}]+")
+_YEAR4_RE = re.compile(r"\d{4}")
+_PAGES_DASH_RE = re.compile(r"\s*-+\s*")
+_DOI_PREFIX_RE = re.compile(r"^https?://(?:dx\.)?doi\.org/", re.IGNORECASE)
+_RIS_LINE_RE = re.compile(r"^([A-Z][A-Z0-9])  -(?: (.*))?$")
+
+
+def is_library(name: str) -> bool:
+    return Path(name).suffix.lower() in LIBRARY_SUFFIXES
+
+
+def _lines(source: str | InMemoryDocument) -> Iterator[str]:
+    if isinstance(source, InMemoryDocument):
+        stream: Iterable[str] = io.TextIOWrapper(io.BytesIO(source.data), encoding="utf-8-sig", errors="ignore")
+        yield from stream
+        return
+    with open(source, encoding="utf-8-sig", errors="ignore") as f:
+        yield from f
+
+
+def _join_authors(authors: list[str]) -> str | None:
+    """Kaip parserio APA autoriu eilute: "A, B, & C"."""
+    if len(authors) > 1:
+        return ", ".join(authors[:-1]) + ", & " + authors[-1]
+    return authors[0] if authors else None
+
+
+def _year(value: str | None) -> str | None:
+    m = _YEAR4_RE.search(value or "")
+    return m.group(0) if m else None
+
+
+def _reference(raw: str, fields: dict[str, str], authors: list[str], parser: str) -> ParsedReference:
+    pages = fields.get("pages")
+    doi = fields.get("doi")
+    return ParsedReference(
+        raw=raw,
+        title=fields.get("title") or None,
+        year=_year(fields.get("year") or fields.get("date")),
+        author=_join_authors(authors),
+        authors=authors,
+        journal=fields.get("journal") or None,
+        volume=fields.get("volume") or None,
+        issue=fields.get("issue") or None,
+        pages=_PAGES_DASH_RE.sub("-", pages) if pages else None,
+        publisher=fields.get("publisher") or None,
+        doi=_DOI_PREFIX_RE.sub("", doi).lower() if doi else None,
+        url=fields.get("url") or None,
+        confidence=1.0,
+        parser=parser,
+    )
+
+
+# --- BibTeX ---
+
+
+def _latex_to_text(value: str) -> str:
+    if not _LATEX_CHARS_RE.search(value):
+        return value.strip() if "  " not in value and "\n" not in value else norm_ws(value)
+    s = _LATEX_ACCENT_RE.sub(lambda m: unicodedata.normalize("NFC", m.group(2) + _LATEX_ACCENTS[m.group(1)]), value)
+    s = _LATEX_CMD_RE.sub("", s)
+    s = _LATEX_ESCAPE_RE.sub(r"\1", s)
+    s = s.replace("{", "").replace("}", "").replace("~", " ").replace("--", "-")
+    return norm_ws(s)
+
+
+def _delimited(body: str, pos: int) -> tuple[int, str]:
+    """`{...}` arba `"..."` reiksme nuo `pos`: (pozicija po jos, turinys be isoriniu skyrikliu)."""
+    quoted = body[pos] == '"'
+    depth = 0 if quoted else 1
+    for m in _BRACE_RE.finditer(body, pos + 1):
+        tok = m.group(0)
+        if tok == '"':
+            if quoted and not depth:
+                return m.end(), body[pos + 1:m.start()]
+        elif tok == "{":
+            depth += 1
+        elif tok == "}":
+            depth -= 1
+            if not quoted and not depth:
+                return m.end(), body[pos + 1:m.start()]
+    return len(body), body[pos + 1:]
+
+
+def _bib_value(body: str, pos: int, strings: dict[str, str]) -> tuple[str, int]:
+    """Lauko reiksme nuo `pos` (su `#` sujungimu); grazina (reiksme, pozicija po jos)."""
+    parts: list[str] = []
+    n = len(body)
+    while pos < n:
+        while pos < n and body[pos].isspace():
+            pos += 1
+        if pos >= n:
+            break
+        ch = body[pos]
+        if ch == "{" or ch == '"':
+            pos, value = _delimited(body, pos)
+            parts.append(value)
+        else:
+            m = _BARE_RE.match(body, pos)
+            if not m:
+                break
+            word = m.group(0)
+            parts.append(strings.get(word.lower(), word))
+            pos = m.end()
+        while pos < n and body[pos].isspace():
+            pos += 1
+        if pos < n and body[pos] == "#":
+            pos += 1
+            continue
+        break
+    return "".join(parts), pos
+
+
+def _bib_fields(body: str, strings: dict[str, str]) -> dict[str, str]:
+    fields: dict[str, str] = {}
+    pos = 0
+    n = len(body)
+    while pos < n:
+        simple = _SIMPLE_FIELD_RE.match(body, pos)
+        if simple:
+            value = simple.group(2)
+            if value is None:
+                value = simple.group(3) if simple.group(3) is not None else simple.group(4)
+            fields[simple.group(1).lower()] = value
+            pos = simple.end()
+            continue
+        m = _FIELD_NAME_RE.match(body, pos)
+        if not m:
+            comma = body.find(",", pos)
+            if comma < 0:
+                break
+            pos = comma + 1
+            continue
+        value, pos = _bib_value(body, m.end(), strings)
+        fields[m.group(1).lower()] = value
+        comma = body.find(",", pos)
+        pos = n if comma < 0 else comma + 1
+    return fields
+
+
+def _bib_entries(lines: Iterable[str]) -> Iterator[tuple[str, str]]:
+    """(tipas, iraso tekstas be isoriniu skliaustu) - po viena irasa."""
+    kind: str | None = None
+    opener, close = "{", "}"
+    buf: list[str] = []
+    depth = 0
+    for line in lines:
+        while line:
+            if kind is None:
+                # kaip BibTeX: tekstas tarp irasu - komentarai
+                m = _ENTRY_START_RE.search(line)
+                if not m:
+                    break
+                kind = m.group(1).lower()
+                opener = m.group(2)
+                close = "}" if opener == "{" else ")"
+                line = line[m.end():]
+                depth = 1
+                buf = []
+            # skliaustai skaiciuojami tik iraso riboms rasti (reiksmes analizuoja `_bib_value`).
+            # Greitas kelias: eilute be pabegtu simboliu ir kito iraso pradzios iraso
+            # neuzbaigia, jei skliaustu balansas lieka teigiamas
+            if "\\" not in line and "@" not in line:
+                balance = depth + line.count(opener) - line.count(close)
+                if balance > 0:
+                    depth = balance
+                    buf.append(line)
+                    break
+            end = -1
+            for m in (_BRACE_RE if close == "}" else _PAREN_RE).finditer(line):
+                tok = m.group(0)
+                if tok == close:
+                    depth -= 1
+                    if depth == 0:
+                        end = m.start()
+                        break
+                elif tok == opener:
+                    depth += 1
+            if end < 0:
+                buf.append(line)
+                break
+            buf.append(line[:end])
+            yield kind, "".join(buf)
+            kind = None
+            line = line[end + 1:]
+
+
+def iter_bibtex(lines: Iterable[str]) -> Iterator[ParsedReference]:
+    """BibTeX irasai -> ParsedReference (palaikomi @string makrosai, `#` sujungimas)."""
+    strings: dict[str, str] = {}
+    for kind, body in _bib_entries(lines):
+        if kind in ("comment", "preamble"):
+            continue
+        if kind == "string":
+            for name, value in _bib_fields(body, strings).items():
+                strings[name] = value
+            continue
+        comma = body.find(",")
+        if comma < 0:
+            continue
+        raw = _bib_fields(body[comma + 1:], strings)
+        fields = {k: _latex_to_text(v) for k, v in raw.items()}
+        fields["journal"] = fields.get("journal") or fields.get("journaltitle") or fields.get("booktitle", "")
+        fields["issue"] = fields.get("number") or fields.get("issue", "")
+        authors = [
+            norm_ws(a) for a in re.split(r"\s+and\s+", fields.get("author") or fields.get("editor") or "")
+            if norm_ws(a)
+        ]
+        yield _reference(f"@{kind}{{{norm_ws(body)}}}", fields, authors, parser="bibtex")
+
+
+# --- RIS ---
+
+_RIS_FIELDS = {
+    "TI": "title", "T1": "title",
+    "PY": "year", "Y1": "year", "DA": "date",
+    "JO": "journal", "JF": "journal", "T2": "journal", "JA": "journal", "J2": "journal", "BT": "journal",
+    "VL": "volume", "IS": "issue", "PB": "publisher", "DO": "doi", "UR": "url",
+}
+_RIS_AUTHORS = ("AU", "A1")
+
+
+def iter_ris(lines: Iterable[str]) -> Iterator[ParsedReference]:
+    """RIS irasai (TY ... ER) -> ParsedReference; pirmoji lauko reiksme laimi."""
+    fields: dict[str, str] = {}
+    authors: list[str] = []
+    raw: list[str] = []
+    start = end = ""
+    in_record = False
+    for line in lines:
+        line = line.rstrip("\r\n")
+        m = _RIS_LINE_RE.match(line)
+        if not m:
+            continue
+        tag, value = m.group(1), norm_ws(m.group(2) or "")
+        if tag == "TY":
+            fields, authors, raw, start, end = {}, [], [], "", ""
+            in_record = True
+        if not in_record:
+            continue
+        if tag == "ER":
+            if start:
+                fields["pages"] = f"{start}-{end}" if end else start
+            yield _reference(" ".join(raw), fields, authors, parser="ris")
+            in_record = False
+            continue
+        raw.append(f"{tag} - {value}")
+        if not value:
+            continue
+        if tag in _RIS_AUTHORS:
+            authors.append(value)
+        elif tag == "SP":
+            start = start or value
+        elif tag == "EP":
+            end = end or value
+        elif tag in _RIS_FIELDS:
+            fields.setdefault(_RIS_FIELDS[tag], value)
+
+
+def iter_library(source: str | InMemoryDocument) -> Iterator[ParsedReference]:
+    """Bibliotekos failo irasai pagal pletini (.bib / .ris)."""
+    if Path(source_name(source)).suffix.lower() == ".ris":
+        return iter_ris(_lines(source))
+    return iter_bibtex(_lines(source))
@@ -2,7 +2,11 @@ from __future__ import annotations
 
 import re
 import unicodedata
-from dataclasses import dataclass
+from array import array
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import overload
 
 
 _WS_RE = re.compile(r"\s+")
@@ -88,8 +92,109 @@ def join_lines(lines: list[str]) -> str:
     return "\n".join(lines)
 
 
+# Tie patys eiluciu skirtukai kaip str.splitlines()
+_LINE_BREAK_RE = re.compile(r"\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
+_NON_LF_BREAK_RE = re.compile(r"[\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
+
+
+class TextLines(Sequence[str]):
+    """
+    Teksto eilutes kaip poslinkiai originaliame tekste: `lines[i]` iskerpa
+    eilute tik paprasius, o `join(i, j)` (= `join_lines(split_lines(text)[i:j])`)
+    - viena iskarpa, kai visi skirtukai yra "\n".
+    """
+
+    __slots__ = ("text", "_starts", "_ends", "_plain")
+
+    def __init__(self, text: str):
+        self.text = text or ""
+        starts = array("I")
+        ends = array("I")
+        pos = 0
+        for m in _LINE_BREAK_RE.finditer(self.text):
+            starts.append(pos)
+            ends.append(m.start())
+            pos = m.end()
+        if pos < len(self.text):
+            starts.append(pos)
+            ends.append(len(self.text))
+        self._starts = starts
+        self._ends = ends
+        self._plain = _NON_LF_BREAK_RE.search(self.text) is None
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    @overload
+    def __getitem__(self, i: int) -> str: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> list[str]: ...
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[k] for k in range(*i.indices(len(self)))]
+        return self.text[self._starts[i]:self._ends[i]]
+
+    def span(self, i: int, j: int) -> tuple[int, int]:
+        """[i, j) eiluciu simboliu poslinkiai tekste."""
+        if i >= j:
+            return 0, 0
+        return self._starts[i], self._ends[j - 1]
+
+    def join(self, i: int, j: int) -> str:
+        if i >= j:
+            return ""
+        if self._plain:
+            start, end = self.span(i, j)
+            return self.text[start:end]
+        return join_lines(self[i:j])
+
+    def __getstate__(self):
+        return self.text
+
+    def __setstate__(self, text: str) -> None:
+        self.__init__(text)
+
+
+@dataclass(frozen=True)
+class LineSpan:
+    """
+    Eiluciu intervalas [start, end) eiluciu sekoje (pvz. `TextLines`); tekstas
+    (netuscios eilutes be tarpu pertekliaus, sujungtos tarpu) - tik `text()`.
+    """
+
+    start: int
+    end: int
+
+    def text(self, lines: Sequence[str]) -> str:
+        return " ".join(s for s in (norm_ws(lines[k]) for k in range(self.start, self.end)) if s)
+
+
 @dataclass(frozen=True)
 class BibliographySplit:
-    body_text: str
-    bibliography_text: str
-    bibliography_start_line: int | None
+    """
+    Teksto padalijimas eiluciu intervalais: kunas `lines[:body_end]`,
+    bibliografija `lines[bib_start:bib_end]`. Tekstai sukuriami tik paprasius.
+    """
+
+    lines: TextLines = field(repr=False, compare=False)
+    body_end: int
+    bib_start: int | None
+    bib_end: int
+
+    @property
+    def bibliography_start_line(self) -> int | None:
+        return self.bib_start
+
+    @cached_property
+    def body_text(self) -> str:
+        if self.bib_start is None:
+            return self.lines.text.rstrip()
+        return self.lines.join(0, self.body_end).rstrip()
+
+    @cached_property
+    def bibliography_text(self) -> str:
+        if self.bib_start is None:
+            return ""
+        return self.lines.join(self.bib_start, self.bib_end).strip()
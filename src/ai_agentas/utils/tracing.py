@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable
+
+
+@dataclass(frozen=True)
+class Span:
+    name: str  # etapas: "read", "split", "parse", "export.bibtex", "dedup"...
+    doc: str | None  # dokumentas (None - visos partijos etapai)
+    start_ns: int  # time.perf_counter_ns() (bendras visiems procesams toje pacioje masinoje)
+    duration_ns: int
+    size: int | None = None  # apdorotas kiekis: simboliai, irasai, baitai...
+    pid: int = 0
+    tid: int = 0
+
+
+@dataclass(frozen=True)
+class StageTiming:
+    name: str
+    count: int
+    total_ms: float
+    max_ms: float
+    size: int | None  # sudetas `Span.size` (None, jei etapas dydzio nepateikia)
+
+
+class _ActiveSpan:
+    __slots__ = ("_tracer", "name", "size", "_start")
+
+    def __init__(self, tracer: Tracer, name: str, size: int | None):
+        self._tracer = tracer
+        self.name = name
+        self.size = size
+
+    def __enter__(self) -> _ActiveSpan:
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        end = time.perf_counter_ns()
+        self._tracer.spans.append(Span(
+            name=self.name,
+            doc=self._tracer.doc,
+            start_ns=self._start,
+            duration_ns=end - self._start,
+            size=self.size,
+            pid=os.getpid(),
+            tid=threading.get_ident(),
+        ))
+
+
+class _NullSpan:
+    """Isjungto sekimo span'as: vienas bendras objektas, nieko nematuoja."""
+
+    __slots__ = ("size",)
+
+    def __enter__(self) -> _NullSpan:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+@dataclass(eq=False)
+class Tracer:
+    """
+    Renka etapu trukmes. Naudojimas:
+
+        with tracer.span("parse") as s:
+            refs = ...
+            s.size = len(refs)
+
+    Tracer'is keliauja kartu su dokumentu (ir per procesu riba - jis
+    pickle'inamas su span'ais), todel visi dokumento etapai atsiduria viename
+    sarase, kad ir kurioje gijoje ar procese buvo vykdyti.
+    """
+
+    doc: str | None = None
+    spans: list[Span] = field(default_factory=list)
+
+    enabled = True
+
+    def span(self, name: str, size: int | None = None) -> _ActiveSpan:
+        return _ActiveSpan(self, name, size)
+
+    def extend(self, spans: Iterable[Span]) -> None:
+        self.spans.extend(spans)
+
+    def summary(self) -> list[StageTiming]:
+        return summarize(self.spans)
+
+
+class NullTracer(Tracer):
+    """Isjungtas sekimas: `span` grazina bendra tuscia konteksta, niekas nesaugoma."""
+
+    enabled = False
+
+    def span(self, name: str, size: int | None = None) -> _NullSpan:  # type: ignore[override]
+        return _NULL_SPAN
+
+    def extend(self, spans: Iterable[Span]) -> None:
+        return None
+
+
+NULL_TRACER = NullTracer()
+
+
+def make_tracer(enabled: bool, doc: str | None = None) -> Tracer:
+    return Tracer(doc=doc) if enabled else NULL_TRACER
+
+
+def summarize(spans: Iterable[Span]) -> list[StageTiming]:
+    """Etapu suvestine (pagal bendra trukme, ilgiausi pirmi)."""
+    acc: dict[str, list] = {}
+    for s in spans:
+        a = acc.setdefault(s.name, [0, 0, 0, None])
+        a[0] += 1
+        a[1] += s.duration_ns
+        a[2] = max(a[2], s.duration_ns)
+        if s.size is not None:
+            a[3] = (a[3] or 0) + s.size
+    out = [
+        StageTiming(name=name, count=c, total_ms=total / 1e6, max_ms=mx / 1e6, size=size)
+        for name, (c, total, mx, size) in acc.items()
+    ]
+    return sorted(out, key=lambda t: -t.total_ms)
+
+
+def chrome_trace(spans: Iterable[Span]) -> dict:
+    """Chrome trace-event formatas (chrome://tracing, Perfetto): "X" ivykiai mikrosekundemis."""
+    spans = list(spans)
+    t0 = min((s.start_ns for s in spans), default=0)
+    events = [
+        {
+            "name": s.name,
+            "cat": s.name.split(".")[0],
+            "ph": "X",
+            "ts": (s.start_ns - t0) / 1000,
+            "dur": s.duration_ns / 1000,
+            "pid": s.pid,
+            "tid": s.tid,
+            "args": {"doc": s.doc, "size": s.size},
+        }
+        for s in spans
+    ]
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_chrome_trace(spans: Iterable[Span], path: str | Path) -> None:
+    Path(path).write_text(json.dumps(chrome_trace(spans), ensure_ascii=False), encoding="utf-8")
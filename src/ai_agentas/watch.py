@@ -0,0 +1,353 @@
+"""
+Stebimas katalogas: nauji ar pakite dokumentai apdorojami po viena partija
+ir ju saltiniai pridedami prie sukauptos bibliotekos.
+
+Kiekvienas ciklas apdoroja tik pasikeitusius failus (`run_documents`),
+tikrina juos su bibliotekos indeksu (`LibraryIndex`) ir i bendrus
+`library.bib` / `library.ris` prideda tik naujus irasus - visa katalogo
+partija is naujo neperskaiciuojama.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Callable, Sequence
+
+from ai_agentas.cli import collect_inputs
+from ai_agentas.nodes.export_bibtex import assign_citekeys, export_bibtex
+from ai_agentas.nodes.export_ris import export_ris
+from ai_agentas.nodes.library_index import LibraryIndex
+from ai_agentas.nodes.parse_bibliography import ParsedReference
+from ai_agentas.pipeline import (
+    UPDATED_DOCX_SUFFIX,
+    RunConfig,
+    RunResult,
+    merge_results,
+    run_documents,
+    run_pipeline,
+)
+from ai_agentas.result_cache import content_hash
+
+
+# Bibliotekos eksportai, kuriuos galima pildyti prirasant gale
+WATCH_OUTPUTS = ("bibtex", "ris")
+_LIBRARY_FILES = {"bibtex": "library.bib", "ris": "library.ris"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watch_files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    refs INTEGER NOT NULL,
+    error TEXT,
+    processed REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS watch_refs (
+    path TEXT NOT NULL,
+    ref_id INTEGER NOT NULL,
+    PRIMARY KEY (path, ref_id)
+);
+CREATE INDEX IF NOT EXISTS watch_refs_ref ON watch_refs(ref_id);
+CREATE TABLE IF NOT EXISTS watch_keys (
+    ref_id INTEGER PRIMARY KEY,
+    citekey TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS watch_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+@dataclass(frozen=True)
+class _Ready:
+    path: Path
+    rel: Path  # santykinis kelias isvesties katalogui
+    content_hash: str
+    size: int
+    mtime_ns: int
+
+
+@dataclass(frozen=True)
+class WatchEvent:
+    """Vieno ciklo rezultatas."""
+
+    processed: list[str]  # apdoroti (nauji ar pakite) failai
+    removed: list[str]  # dinge failai, kuriu irasai pasalinti is bibliotekos
+    failed: list[tuple[str, str]]  # (failas, klaida) - bandoma vel tik failui pasikeitus
+    refs: int  # saltiniu apdorotuose failuose
+    new_refs: int  # is ju nauju bibliotekoje
+    library_size: int
+    seconds: float
+
+
+class FolderWatcher:
+    """
+    Katalogo stebejimas apklausa (be papildomu priklausomybiu).
+
+    Failas apdorojamas tik tada, kai jo dydis ir mtime nesikeicia bent
+    `settle` sekundziu - taip nepaimami dar kopijuojami failai. Failu busena
+    (dydis, mtime, turinio SHA-256) saugoma bibliotekos SQLite faile, todel
+    po perkrovimo apdorojami tik per ta laika pasikeite failai.
+
+    Kiekvienam failui saugoma, kuriuos bibliotekos irasus jis cituoja.
+    Pakeisto ar istrinto failo irasai pasalinami is bibliotekos, isskyrus
+    tuos, kuriuos cituoja ir kiti failai (jie perduodami vienam is ju). Jei
+    kas nors pasalinta, bibliotekos eksportai (retas atvejis) perrasomi is
+    naujo; kitu atveju i juos tik prirasomi nauji irasai.
+    """
+
+    def __init__(
+        self,
+        paths: Sequence[str | Path],
+        out_dir: str | Path,
+        config: RunConfig,
+        formats: Sequence[str] = ("bibtex",),
+        settle: float = 2.0,
+        workers: int | None = 1,
+        recursive: bool = True,
+    ):
+        unknown = [f for f in formats if f not in WATCH_OUTPUTS]
+        if unknown:
+            raise ValueError(f"Stebejimo rezime nepalaikomi eksportai: {', '.join(unknown)} (galimi: {', '.join(WATCH_OUTPUTS)})")
+        self.paths = [Path(p) for p in paths]
+        missing = [str(p) for p in self.paths if not p.exists()]
+        if missing:
+            raise FileNotFoundError(f"nerastas failas ar katalogas: {', '.join(missing)}")
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.library_path = config.library_path or str(self.out_dir / "library.sqlite")
+        # biblioteka tvarkoma cia, dokumentu talpykla nereikalinga - failu busena sekama atskirai
+        self.config = replace(config, library_path=self.library_path, cache_path=None)
+        self.formats = tuple(formats)
+        self.settle = settle
+        self.workers = workers
+        self.recursive = recursive
+        self._library = LibraryIndex(self.library_path)
+        self._conn = sqlite3.connect(self.library_path)
+        self._conn.executescript(_SCHEMA)
+        self._pending: dict[str, tuple[int, int, float]] = {}  # kelias -> (dydis, mtime_ns, nuo kada)
+        self._used_keys = {k for (k,) in self._conn.execute("SELECT citekey FROM watch_keys")}
+
+    def close(self) -> None:
+        self._library.close()
+        self._conn.close()
+
+    def __enter__(self) -> FolderWatcher:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # --- Failu busena ---
+
+    def _known(self) -> dict[str, tuple[int, int, str]]:
+        rows = self._conn.execute("SELECT path, size, mtime_ns, content_hash FROM watch_files")
+        return {path: (size, mtime, h) for path, size, mtime, h in rows}
+
+    def _scan(self, now: float, known: dict[str, tuple[int, int, str]]) -> tuple[list[_Ready], list[str]]:
+        """
+        Stabilus pakite failai ir dinge failai.
+        Failai, kuriu turinys nepasikeite (tik mtime), pazymimi be apdorojimo.
+        """
+        seen: set[str] = set()
+        ready: list[_Ready] = []
+        for path, rel in collect_inputs(self.paths, recursive=self.recursive, exclude=self.out_dir):
+            key = str(path)
+            seen.add(key)
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            stat = (st.st_size, st.st_mtime_ns)
+            prev = known.get(key)
+            if prev is not None and prev[:2] == stat:
+                self._pending.pop(key, None)
+                continue
+            pending = self._pending.get(key)
+            if pending is None or pending[:2] != stat:
+                self._pending[key] = (*stat, now)
+                continue
+            if now - pending[2] < self.settle:
+                continue
+            del self._pending[key]
+            h = content_hash(key)
+            if prev is not None and prev[2] == h:
+                with self._conn:
+                    self._conn.execute(
+                        "UPDATE watch_files SET size = ?, mtime_ns = ? WHERE path = ?", (*stat, key)
+                    )
+                continue
+            ready.append(_Ready(path, rel, h, *stat))
+        for key in list(self._pending):
+            if key not in seen:
+                del self._pending[key]
+        return ready, [key for key in known if key not in seen]
+
+    def _forget(self, key: str) -> int:
+        """Pamirsta failo irasus; bendrus su kitais failais perduoda jiems. Grazina pasalintu skaiciu."""
+        keep = dict(self._conn.execute(
+            "SELECT ref_id, MIN(path) FROM watch_refs "
+            "WHERE path != ? AND ref_id IN (SELECT ref_id FROM watch_refs WHERE path = ?) GROUP BY ref_id",
+            (key, key),
+        ))
+        removed = self._library.remove_source(key, keep=keep)
+        with self._conn:
+            self._conn.execute("DELETE FROM watch_refs WHERE path = ?", (key,))
+        return removed
+
+    def _docx_output(self, path: Path, rel: Path) -> str | None:
+        if not self.config.update_docx or path.suffix.lower() != ".docx":
+            return None
+        target = self.out_dir / "documents" / rel.with_suffix("") / (path.stem + UPDATED_DOCX_SUFFIX)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        return str(target)
+
+    def _process(self, ready: list[_Ready]) -> tuple[list[RunResult], list[tuple[int, str]]]:
+        """Dokumentu rezultatai; sugedus partijai failai apdorojami po viena, kad vienas blogas failas neuzblokuotu kitu."""
+        sources = [str(r.path) for r in ready]
+        outs = [self._docx_output(r.path, r.rel) for r in ready]
+        try:
+            return run_documents(sources, self.config, workers=self.workers, docx_outputs=outs), []
+        except Exception:  # noqa: BLE001 - kaltas failas nustatomas zemiau
+            pass
+        results: list[RunResult] = []
+        failed: list[tuple[int, str]] = []
+        for i, (src, out) in enumerate(zip(sources, outs)):
+            try:
+                results.append(run_pipeline(src, self.config, output_docx_path=out))
+            except Exception as e:  # noqa: BLE001 - klaida irasoma i failo busena
+                failed.append((i, f"{type(e).__name__}: {e}"))
+        return results, failed
+
+    # --- Ciklas ---
+
+    def poll(self, now: float | None = None) -> WatchEvent | None:
+        """Vienas katalogo patikrinimas; None - nieko naujo."""
+        now = time.monotonic() if now is None else now
+        known = self._known()
+        ready, removed = self._scan(now, known)
+        if not ready and not removed:
+            return None
+        started = time.perf_counter()
+
+        # pakeistu ir istrintu failu ankstesni irasai nebegalioja
+        rewrite = False
+        for key in removed + [str(r.path) for r in ready if str(r.path) in known]:
+            rewrite = self._forget(key) > 0 or rewrite
+        before = len(self._library)
+
+        results, failed = self._process(ready)
+        failed_idx = {i for i, _ in failed}
+        ok = [item for i, item in enumerate(ready) if i not in failed_idx]
+        batch = merge_results(results, self.config) if results else None
+
+        # kiekvieno dokumento saltiniu id bibliotekoje: rasti atitikmenys ir ka tik prideti
+        library_ids = dict(batch.library_added) if batch is not None else {}
+        if batch is not None:
+            library_ids.update((m.index, m.library_id) for m in batch.library_matches)
+        cited = []
+        offset = 0
+        for r, res in zip(ok, results):
+            ids = {library_ids[i] for i in range(offset, offset + len(res.refs)) if i in library_ids}
+            cited.extend((str(r.path), ref_id) for ref_id in ids)
+            offset += len(res.refs)
+        with self._conn:
+            self._conn.executemany("DELETE FROM watch_files WHERE path = ?", [(k,) for k in removed])
+            self._conn.executemany("INSERT OR IGNORE INTO watch_refs (path, ref_id) VALUES (?, ?)", cited)
+            rows = []
+            # busena - ta, kuri buvo apdorota; jei failas vel pasikeite, kitas ciklas ji paims
+            for r, res in zip(ok, results):
+                rows.append((str(r.path), r.size, r.mtime_ns, r.content_hash, len(res.refs), None, time.time()))
+            for i, error in failed:
+                r = ready[i]
+                rows.append((str(r.path), r.size, r.mtime_ns, r.content_hash, 0, error, time.time()))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO watch_files "
+                "(path, size, mtime_ns, content_hash, refs, error, processed) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        self._write_library(rewrite)
+
+        return WatchEvent(
+            processed=[str(r.path) for r in ok],
+            removed=removed,
+            failed=[(str(ready[i].path), error) for i, error in failed],
+            refs=len(batch.all_refs) if batch is not None else 0,
+            new_refs=len(self._library) - before,
+            library_size=len(self._library),
+            seconds=time.perf_counter() - started,
+        )
+
+    def run(
+        self,
+        interval: float = 2.0,
+        stop: threading.Event | None = None,
+        on_event: Callable[[WatchEvent], None] | None = None,
+    ) -> None:
+        """Tikrina kas `interval` sekundziu, kol nustatomas `stop` (ar Ctrl+C)."""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            event = self.poll()
+            if event is not None and on_event:
+                on_event(event)
+            stop.wait(interval)
+
+    # --- Bibliotekos eksportai ---
+
+    def _watermark(self) -> int:
+        row = self._conn.execute("SELECT value FROM watch_meta WHERE key = 'exported_id'").fetchone()
+        return row[0] if row else 0
+
+    def _write_library(self, rewrite: bool) -> None:
+        """
+        I `library.*` prirasomi irasai su id > paskutinio eksportuoto. Po
+        pasalinimu failai perrasomi is visos bibliotekos (citekey islieka tie patys).
+        """
+        after = 0 if rewrite else self._watermark()
+        entries = list(self._library.refs(after_id=after))
+        ids = [ref_id for ref_id, _, _ in entries]
+        refs: list[ParsedReference] = [ref for _, _, ref in entries]
+
+        with self._conn:
+            if rewrite:
+                # pasalintu irasu citekey atlaisvinami
+                self._conn.execute("DELETE FROM watch_keys WHERE ref_id NOT IN (SELECT id FROM refs)")
+                self._used_keys = {k for (k,) in self._conn.execute("SELECT citekey FROM watch_keys")}
+            stored = dict(self._conn.execute(
+                "SELECT ref_id, citekey FROM watch_keys WHERE ref_id > ?", (after,)
+            ))
+            missing = [i for i, ref_id in enumerate(ids) if ref_id not in stored]
+            fresh = assign_citekeys([refs[i] for i in missing], used=self._used_keys)
+            for j, i in enumerate(missing):
+                stored[ids[i]] = fresh[j]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO watch_keys (ref_id, citekey) VALUES (?, ?)",
+                [(ids[i], stored[ids[i]]) for i in missing],
+            )
+            if ids:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO watch_meta (key, value) VALUES ('exported_id', ?)", (max(ids),)
+                )
+
+        if not refs and not rewrite:
+            return
+        for fmt in self.formats:
+            path = self.out_dir / _LIBRARY_FILES[fmt]
+            if fmt == "bibtex":
+                text = export_bibtex(refs, {i: stored[ref_id] for i, ref_id in enumerate(ids)}).bibtex
+            else:
+                text = export_ris(refs) if refs else ""
+            if rewrite or not path.exists():
+                tmp = path.with_suffix(path.suffix + ".tmp")
+                tmp.write_text(text, encoding="utf-8")
+                os.replace(tmp, path)
+            else:
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write("\n" + text)
@@ -0,0 +1,93 @@
+"""
+"index" dublikatu paieskos atgaminimas (recall) pries visu poru palyginima.
+
+"matrix" metodas lygina visas poras, kaip senasis O(n^2) ciklas, todel jo
+rezultatas laikomas etalonu. Pavadinimai gadinami kaip spausdinant ar
+skaitant OCR: raidziu pakeitimai, praleidimai, sukeitimai, suliti zodziai.
+"""
+
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from ai_agentas.nodes.duplicates import find_duplicates  # noqa: E402
+from ai_agentas.nodes.parse_bibliography import ParsedReference  # noqa: E402
+
+_STOP = ["the", "of", "and", "in", "for", "on", "a", "to", "with", "ir"]
+_OCR = [("rn", "m"), ("m", "rn"), ("l", "1"), ("e", "c"), ("o", "0"), ("cl", "d"), ("h", "b")]
+_LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def _words(rnd: random.Random, n: int) -> list[str]:
+    syllables = [a + b for a in "bcdfgklmnprstvz" for b in "aeiou"]
+    return ["".join(rnd.choice(syllables) for _ in range(rnd.randint(2, 4))) for _ in range(n)]
+
+
+def _damage(rnd: random.Random, title: str) -> str:
+    s = list(title)
+    for _ in range(rnd.choice([1, 1, 2, 3])):
+        p = rnd.randrange(len(s))
+        op = rnd.random()
+        if op < 0.3:
+            s[p] = rnd.choice(_LETTERS)
+        elif op < 0.5:
+            del s[p]
+        elif op < 0.65:
+            s.insert(p, rnd.choice(_LETTERS))
+        elif op < 0.8 and p + 1 < len(s):
+            s[p], s[p + 1] = s[p + 1], s[p]
+        else:
+            text = "".join(s)
+            a, b = rnd.choice(_OCR)
+            s = list(text.replace(a, b, 1))
+    out = "".join(s)
+    kind = rnd.random()
+    if kind < 0.1:
+        words = out.split()
+        rnd.shuffle(words)
+        out = " ".join(words)
+    elif kind < 0.2:
+        out = out.replace(" ", "", 1)  # suliti zodziai
+    elif kind < 0.25:
+        out = out.upper()
+    return out
+
+
+def _references(n: int, seed: int) -> list[ParsedReference]:
+    rnd = random.Random(seed)
+    vocab = _words(rnd, 3000)
+    authors = [w.capitalize() for w in _words(rnd, 300)]
+    base: list[ParsedReference] = []
+    refs: list[ParsedReference] = []
+    for _ in range(n):
+        if base and rnd.random() < 0.4:
+            b = rnd.choice(base)
+            refs.append(ParsedReference(
+                raw="", title=_damage(rnd, b.title), author=b.author,
+                year=b.year if rnd.random() < 0.8 else str(rnd.randint(1990, 2024)),
+            ))
+            continue
+        words = [rnd.choice(_STOP) if rnd.random() < 0.25 else rnd.choice(vocab) for _ in range(rnd.randint(2, 12))]
+        ref = ParsedReference(
+            raw="", title=" ".join(words).capitalize(), author=rnd.choice(authors),
+            year=str(rnd.randint(1990, 2024)),
+        )
+        base.append(ref)
+        refs.append(ref)
+    return refs
+
+
+def test_index_recall_against_all_pairs():
+    expected = found = 0
+    for seed in (1, 2, 3):
+        refs = _references(1500, seed)
+        full = {(p.index_a, p.index_b): p.score for p in find_duplicates(refs, method="matrix")}
+        index = {(p.index_a, p.index_b): p.score for p in find_duplicates(refs, method="index")}
+        # "index" nieko neprideda ir balu nekeicia - tik gali praleisti poru
+        assert index.items() <= full.items()
+        expected += len(full)
+        found += len(index)
+    # zodziu blocking'as (4 reciausi sveiki zodziai) cia rasdavo ~92 %
+    assert found / expected >= 0.98, f"recall {found}/{expected}"
@@ -0,0 +1,51 @@
+"""`run_batch_external` ir `run_batch` + `write_outputs`: tie patys sujungti eksportai."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from ai_agentas.cli import _EXPORT_FILES, write_outputs  # noqa: E402
+from ai_agentas.external_merge import run_batch_external  # noqa: E402
+from ai_agentas.pipeline import OUTPUTS, RunConfig, run_batch  # noqa: E402
+
+_AUTHORS = ["Smith, A.", "Lee, B.", "Jonaitis, P.", "Garcia, M.", "Kim, H."]
+
+
+def _entry(i: int) -> str:
+    # tas pats autorius ir metai kas 5 irasus - citekey susidurimai
+    return (
+        f"{_AUTHORS[i % 5]} ({2000 + i % 3}). Study number {i} of reference parsing and merging. "
+        f"Journal of Tests, {i % 9}(2), {i}-{i + 9}."
+    )
+
+
+def _documents(tmp_path: Path) -> list[str]:
+    paths = []
+    # pirmas dokumentas didziausias - su keliais procesais baigiasi ne pirmas
+    for d, count in enumerate([400, 3, 5, 4, 6, 3, 5]):
+        entries = [_entry((7 * d + k) % 40) for k in range(count)]  # irasai kartojasi tarp dokumentu
+        text = "Ivadas (Smith, 2000).\n\nLiteratura\n\n" + "\n\n".join(entries) + "\n"
+        path = tmp_path / f"doc{d}.txt"
+        path.write_text(text, encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+
+def _read(out_dir: Path) -> dict[str, str]:
+    return {fmt: (out_dir / _EXPORT_FILES[fmt][0]).read_text(encoding="utf-8") for fmt in OUTPUTS}
+
+
+def test_external_merge_matches_run_batch_in_input_order(tmp_path):
+    paths = _documents(tmp_path)
+    config = RunConfig(update_docx=False, keep_body_text=False)
+
+    write_outputs(run_batch(paths, config), tmp_path / "memory", OUTPUTS)
+    expected = _read(tmp_path / "memory")
+    assert "Study number 0 of" in expected["ris"]
+
+    for workers in (1, 4):
+        out_dir = tmp_path / f"external{workers}"
+        with run_batch_external(paths, config, workers=workers) as batch:
+            batch.write_exports(out_dir, {fmt: _EXPORT_FILES[fmt][0] for fmt in OUTPUTS})
+        assert _read(out_dir) == expected, f"workers={workers}"
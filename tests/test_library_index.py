@@ -0,0 +1,66 @@
+"""
+`LibraryIndex` kandidatu atgaminimas (recall) pries visu poru palyginima.
+
+Biblioteka - pirmieji irasai, uzklausos - likusieji (sugadintos bibliotekos
+irasu kopijos ir nauji irasai, zr. `test_duplicates_recall`). Etalonas - visu
+poru "matrix" paieska per visus irasus.
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from ai_agentas.nodes.duplicates import find_duplicates  # noqa: E402
+from ai_agentas.nodes.library_index import LibraryIndex  # noqa: E402
+from ai_agentas.nodes.parse_bibliography import ParsedReference  # noqa: E402
+
+from test_duplicates_recall import _references  # noqa: E402
+
+_LIBRARY = 1000
+
+
+def test_candidates_recall_against_all_pairs(tmp_path):
+    expected = found = 0
+    for seed in (1, 2, 3):
+        refs = _references(1500, seed)
+        with LibraryIndex(tmp_path / f"library{seed}.sqlite") as library:
+            ids = library.add(refs[:_LIBRARY])
+            full = {
+                (p.index_a, p.index_b) for p in find_duplicates(refs, method="matrix")
+                if p.index_a < _LIBRARY <= p.index_b
+            }
+            hits = {
+                (ids.index(ref_id), j)
+                for j in range(_LIBRARY, len(refs))
+                for ref_id, _, _ in library.candidates(refs[j])
+            }
+        expected += len(full)
+        found += len(full & hits)
+    # 4 sveiki zodziai (crc32 tvarka), >= 2 bendri - cia rasdavo ~77 %
+    assert found / expected >= 0.98, f"recall {found}/{expected}"
+
+
+def test_remove_source_and_old_index_rebuilt(tmp_path):
+    path = tmp_path / "library.sqlite"
+    a = ParsedReference(raw="", title="Parsing references at scale", author="Smith", year="2001")
+    b = ParsedReference(raw="", title="Parsing referenses at scal", author="Smith", year="2001")
+    with LibraryIndex(path) as library:
+        library.add([a], source="a.docx")
+        library.add([a], source="b.docx")
+        assert library.remove_source("a.docx") == 1
+        assert [r for r, _, _ in library.candidates(b)] == [2]
+
+    # senesnes versijos biblioteka (sveiku zodziu signatura) perindeksuojama atidarant
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("DELETE FROM title_sig")
+        conn.execute("DELETE FROM gram_df")
+        conn.execute("PRAGMA user_version = 1")
+    conn.close()
+    with LibraryIndex(path) as library:
+        assert library.lookup(b) is not None
+        assert library.remove_source("b.docx") == 1
+        assert library.lookup(b) is None
+        assert library._conn.execute("SELECT COUNT(*) FROM gram_df").fetchone()[0] == 0
@@ -0,0 +1,48 @@
+"""`read_pdf`: pasikartojanciu antrasciu / poraisciu salinimas ir teksto eilutes prie krasto."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+import fitz  # noqa: E402
+
+from ai_agentas.utils.doc_readers import InMemoryDocument, read_pdf  # noqa: E402
+
+
+def _pdf(pages: list[list[tuple[float, float, str]]]) -> InMemoryDocument:
+    """A4 PDF; kiekvienas puslapis - (x, y, tekstas) eilutes."""
+    doc = fitz.open()
+    for lines in pages:
+        page = doc.new_page(width=595, height=842)
+        for x, y, text in lines:
+            page.insert_text((x, y), text, fontsize=9)
+    return InMemoryDocument(name="test.pdf", data=doc.tobytes())
+
+
+def test_repeated_header_footer_and_page_numbers_removed():
+    pages = [
+        [
+            (72, 30, "Journal of Tests, 2020, 13"),
+            (72, 300, f"Body paragraph {n} talks about something else entirely."),
+            (72, 815, f"Journal of Tests, 2020, 13: {100 + n}"),
+            (295, 828, str(n)),
+        ]
+        for n in range(1, 6)
+    ]
+    lines = [ln for ln in read_pdf(_pdf(pages)).text.splitlines() if ln]
+    assert lines == [f"Body paragraph {n} talks about something else entirely." for n in range(1, 6)]
+
+
+def test_body_line_templates_near_top_kept():
+    # kiekvieno puslapio pirmos eilutes - tos pacios formos irasai, tik kiti skaiciai
+    def entry(i: int) -> str:
+        return f"Author{i}, A. ({1990 + i % 30}). Title number {i} about parsing. J. Tests, {i % 7}({i % 4}), {i}-{i + 9}."
+
+    pages = [
+        [(72, 50 + 11 * k, entry(10 * n + k)) for k in range(4)] + [(295, 828, str(n))]
+        for n in range(1, 6)
+    ]
+    lines = [ln for ln in read_pdf(_pdf(pages)).text.splitlines() if ln]
+    assert len(lines) == 20
+    assert all(ln.startswith("Author") for ln in lines)
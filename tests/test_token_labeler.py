@@ -0,0 +1,35 @@
+"""`token_labeler`: zymiu kelias -> ParsedReference laukai."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from ai_agentas.nodes.parse_bibliography import parse_reference  # noqa: E402
+from ai_agentas.nodes.token_labeler import LABELS, _to_reference, _tokens  # noqa: E402
+
+
+def _labeled(text: str, fields: dict[str, str]) -> list[int]:
+    """Kiekvieno zodzio zyme: laukas, kurio reiksmeje (tekste) zodis yra, kitaip "other"."""
+    bounds = {label: (text.index(value), text.index(value) + len(value)) for label, value in fields.items()}
+    path = []
+    for m in _tokens(text):
+        label = next((lb for lb, (a, b) in bounds.items() if a <= m.start() and m.end() <= b), "other")
+        path.append(LABELS.index(label))
+    return path
+
+
+def test_two_author_entry_keeps_last_initial():
+    text = "Smith, A., Lee, B. (2001). Parsing references at scale. Journal of Tests, 3(2), 10-20."
+    path = _labeled(text, {
+        "author": "Smith, A., Lee, B.",
+        "year": "2001",
+        "title": "Parsing references at scale.",
+        "container": "Journal of Tests",
+    })
+    spans = [m.span() for m in _tokens(text)]
+    ref = _to_reference(text, spans, path)
+    assert ref.author == "Smith, A., Lee, B."
+    assert ref.authors == ["Smith, A.", "Lee, B."] == parse_reference(text).authors
+    assert ref.title == "Parsing references at scale"
+    assert ref.year == "2001"